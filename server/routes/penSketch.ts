@@ -8,10 +8,12 @@ import { Router, Request, Response } from 'express';
 import axios from 'axios';
 import multer from 'multer';
 import { promises as fs } from 'fs';
+import type { FileHandle } from 'fs/promises';
 import path from 'path';
 import { v4 as uuidv4 } from 'uuid';
 import { synthesizeSpeech } from '../services/deepgram';
 import { spawn } from 'child_process';
+import { once } from 'events';
 
 const router = Router();
 
@@ -91,6 +93,40 @@ const upload = multer({
 	},
 });
 
+/**
+ * Progress reported by the Python animators (--progress-json JSON lines on stdout)
+ */
+interface PenSketchProgress {
+	stage: string;
+	frame: number;
+	totalFrames: number;
+	percent: number;
+	renderFps: number | null;
+	encoderFps: number | null;
+	etaSeconds: number | null;
+	updatedAt: Date;
+}
+
+/**
+ * Render cost predicted by the animator once extraction is done (sketch_cost.py),
+ * before the first frame: lets the queue schedule jobs by expected duration
+ */
+interface PenSketchEstimate {
+	renderSeconds: number;
+	encodeSeconds: number;
+	totalSeconds: number;
+	extractSeconds: number | null;
+	frames: number;
+	width: number;
+	height: number;
+	preset: string;
+	/** Only with a deadline: whether it is predicted to hold, and the settings lowered to get there */
+	deadlineSeconds?: number;
+	deadlineMet?: boolean;
+	steps?: string[];
+	updatedAt: Date;
+}
+
 interface PenSketchJob {
 	jobId: string;
 	status: 'pending' | 'processing' | 'completed' | 'failed';
@@ -101,6 +137,10 @@ interface PenSketchJob {
 	completedAt?: Date;
 	videoUrl?: string;
 	error?: string;
+	progress?: PenSketchProgress;
+	estimate?: PenSketchEstimate;
+	/** Fragmented MP4 the animator is still writing; /download streams it while processing */
+	liveOutputPath?: string;
 }
 
 // In-memory job storage (use database in production)
@@ -203,6 +243,7 @@ router.post('/animate', upload.array('imageFiles', 10), async (req: Request, res
 			height = 1080,  // Video height
 			voiceoverScript,
 			generateVoiceover = true,
+			deadlineSeconds,  // Optional time budget for the whole job: the animator lowers quality to fit
 		} = req.body;
 
 		// Parse imageUrls if it's a JSON string
@@ -411,8 +452,21 @@ router.post('/animate', upload.array('imageFiles', 10), async (req: Request, res
 				'--width', width.toString(),
 				'--height', height.toString(),
 				'--variant', `pen-sketch-${jobId}`,
+				'--progress-json',  // JSON-lines progress events for /status
+				'--container', 'fmp4',  // Fragmented MP4: playable while it is still being written
 			];
 			
+			// What is left of the job's deadline after uploads and voiceover goes to the animator
+			if (deadlineSeconds) {
+				const elapsedSeconds = (Date.now() - job.createdAt.getTime()) / 1000;
+				args.push('--deadline', Math.max(1, Number(deadlineSeconds) - elapsedSeconds).toFixed(1));
+			}
+			
+			// Without a voiceover the rendered file is the final video, so /download can stream it live
+			if (!voiceoverUrl) {
+				job.liveOutputPath = outputPath;
+			}
+			
 			// Run Python script
 			job.status = 'processing';
 			console.log(`[Pen Sketch] 🐍 Executing: python ${args.join(' ')}`);
@@ -536,6 +590,58 @@ router.post('/animate', upload.array('imageFiles', 10), async (req: Request, res
 	}
 });
 
+/**
+ * Apply one stdout line from the Python animator to the job if it is a progress event.
+ * Returns false for anything else (log lines, the final JSON result).
+ */
+function applyProgressEvent(job: PenSketchJob, line: string): boolean {
+	const trimmed = line.trim();
+	if (!trimmed.startsWith('{"event"')) {
+		return false;
+	}
+	try {
+		const event = JSON.parse(trimmed);
+		if (event.event === 'stage') {
+			job.progress = {
+				...(job.progress || { frame: 0, totalFrames: 0, percent: 0, renderFps: null, encoderFps: null, etaSeconds: null }),
+				stage: event.stage,
+				updatedAt: new Date(),
+			};
+		} else if (event.event === 'estimate') {
+			job.estimate = {
+				renderSeconds: event.render_seconds,
+				encodeSeconds: event.encode_seconds,
+				totalSeconds: event.total_seconds,
+				extractSeconds: event.extract_seconds ?? null,
+				frames: event.frames,
+				width: event.width,
+				height: event.height,
+				preset: event.preset,
+				deadlineSeconds: event.deadline_seconds,
+				deadlineMet: event.deadline_met,
+				steps: event.steps,
+				updatedAt: new Date(),
+			};
+		} else if (event.event === 'progress') {
+			job.progress = {
+				stage: event.stage,
+				frame: event.frame,
+				totalFrames: event.total_frames,
+				percent: event.percent,
+				renderFps: event.render_fps ?? null,
+				encoderFps: event.encoder_fps ?? null,
+				etaSeconds: event.eta_seconds ?? null,
+				updatedAt: new Date(),
+			};
+		} else {
+			return false;
+		}
+		return true;
+	} catch {
+		return false;
+	}
+}
+
 /**
  * Process animation locally using Python script
  */
@@ -572,13 +678,21 @@ async function processLocalAnimation(
 
 		let stdout = '';
 		let stderr = '';
+		let pendingLine = '';
 
 		pythonProcess.stdout?.on('data', (data) => {
 			const output = data.toString('utf8');
 			stdout += output;
-			// Only log non-JSON lines (JSON will be parsed separately)
-			if (!output.trim().startsWith('{') && !output.trim().startsWith('[')) {
-				console.log(`[Pen Sketch Python] ${output.trim()}`);
+			// Progress events arrive as complete JSON lines; keep any partial line for the next chunk
+			const lines = (pendingLine + output).split('\n');
+			pendingLine = lines.pop() || '';
+			for (const line of lines) {
+				if (!applyProgressEvent(job, line)) {
+					// Only log non-JSON lines (JSON will be parsed separately)
+					if (line.trim() && !line.trim().startsWith('{') && !line.trim().startsWith('[')) {
+						console.log(`[Pen Sketch Python] ${line.trim()}`);
+					}
+				}
 			}
 		});
 
@@ -853,6 +967,14 @@ router.get('/status/:jobId', async (req: Request, res: Response) => {
 			videoUrl: job.videoUrl,
 			voiceoverUrl: job.voiceoverUrl,
 			voiceoverScript: job.voiceoverScript,
+			progress: job.progress && {
+				...job.progress,
+				updatedAt: job.progress.updatedAt.toISOString(),
+			},
+			estimate: job.estimate && {
+				...job.estimate,
+				updatedAt: job.estimate.updatedAt.toISOString(),
+			},
 		});
 	} catch (error: any) {
 		console.error('Error getting job status:', error);
@@ -862,9 +984,61 @@ router.get('/status/:jobId', async (req: Request, res: Response) => {
 	}
 });
 
+/**
+ * Stream a fragmented MP4 that the animator is still writing: send what exists,
+ * then follow the file as it grows until the job finishes (chunked, no Content-Length).
+ */
+async function streamGrowingFile(req: Request, res: Response, job: PenSketchJob, filePath: string) {
+	res.setHeader('Content-Type', 'video/mp4');
+	res.setHeader('Content-Disposition', `attachment; filename="pen-sketch-${job.jobId}.mp4"`);
+	res.setHeader('Cache-Control', 'no-store');
+
+	let clientGone = false;
+	req.on('close', () => { clientGone = true; });
+
+	let handle: FileHandle | null = null;
+	let offset = 0;
+	try {
+		while (!clientGone) {
+			// Checked before reading, so bytes written just before completion are still sent
+			const finished = job.status !== 'processing';
+			if (!handle) {
+				handle = await fs.open(filePath, 'r').catch(() => null);  // Not created yet
+			}
+			if (handle) {
+				const chunk = Buffer.allocUnsafe(1 << 16);
+				const { bytesRead } = await handle.read(chunk, 0, chunk.length, offset);
+				if (bytesRead > 0) {
+					offset += bytesRead;
+					if (!res.write(chunk.subarray(0, bytesRead))) {
+						await once(res, 'drain');
+					}
+					continue;
+				}
+			}
+			if (finished) {
+				break;
+			}
+			await new Promise(resolve => setTimeout(resolve, 200));
+		}
+		if (job.status === 'failed') {
+			// Headers are gone: abort so the client does not keep a truncated file as complete
+			res.destroy(new Error(job.error || 'Animation failed'));
+		} else {
+			res.end();
+		}
+	} catch (error: any) {
+		console.error(`[Pen Sketch] Live download failed for ${job.jobId}:`, error.message);
+		res.destroy(error);
+	} finally {
+		await handle?.close();
+	}
+}
+
 /**
  * GET /api/pen-sketch/download/:jobId
- * Download completed animation video
+ * Download completed animation video; while a local job is still rendering
+ * its fragmented MP4 is streamed as it grows
  */
 router.get('/download/:jobId', async (req: Request, res: Response) => {
 	try {
@@ -877,6 +1051,10 @@ router.get('/download/:jobId', async (req: Request, res: Response) => {
 			});
 		}
 
+		if (job.status === 'processing' && job.liveOutputPath) {
+			return streamGrowingFile(req, res, job, job.liveOutputPath);
+		}
+
 		if (job.status !== 'completed' || !job.videoUrl) {
 			return res.status(400).json({
 				error: `Job is not completed. Current status: ${job.status}`,
@@ -7,26 +7,40 @@ Usage:
     python sketch_animate.py input.png --output output.mp4 [options]
 """
 
+from __future__ import annotations
+
 import sys
 import os
 import argparse
 import json
 import subprocess
 import tempfile
+import importlib.util
 import shutil
 from pathlib import Path
 from typing import List, Tuple, Optional, Dict, Any
 import logging
+import time
 from datetime import datetime
 
-# Try to import optional dependencies
-try:
-    import cv2
-    import numpy as np
-    HAS_CV2 = True
-except ImportError:
-    HAS_CV2 = False
-    print("Warning: OpenCV not available. Image preprocessing will be limited.", file=sys.stderr)
+from sketch_profile import StageProfiler
+from sketch_progress import ProgressReporter
+from sketch_sinks import create_sink, pyav_available
+from sketch_cache import OutputCache, DEFAULT_MAX_MB
+from sketch_parallel import OrderedFrameRenderer
+from sketch_poster import frame_at, render_poster
+from sketch_cost import RenderPlanner
+from sketch_toolchain import Toolchain
+from sketch_lazy import lazy_import
+
+# Optional dependencies: OpenCV/NumPy are only looked up here and load on first
+# use, so --help and argument errors skip them (check_dependencies() reports them)
+HAS_CV2 = all(importlib.util.find_spec(name) is not None for name in ('cv2', 'numpy'))
+if HAS_CV2:
+    from sketch_preprocess import adaptive_denoise, skeletonize
+    from sketch_timeline import Timeline, linear_ends
+    cv2 = lazy_import('cv2')
+    np = lazy_import('numpy')
 
 try:
     import xml.etree.ElementTree as ET
@@ -50,46 +64,40 @@ logger = logging.getLogger(__name__)
 class SketchAnimator:
     """Main class for sketch animation generation."""
     
+    # x264 profile of the MP4 (also part of the output cache key)
+    ENCODER_ARGS = ['-c:v', 'libx264', '-preset', 'medium', '-crf', '23',
+                    '-pix_fmt', 'yuv420p', '-movflags', '+faststart']
+    
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.temp_dir = None
         self.metadata = {
+            'version': '1.0-potrace',
             'variant': config.get('variant', 'default'),
             'seed': config.get('seed', None),
             'timestamp': datetime.now().isoformat(),
             'processing_params': {}
         }
+        self.profiler = StageProfiler(trace=bool(config.get('profile_trace')))
+        self.encoder_args = list(self.ENCODER_ARGS)  # --deadline may pick a faster preset
+        self.toolchain = Toolchain.for_config(config)
     
     def check_dependencies(self) -> Tuple[bool, List[str]]:
-        """Check if required dependencies are available."""
+        """Check if required dependencies are available (probed once per binary version, see sketch_toolchain.py)."""
         missing = []
         
         # Check Potrace
-        try:
-            result = subprocess.run(['potrace', '--version'], 
-                                   capture_output=True, 
-                                   timeout=5)
-            if result.returncode != 0:
-                missing.append('potrace')
-        except (FileNotFoundError, subprocess.TimeoutExpired):
+        if not self.toolchain.capabilities(self.toolchain.find('potrace'), 'potrace'):
             missing.append('potrace')
         
-        # Check FFmpeg
-        try:
-            result = subprocess.run(['ffmpeg', '-version'], 
-                                   capture_output=True, 
-                                   timeout=5)
-            if result.returncode != 0:
-                missing.append('ffmpeg')
-        except (FileNotFoundError, subprocess.TimeoutExpired):
-            # Try to find FFmpeg from node_modules
-            project_root = Path(__file__).parent
-            ffmpeg_path = project_root / 'node_modules' / 'ffmpeg-static' / 'ffmpeg.exe'
-            if sys.platform == 'win32' and ffmpeg_path.exists():
-                self.config['ffmpeg_path'] = str(ffmpeg_path.absolute())
-                logger.info(f"Using FFmpeg from: {self.config['ffmpeg_path']}")
-            else:
-                missing.append('ffmpeg')
+        # Check FFmpeg (--ffmpeg-path, else node_modules/ffmpeg-static, then PATH)
+        ffmpeg_cmd = self.toolchain.find('ffmpeg', self.config.get('ffmpeg_path'))
+        if self.toolchain.capabilities(ffmpeg_cmd, 'ffmpeg'):
+            if not self.config.get('ffmpeg_path'):
+                self.config['ffmpeg_path'] = ffmpeg_cmd
+                logger.info(f"Using FFmpeg from: {ffmpeg_cmd}")
+        else:
+            missing.append('ffmpeg')
         
         if not HAS_CV2:
             missing.append('opencv-python (optional but recommended)')
@@ -113,9 +121,13 @@ class SketchAnimator:
             # Convert to grayscale
             gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
             
-            # Denoise
+            # Denoise (adaptive: clean inputs skip or use the half-resolution path)
+            denoise_info = None
+            skeleton_info = None
             if self.config.get('denoise', True):
-                gray = cv2.fastNlMeansDenoising(gray, None, h=10, templateWindowSize=7, searchWindowSize=21)
+                with self.profiler.span('denoise'):
+                    gray, denoise_info = adaptive_denoise(gray, mode=self.config.get('denoise_mode', 'auto'),
+                                                          h=10, template_window=7, search_window=21)
                 logger.info("Applied denoising")
             
             # Enhance contrast
@@ -128,17 +140,9 @@ class SketchAnimator:
             if self.config.get('skeletonize', False):
                 # Threshold
                 _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-                # Skeletonization using morphological operations
-                kernel = np.ones((3, 3), np.uint8)
-                skeleton = np.zeros(binary.shape, np.uint8)
-                while True:
-                    opened = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel)
-                    temp = cv2.subtract(binary, opened)
-                    eroded = cv2.erode(binary, kernel)
-                    skeleton = cv2.bitwise_or(skeleton, temp)
-                    binary = eroded.copy()
-                    if cv2.countNonZero(binary) == 0:
-                        break
+                # Thinning (Zhang-Suen via ximgproc or LUT-based NumPy fallback)
+                with self.profiler.span('skeletonize'):
+                    skeleton, skeleton_info = skeletonize(binary, method=self.config.get('skeleton_method', 'auto'))
                 gray = cv2.bitwise_not(skeleton)
                 logger.info("Applied skeletonization")
             
@@ -148,8 +152,10 @@ class SketchAnimator:
             
             self.metadata['processing_params']['preprocessing'] = {
                 'denoise': self.config.get('denoise', True),
+                'denoise_info': denoise_info,
                 'enhance_contrast': self.config.get('enhance_contrast', True),
-                'skeletonize': self.config.get('skeletonize', False)
+                'skeletonize': self.config.get('skeletonize', False),
+                'skeleton_info': skeleton_info
             }
             
             return True
@@ -286,8 +292,9 @@ class SketchAnimator:
             logger.error(f"Error parsing SVG: {e}")
             return []
     
-    def create_animation_frames_stream(self, svg_path: str, output_mp4: str) -> bool:
-        """Pre-render frames then stream to FFmpeg for best quality and speed."""
+    def create_animation_frames_stream(self, svg_path: str, output_mp4: str,
+                                       paths: Optional[List[Dict[str, Any]]] = None) -> bool:
+        """Render frames (in parallel, emitted in order) and stream them to the sink."""
         try:
             # Get FFmpeg path
             ffmpeg_cmd = self.config.get('ffmpeg_path', 'ffmpeg')
@@ -301,8 +308,10 @@ class SketchAnimator:
             
             logger.info(f"Pre-rendering {total_frames} frames for stroke-by-stroke animation ({width}x{height} @ {fps}fps)")
             
-            # Parse SVG paths
-            paths = self.parse_svg_paths(svg_path)
+            # Parse SVG paths (unless prepare() already did)
+            if paths is None:
+                with self.profiler.span('parse_svg'):
+                    paths = self.parse_svg_paths(svg_path)
             if not paths:
                 logger.error("No paths found in SVG")
                 return False
@@ -312,118 +321,78 @@ class SketchAnimator:
             # Calculate frames per path for smooth progressive drawing
             frames_per_path = max(1, total_frames // len(paths))
             
-            # Start FFmpeg process
-            ffmpeg_args = [
-                ffmpeg_cmd, '-y',
-                '-f', 'rawvideo',
-                '-vcodec', 'rawvideo',
-                '-s', f'{width}x{height}',
-                '-pix_fmt', 'rgb24',
-                '-r', str(fps),
-                '-i', '-',  # Read from stdin
-                '-c:v', 'libx264',
-                '-preset', 'medium',
-                '-crf', '23',
-                '-pix_fmt', 'yuv420p',
-                '-movflags', '+faststart',
-                output_mp4
-            ]
-            
-            ffmpeg_process = subprocess.Popen(
-                ffmpeg_args,
-                stdin=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                stdout=subprocess.DEVNULL,  # We don't need stdout
-                bufsize=10**8  # Large buffer to reduce blocking
+            # Open the frame sink (FFmpeg pipe unless --sink null/raw)
+            self.sink = create_sink(
+                self.config.get('sink', 'ffmpeg'), output_mp4, width, height, fps, total_frames,
+                ffmpeg_cmd=ffmpeg_cmd, progress=self.progress,
+                pixel_order='bgr', pipe_format=self.config.get('pipe_format', 'rgb24'),
+                stall_timeout=self.config.get('encoder_stall_timeout', 30),
+                timeout=self.config.get('encoder_timeout'),
+                container=self.config.get('container', 'mp4'),
+                encoder_args=self.encoder_args
             )
             
-            # Strategy: Pre-render frames in batches, then stream all at once
-            # This gives us high quality AND speed
-            logger.info("Phase 1: Pre-rendering frames with progressive stroke drawing...")
-            
             # We'll use the cleaned PNG and apply progressive masks based on SVG paths
             # This gives stroke-by-stroke appearance with raster speed
             USE_CAIRO = False  # Too slow for 100+ frames
             HAS_CAIRO = False
             
-            # Pre-render all frames first (fast with cached approach)
+            # Frames depend only on frame_idx: render them concurrently into ring
+            # buffers and stream each one to the sink in order as soon as it is ready
             logger.info("Rendering frames with stroke-by-stroke drawing effect...")
-            rendered_frames = []
-            
-            for frame_idx in range(total_frames):
-                # Calculate which paths to show (progressive)
-                progress = (frame_idx + 1) / total_frames
-                paths_to_draw = max(1, int(len(paths) * progress))
-                
-                # Render frame with progressive stroke drawing
-                frame = self.render_svg_frame_simple(svg_path, paths_to_draw, width, height)
-                
-                if frame is not None:
-                    rendered_frames.append(frame)
-                else:
-                    logger.warning(f"Frame {frame_idx} failed to render")
-                
-                # Progress logging
-                if (frame_idx + 1) % 25 == 0 or frame_idx == 0:
-                    logger.info(f"Pre-rendered {frame_idx + 1}/{total_frames} frames ({(frame_idx + 1)/total_frames*100:.1f}%)")
+            if HAS_CV2:
+                self.prepare_svg_render(svg_path, width, height)
             
-            if not rendered_frames:
-                logger.error("No frames were rendered successfully")
-                return False
-            
-            logger.info(f"Phase 2: Streaming {len(rendered_frames)} frames to FFmpeg...")
+            # Which paths to show on each frame (progressive), compiled up front
+            timeline = self.compile_timeline(len(paths))
             
-            # Use threading to avoid deadlock (read stderr while writing stdin)
-            import threading
-            import queue
+            def paths_for_frame(frame_idx):
+                return timeline.end('paths', frame_idx)
             
-            stderr_queue = queue.Queue()
-            
-            def read_stderr():
-                """Read FFmpeg stderr in background thread to prevent blocking."""
-                try:
-                    for line in ffmpeg_process.stderr:
-                        stderr_queue.put(line)
-                except Exception as e:
-                    stderr_queue.put(f"Error reading stderr: {e}".encode())
+            def render_frame(frame_idx, out):
+                # Render frame with progressive stroke drawing
+                return self.render_svg_frame_simple(svg_path, paths_for_frame(frame_idx), width, height, out)
             
-            stderr_thread = threading.Thread(target=read_stderr, daemon=True)
-            stderr_thread.start()
+            renderer = OrderedFrameRenderer(render_frame, (height, width, 3),
+                                            threads=self.config.get('render_threads', 0), profiler=self.profiler)
+            frames_written = 0
             
-            # Stream frames to FFmpeg stdin
+            self.progress.stage('rendering')
             try:
-                for frame_idx, frame in enumerate(rendered_frames):
-                    ffmpeg_process.stdin.write(frame.tobytes())
+                for frame_idx, frame in renderer.frames(total_frames):
+                    if frame is None:
+                        logger.warning(f"Frame {frame_idx} failed to render")
+                        continue
                     
-                    if (frame_idx + 1) % 50 == 0:
-                        logger.info(f"Streamed {frame_idx + 1}/{len(rendered_frames)} frames to FFmpeg")
-                
-                # Close stdin to signal end of input
-                ffmpeg_process.stdin.close()
-                logger.info("Finished streaming frames, waiting for FFmpeg to complete encoding...")
-                
-            except BrokenPipeError:
-                logger.error("FFmpeg pipe broken - process may have crashed")
-                return False
+                    # Path count is the frame key: equal counts render identical frames
+                    write_start = time.perf_counter()
+                    self.sink.write(frame, key=paths_for_frame(frame_idx))
+                    self.profiler.lap('write', write_start)
+                    frames_written += 1
+                    self.progress.update(frame_idx + 1)
+                    
+                    # Progress logging
+                    if (frame_idx + 1) % 25 == 0 or frame_idx == 0:
+                        logger.info(f"Rendered {frame_idx + 1}/{total_frames} frames ({(frame_idx + 1)/total_frames*100:.1f}%)")
             except Exception as e:
-                logger.error(f"Error streaming to FFmpeg: {e}")
+                logger.error(f"Error streaming frames: {e}")
                 return False
             
-            # Wait for FFmpeg to finish
-            return_code = ffmpeg_process.wait(timeout=60)
+            if not frames_written:
+                logger.error("No frames were rendered successfully")
+                return False
             
-            # Collect any stderr output
-            stderr_lines = []
-            while not stderr_queue.empty():
-                try:
-                    stderr_lines.append(stderr_queue.get_nowait().decode('utf-8', errors='ignore'))
-                except:
-                    break
+            self.progress.update(total_frames, force=True)
+            self.progress.stage('encoding')
+            logger.info(f"Finished streaming {frames_written} frames, waiting for the {self.sink.kind} sink to complete...")
             
-            if return_code != 0:
-                stderr_output = ''.join(stderr_lines)
-                logger.error(f"FFmpeg failed with code {return_code}: {stderr_output}")
-                return False
+            # Close stdin and wait for FFmpeg to finish
+            with self.profiler.span('encoder_wait'):
+                if not self.sink.close():
+                    return False
+            self.metadata['processing_params']['render'] = renderer.info()
+            self.metadata['processing_params']['timeline'] = timeline.info()
+            self.metadata['processing_params']['sink'] = self.sink.info()
             
             logger.info(f"Animation complete: {output_mp4}")
             return True
@@ -473,106 +442,81 @@ class SketchAnimator:
             logger.warning(f"Cairo rendering failed: {e}")
             return None
     
-    def render_svg_frame_simple(self, svg_path: str, paths_to_draw: int, width: int, height: int) -> Optional[np.ndarray]:
-        """Render SVG frames with actual stroke-by-stroke drawing animation."""
+    def prepare_svg_render(self, svg_path: str, width: int, height: int):
+        """Parse the SVG paths and load the reveal image once (before any render threads start)."""
+        # Cache SVG data and parse paths once
+        if not hasattr(self, '_svg_paths_cache'):
+            tree = ET.parse(svg_path)
+            root = tree.getroot()
+            
+            # Get viewBox for coordinate mapping
+            viewbox = root.get('viewBox', f'0 0 {width} {height}')
+            vb_parts = viewbox.split()
+            vb_width = float(vb_parts[2]) if len(vb_parts) >= 3 else width
+            vb_height = float(vb_parts[3]) if len(vb_parts) >= 4 else height
+            
+            # Parse all path elements
+            path_elements = root.findall('.//{http://www.w3.org/2000/svg}path')
+            if not path_elements:
+                path_elements = root.findall('.//path')
+            
+            # Store paths with their drawing attributes
+            self._svg_paths_cache = []
+            for path_elem in path_elements:
+                path_d = path_elem.get('d', '')
+                if path_d:
+                    self._svg_paths_cache.append({
+                        'd': path_d,
+                        'fill': path_elem.get('fill', 'black'),
+                        'stroke': path_elem.get('stroke', 'none'),
+                    })
+            
+            self._viewbox_scale_x = width / vb_width
+            self._viewbox_scale_y = height / vb_height
+            self._total_svg_paths = len(self._svg_paths_cache)
+            
+            logger.info(f"Cached {self._total_svg_paths} SVG paths for animation")
+        
+        # Progressive reveal of the cleaned image (SVG paths set the pace, not the shapes)
+        if not hasattr(self, '_full_image_cache'):
+            cleaned_png = os.path.join(self.temp_dir, 'cleaned.png')
+            if os.path.exists(cleaned_png):
+                img = cv2.imread(cleaned_png, cv2.IMREAD_GRAYSCALE)
+                if img is not None:
+                    img = cv2.resize(img, (width, height), interpolation=cv2.INTER_AREA)
+                    self._full_image_cache = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+                    
+                    # Top-left to bottom-right diagonal sweep looks more natural
+                    y_coords, x_coords = np.ogrid[:height, :width]
+                    self._reveal_distance = ((x_coords / width) + (y_coords / height)) / 2
+    
+    def render_svg_frame_simple(self, svg_path: str, paths_to_draw: int, width: int, height: int,
+                                out: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """
+        Render SVG frames with actual stroke-by-stroke drawing animation. Writes into
+        `out` when given (a ring buffer), so it is safe to call from render threads
+        once prepare_svg_render() has run.
+        """
         if not HAS_CV2:
             return None
         
         try:
-            # Cache SVG data and parse paths once
-            if not hasattr(self, '_svg_paths_cache'):
-                tree = ET.parse(svg_path)
-                root = tree.getroot()
-                
-                # Get viewBox for coordinate mapping
-                viewbox = root.get('viewBox', f'0 0 {width} {height}')
-                vb_parts = viewbox.split()
-                vb_width = float(vb_parts[2]) if len(vb_parts) >= 3 else width
-                vb_height = float(vb_parts[3]) if len(vb_parts) >= 4 else height
-                
-                # Parse all path elements
-                path_elements = root.findall('.//{http://www.w3.org/2000/svg}path')
-                if not path_elements:
-                    path_elements = root.findall('.//path')
-                
-                # Store paths with their drawing attributes
-                self._svg_paths_cache = []
-                for path_elem in path_elements:
-                    path_d = path_elem.get('d', '')
-                    if path_d:
-                        self._svg_paths_cache.append({
-                            'd': path_d,
-                            'fill': path_elem.get('fill', 'black'),
-                            'stroke': path_elem.get('stroke', 'none'),
-                        })
-                
-                self._viewbox_scale_x = width / vb_width
-                self._viewbox_scale_y = height / vb_height
-                self._total_svg_paths = len(self._svg_paths_cache)
-                
-                logger.info(f"Cached {self._total_svg_paths} SVG paths for animation")
+            self.prepare_svg_render(svg_path, width, height)
             
             # Create white canvas
-            canvas = np.ones((height, width, 3), dtype=np.uint8) * 255
+            canvas = out if out is not None else np.empty((height, width, 3), dtype=np.uint8)
+            canvas.fill(255)
             
             # Draw paths progressively (stroke-by-stroke)
             num_paths_to_render = min(paths_to_draw, self._total_svg_paths)
             
-            if num_paths_to_render > 0:
-                # Use PIL for better SVG path rendering
-                try:
-                    from PIL import Image, ImageDraw
-                    
-                    # Create PIL image
-                    pil_img = Image.new('RGB', (width, height), (255, 255, 255))
-                    draw = ImageDraw.Draw(pil_img)
-                    
-                    # Draw each path up to paths_to_draw
-                    for i in range(num_paths_to_render):
-                        path_data = self._svg_paths_cache[i]
-                        
-                        # Parse and draw SVG path (simplified - just fill for now)
-                        # For production, would need full SVG path parser
-                        # For now, use OpenCV contour drawing as approximation
-                        pass
-                    
-                    # Convert PIL to numpy
-                    canvas = np.array(pil_img)
-                    
-                except ImportError:
-                    # PIL not available, use fallback
-                    pass
-                
-                # Fallback: Use simple progressive reveal of cleaned image
-                if not hasattr(self, '_full_image_cache'):
-                    cleaned_png = os.path.join(self.temp_dir, 'cleaned.png')
-                    if os.path.exists(cleaned_png):
-                        img = cv2.imread(cleaned_png, cv2.IMREAD_GRAYSCALE)
-                        if img is not None:
-                            img = cv2.resize(img, (width, height), interpolation=cv2.INTER_AREA)
-                            self._full_image_cache = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+            if num_paths_to_render > 0 and hasattr(self, '_full_image_cache'):
+                # Progressive reveal based on path count (smoother than pixel-by-pixel)
+                reveal_ratio = num_paths_to_render / max(1, self._total_svg_paths)
                 
-                if hasattr(self, '_full_image_cache'):
-                    # Progressive reveal based on path count (smoother than pixel-by-pixel)
-                    reveal_ratio = num_paths_to_render / max(1, self._total_svg_paths)
-                    
-                    # Use circular/radial reveal pattern for more natural drawing appearance
-                    center_x, center_y = width // 2, height // 2
-                    
-                    # Create mask with expanding circle/radius
-                    y_coords, x_coords = np.ogrid[:height, :width]
-                    
-                    # Distance-based reveal (from center outward or top-left to bottom-right)
-                    # Top-left to bottom-right diagonal sweep looks more natural
-                    distance_from_topleft = ((x_coords / width) + (y_coords / height)) / 2
-                    
-                    mask = (distance_from_topleft <= reveal_ratio).astype(np.uint8) * 255
-                    
-                    # Apply mask to reveal image progressively
-                    for c in range(3):
-                        canvas[:, :, c] = np.where(mask > 0, 
-                                                   self._full_image_cache[:, :, c],
-                                                   255)
+                # Apply distance mask to reveal image progressively
+                mask = self._reveal_distance <= reveal_ratio
+                np.copyto(canvas, self._full_image_cache, where=mask[:, :, np.newaxis])
             
             return canvas
         except Exception as e:
@@ -580,6 +524,55 @@ class SketchAnimator:
             # Return white canvas on error
             return np.ones((height, width, 3), dtype=np.uint8) * 255
     
+    def prepare(self, input_png: str) -> bool:
+        """Preprocess, trace and parse the SVG (steps 1-3), shared by video and single frames."""
+        if not self.temp_dir:
+            self.temp_dir = tempfile.mkdtemp(prefix='sketch_animate_')
+        
+        # Step 1: Preprocess image
+        cleaned_png = os.path.join(self.temp_dir, 'cleaned.png')
+        with self.profiler.span('preprocess'):
+            if not self.preprocess_image(input_png, cleaned_png):
+                return False
+        
+        # Step 2: Convert to PBM
+        pbm_path = os.path.join(self.temp_dir, 'input.pbm')
+        with self.profiler.span('convert_pbm'):
+            if not self.convert_to_pbm(cleaned_png, pbm_path):
+                return False
+        
+        # Step 3: Run Potrace
+        svg_path = os.path.join(self.temp_dir, 'output.svg')
+        with self.profiler.span('potrace'):
+            if not self.run_potrace(pbm_path, svg_path):
+                return False
+        
+        with self.profiler.span('parse_svg'):
+            paths = self.parse_svg_paths(svg_path)
+        if not paths:
+            logger.error("No paths found in SVG")
+            return False
+        self.svg_path, self.cleaned_png, self.svg_paths = svg_path, cleaned_png, paths
+        self.timeline = self.compile_timeline()
+        return True
+    
+    def compile_timeline(self, path_count: Optional[int] = None):
+        """Per-frame SVG path counts (at least one path is always shown)."""
+        if path_count is None:
+            path_count = len(self.svg_paths)
+        fps = self.config.get('fps', 30)
+        total_frames = int(fps * self.config.get('duration', 5.0))
+        timeline = Timeline('potrace', total_frames, fps)
+        timeline.add_range('paths', np.maximum(1, linear_ends(path_count, total_frames)))
+        return timeline
+    
+    def render_frame(self, t: float) -> Optional[np.ndarray]:
+        """Frame shown at t seconds, rendered directly from the traced paths after prepare()."""
+        width = self.config.get('width', 1920)
+        height = self.config.get('height', 1080)
+        frame_idx = frame_at(t, self.timeline.fps, self.timeline.total_frames)
+        return self.render_svg_frame_simple(self.svg_path, self.timeline.end('paths', frame_idx), width, height)
+    
     def save_metadata(self, output_path: str):
         """Save metadata JSON file."""
         try:
@@ -596,32 +589,58 @@ class SketchAnimator:
             self.temp_dir = tempfile.mkdtemp(prefix='sketch_animate_')
             logger.info(f"Temp directory: {self.temp_dir}")
             
+            total_frames = int(self.config.get('fps', 30) * self.config.get('duration', 5.0))
+            self.progress = ProgressReporter(total_frames, enabled=self.config.get('progress_json', False))
+            
+            # The best encoder this FFmpeg build has (probed once per binary version)
+            self.encoder_args = self.toolchain.encoder_args(
+                self.encoder_args, self.toolchain.find('ffmpeg', self.config.get('ffmpeg_path')),
+                self.config.get('sink'))
+            
+            # Repeat renders (same input bytes and output parameters) are served from the cache
+            # before any dependency check, so a hit needs neither Potrace nor FFmpeg
+            cache = OutputCache.for_render(
+                self.config, 'potrace', self.metadata['version'], [input_png],
+                output_mp4, ('.svg', '_cleaned.png', '_metadata.json'), self.encoder_args)
+            if cache and cache.fetch({'variant': self.metadata['variant'], 'timestamp': self.metadata['timestamp']}):
+                self.progress.stage('done')
+                return True
+            
+            self.progress.stage('extracting')
+            
             # Check dependencies
-            deps_ok, missing = self.check_dependencies()
+            with self.profiler.span('dependency_check'):
+                deps_ok, missing = self.check_dependencies()
+            self.metadata['processing_params']['toolchain'] = self.toolchain.info()
             if not deps_ok:
                 logger.warning(f"Missing dependencies: {', '.join(missing)}")
-                if 'potrace' in missing or 'ffmpeg' in missing:
+                sink = self.config.get('sink', 'ffmpeg')
+                needs_ffmpeg = sink == 'ffmpeg' or (sink == 'pyav' and not pyav_available())
+                if 'potrace' in missing or ('ffmpeg' in missing and needs_ffmpeg):
                     logger.error("Required dependencies missing. Cannot proceed.")
                     return False
             
-            # Step 1: Preprocess image
-            cleaned_png = os.path.join(self.temp_dir, 'cleaned.png')
-            if not self.preprocess_image(input_png, cleaned_png):
-                return False
-            
-            # Step 2: Convert to PBM
-            pbm_path = os.path.join(self.temp_dir, 'input.pbm')
-            if not self.convert_to_pbm(cleaned_png, pbm_path):
-                return False
-            
-            # Step 3: Run Potrace
-            svg_path = os.path.join(self.temp_dir, 'output.svg')
-            if not self.run_potrace(pbm_path, svg_path):
+            # Steps 1-3: Preprocess, convert to PBM, run Potrace (and fit --deadline)
+            planner = RenderPlanner('potrace', self.config)
+            estimate = planner.prepare(self, input_png)
+            if estimate is None:
                 return False
+            self.progress.estimate(estimate)
+            if planner.steps and cache:
+                # --deadline lowered the settings: the cache entry is the one for the settings actually used
+                cache = OutputCache.for_render(
+                    self.config, 'potrace', self.metadata['version'], [input_png],
+                    output_mp4, ('.svg', '_cleaned.png', '_metadata.json'), self.encoder_args)
+                if cache and cache.fetch({'variant': self.metadata['variant'], 'timestamp': self.metadata['timestamp']}):
+                    self.progress.stage('done')
+                    return True
+            svg_path, cleaned_png = self.svg_path, self.cleaned_png
             
             # Step 4: Create animation (streaming)
-            if not self.create_animation_frames_stream(svg_path, output_mp4):
+            if not self.create_animation_frames_stream(svg_path, output_mp4, self.svg_paths):
                 return False
+            self.metadata['processing_params']['estimate'] = planner.finish(
+                self.profiler.summary(), time.perf_counter() - self.progress.render_start)
             
             # Step 5: Copy outputs
             output_dir = Path(output_mp4).parent
@@ -629,9 +648,15 @@ class SketchAnimator:
             final_png = output_dir / (Path(output_mp4).stem + '_cleaned.png')
             final_metadata = output_dir / (Path(output_mp4).stem + '_metadata.json')
             
-            shutil.copy2(svg_path, final_svg)
-            shutil.copy2(cleaned_png, final_png)
+            with self.profiler.span('save_outputs'):
+                shutil.copy2(svg_path, final_svg)
+                shutil.copy2(cleaned_png, final_png)
+            self.metadata['profile'] = self.profiler.finish(self.config.get('profile_trace'))
+            if cache:
+                self.metadata['cache'] = cache.info()
             self.save_metadata(str(final_metadata))
+            if cache:
+                cache.publish()
             
             logger.info(f"Output files:")
             logger.info(f"  MP4: {output_mp4}")
@@ -639,6 +664,7 @@ class SketchAnimator:
             logger.info(f"  PNG: {final_png}")
             logger.info(f"  Metadata: {final_metadata}")
             
+            self.progress.stage('done')
             return True
         except Exception as e:
             logger.error(f"Processing error: {e}")
@@ -671,12 +697,51 @@ Examples:
     parser.add_argument('--height', type=int, default=1080, help='Output height (default: 1080)')
     parser.add_argument('--denoise', action='store_true', default=True, help='Apply denoising (default: True)')
     parser.add_argument('--no-denoise', dest='denoise', action='store_false', help='Disable denoising')
+    parser.add_argument('--denoise-mode', choices=['auto', 'full', 'downscale', 'skip'], default='auto',
+                        help='Denoising path: auto picks skip/downscale/full from estimated noise (default: auto)')
     parser.add_argument('--enhance-contrast', action='store_true', default=True, help='Enhance contrast (default: True)')
     parser.add_argument('--no-enhance-contrast', dest='enhance_contrast', action='store_false', help='Disable contrast enhancement')
     parser.add_argument('--skeletonize', action='store_true', help='Apply skeletonization')
+    parser.add_argument('--skeleton-method', choices=['auto', 'zhangsuen', 'guohall', 'morphological'], default='auto',
+                        help='Thinning algorithm used by --skeletonize (default: auto)')
     parser.add_argument('--variant', default='default', help='Variant name for metadata')
     parser.add_argument('--seed', type=int, help='Random seed for metadata')
     parser.add_argument('--ffmpeg-path', help='Path to FFmpeg binary (auto-detected if not specified)')
+    parser.add_argument('--profile-trace', help='Write a per-stage/per-frame timing trace (.json = Chrome trace, .jsonl = JSON lines)')
+    parser.add_argument('--progress-json', action='store_true',
+                        help='Emit rate-limited JSON-lines progress events on stdout')
+    parser.add_argument('--sink', choices=['ffmpeg', 'pyav', 'null', 'raw'], default='ffmpeg',
+                        help='Frame destination: ffmpeg encodes the MP4 in a subprocess, pyav encodes it in-process '
+                             '(needs PyAV, else falls back to ffmpeg), null discards frames (render cost only), '
+                             'raw writes --output as .y4m or headerless rgb24 (default: ffmpeg)')
+    parser.add_argument('--pipe-format', choices=['rgb24', 'y4m'], default='rgb24',
+                        help='FFmpeg pipe payload: packed rawvideo, or I420 in a Y4M stream '
+                             '(half the bytes, no swscale pass; default: rgb24)')
+    parser.add_argument('--encoder-stall-timeout', type=float, default=30,
+                        help='Kill FFmpeg only after this many seconds without encoder progress; 0 disables (default: 30)')
+    parser.add_argument('--encoder-timeout', type=float, default=None,
+                        help='Hard cap in seconds on waiting for FFmpeg after the last frame (default: none)')
+    parser.add_argument('--container', choices=['mp4', 'fmp4', 'hls'], default='mp4',
+                        help='mp4 moves the index to the front after encoding (+faststart); fmp4 writes a '
+                             'fragmented MP4 that can be streamed while it is still being written; hls writes '
+                             '--output as an .m3u8 playlist of 2 s CMAF segments, updated as each one completes '
+                             '(default: mp4)')
+    parser.add_argument('--render-threads', type=int, default=0,
+                        help='Frames rendered concurrently (0 = one per core, up to 8; 1 = sequential)')
+    parser.add_argument('--cache-dir', default=None,
+                        help='Reuse finished renders from this content-addressed output cache '
+                             '(default: $SKETCH_CACHE_DIR; unset = no cache)')
+    parser.add_argument('--cache-max-mb', type=float, default=None,
+                        help=f'Evict least recently used cache entries beyond this size (default: {DEFAULT_MAX_MB})')
+    parser.add_argument('--no-cache', action='store_true', help='Always render, even on a cache hit')
+    parser.add_argument('--deadline', type=float, default=None, metavar='SECONDS',
+                        help='Lower the preset, fps and then resolution until the job is predicted '
+                             'to finish within SECONDS (default: no deadline)')
+    parser.add_argument('--cost-model', default=None,
+                        help='JSON file of render-time corrections, updated after every render '
+                             '(default: $SKETCH_COST_MODEL; unset = built-in costs)')
+    parser.add_argument('--frame', type=float, default=None, metavar='T',
+                        help='Render only the frame at T seconds to --output (.png/.jpg) instead of the video')
     parser.add_argument('--verbose', '-v', action='store_true', help='Verbose logging')
     
     args = parser.parse_args()
@@ -696,16 +761,34 @@ Examples:
         'width': args.width,
         'height': args.height,
         'denoise': args.denoise,
+        'denoise_mode': args.denoise_mode,
         'enhance_contrast': args.enhance_contrast,
         'skeletonize': args.skeletonize,
+        'skeleton_method': args.skeleton_method,
         'variant': args.variant,
         'seed': args.seed,
-        'ffmpeg_path': args.ffmpeg_path
+        'ffmpeg_path': args.ffmpeg_path,
+        'profile_trace': args.profile_trace,
+        'progress_json': args.progress_json,
+        'sink': args.sink,
+        'pipe_format': args.pipe_format,
+        'encoder_stall_timeout': args.encoder_stall_timeout,
+        'encoder_timeout': args.encoder_timeout,
+        'container': args.container,
+        'render_threads': args.render_threads,
+        'cache_dir': args.cache_dir,
+        'cache_max_mb': args.cache_max_mb,
+        'no_cache': args.no_cache,
+        'deadline': args.deadline,
+        'cost_model': args.cost_model,
     }
     
     # Create animator and process
     animator = SketchAnimator(config)
-    success = animator.process(args.input, args.output)
+    if args.frame is not None:
+        success = render_poster(animator, args.input, args.output, args.frame) is not None
+    else:
+        success = animator.process(args.input, args.output)
     
     sys.exit(0 if success else 1)
 
@@ -6,16 +6,30 @@ Animates colored images with stroke-by-stroke appearance while keeping colors.
 
 import os
 import sys
-import cv2
-import numpy as np
-import subprocess
 import argparse
 import logging
 import json
 import tempfile
 import shutil
+import time
 from pathlib import Path
 
+from sketch_profile import StageProfiler
+from sketch_progress import ProgressReporter
+from sketch_sinks import create_sink
+from sketch_cache import OutputCache, DEFAULT_MAX_MB
+from sketch_parallel import OrderedFrameRenderer
+from sketch_geometry import reveal_order
+from sketch_poster import frame_at, render_poster
+from sketch_timeline import Timeline, linear_ends
+from sketch_cost import RenderPlanner
+from sketch_toolchain import Toolchain
+from sketch_lazy import lazy_import
+
+# OpenCV/NumPy load on first use: --help, argument errors and cache hits skip them
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -24,27 +38,28 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-sys.stdout.reconfigure(encoding='utf-8')
-sys.stderr.reconfigure(encoding='utf-8')
-
 
 class ColorSketchAnimator:
     """Fast color-preserving sketch animator."""
     
+    # x264 profile of the MP4 (also part of the output cache key)
+    ENCODER_ARGS = ['-c:v', 'libx264', '-preset', 'fast', '-crf', '23',
+                    '-pix_fmt', 'yuv420p', '-movflags', '+faststart']
+    
     def __init__(self, config: dict):
         self.config = config
         self.temp_dir = tempfile.mkdtemp(prefix='sketch_color_')
         self.metadata = {'version': '3.0-color', 'variant': config.get('variant', 'pen-sketch')}
+        self.profiler = StageProfiler(trace=bool(config.get('profile_trace')))
+        self.encoder_args = list(self.ENCODER_ARGS)  # --deadline may pick a faster preset
         logger.info(f"Temp directory: {self.temp_dir}")
         
-        self.ffmpeg_cmd = self._find_ffmpeg()
+        # Find FFmpeg (node_modules/ffmpeg-static, then PATH; cached, see sketch_toolchain.py)
+        self.toolchain = Toolchain.for_config(config)
+        self.ffmpeg_cmd = self.toolchain.find('ffmpeg')
         if self.ffmpeg_cmd:
             logger.info(f"Using FFmpeg: {self.ffmpeg_cmd}")
     
-    def _find_ffmpeg(self):
-        node_ffmpeg = Path(os.getcwd()) / 'node_modules' / 'ffmpeg-static' / 'ffmpeg.exe'
-        return str(node_ffmpeg) if node_ffmpeg.exists() else shutil.which('ffmpeg') or 'ffmpeg'
-    
     def preprocess_color_image(self, input_path: str, width: int, height: int):
         """Load and preprocess while keeping colors."""
         try:
@@ -81,6 +96,69 @@ class ColorSketchAnimator:
             logger.error(f"Preprocessing error: {e}")
             return None, None, None
     
+    def prepare(self, input_png: str) -> bool:
+        """Load the image and build the reveal timeline (flat pixel order), shared by video and single frames."""
+        width = self.config.get('width', 1920)
+        height = self.config.get('height', 1080)
+        # Load color image
+        with self.profiler.span('preprocess'):
+            img_color, edges, stroke_map = self.preprocess_color_image(input_png, width, height)
+        if img_color is None:
+            return False
+        
+        # Find stroke pixels (non-white areas + edges)
+        gray = cv2.cvtColor(img_color, cv2.COLOR_BGR2GRAY)
+        _, mask = cv2.threshold(gray, 250, 255, cv2.THRESH_BINARY_INV)
+        mask = cv2.bitwise_or(mask, stroke_map)
+        
+        if not mask.any():
+            # Nothing detected: reveal whatever is not pure white (nothing at all for a blank page)
+            logger.warning("No stroke pixels found, revealing all non-white pixels")
+            mask = img_color.min(axis=2) < 255
+        
+        # Sort pixels for natural drawing order (top-left to bottom-right with some randomness)
+        # Score = y*0.6 + x*0.4 + small_random (creates diagonal sweep with variation);
+        # pixels are kept as flat uint32 indices (y * width + x)
+        with self.profiler.span('pixel_order'):
+            rng = np.random.default_rng(self.config.get('seed', 42))  # Per-job seed: reproducible
+            stroke_pixels = reveal_order(mask, 0.6, 0.4, 20, rng=rng)
+        
+        logger.info(f"Sorted {len(stroke_pixels)} stroke pixels for natural drawing progression")
+        self.img_color, self.stroke_pixels = img_color, stroke_pixels
+        self.timeline = self.compile_timeline()
+        return True
+    
+    def compile_timeline(self):
+        """Pixels revealed by the end of each frame."""
+        fps = self.config.get('fps', 30)
+        total_frames = int(fps * self.config.get('duration', 5.0))
+        timeline = Timeline('color', total_frames, fps)
+        timeline.add_range('pixels', linear_ends(len(self.stroke_pixels), total_frames))
+        return timeline
+    
+    def render_index(self, frame_idx: int, canvas):
+        """Render frame frame_idx into canvas; frames depend only on their index (thread-safe)."""
+        # Pixels revealed by this frame (compiled timeline)
+        pixels_to_draw = self.timeline.end('pixels', frame_idx)
+        
+        # Start with white canvas
+        canvas.fill(255)
+        
+        # Draw revealed pixels with their original colors
+        if pixels_to_draw > 0:
+            revealed_pixels = self.stroke_pixels[:pixels_to_draw]
+            canvas.reshape(-1, 3)[revealed_pixels] = self.img_color.reshape(-1, 3)[revealed_pixels]
+            
+            # Optional: Add slight blur for smoother appearance
+            if frame_idx > 0 and frame_idx % 10 == 0:
+                cv2.GaussianBlur(canvas, (3, 3), 0, dst=canvas)
+        return canvas
+    
+    def render_frame(self, t: float):
+        """Frame shown at t seconds, rendered directly from the timeline after prepare()."""
+        canvas = np.empty_like(self.img_color)
+        return self.render_index(frame_at(t, self.timeline.fps, self.timeline.total_frames), canvas)
+    
     def create_color_animation(self, input_png: str, output_mp4: str) -> bool:
         """Create color-preserving stroke animation."""
         try:
@@ -89,132 +167,108 @@ class ColorSketchAnimator:
             fps = self.config.get('fps', 30)
             duration = self.config.get('duration', 5.0)
             total_frames = int(fps * duration)
+            self.progress = ProgressReporter(total_frames, enabled=self.config.get('progress_json', False))
             
-            # Load color image
-            img_color, edges, stroke_map = self.preprocess_color_image(input_png, width, height)
-            if img_color is None:
-                return False
-            
-            logger.info(f"Generating {total_frames} color frames ({duration}s @ {fps}fps)")
-            
-            # Find stroke pixels (non-white areas + edges)
-            gray = cv2.cvtColor(img_color, cv2.COLOR_BGR2GRAY)
-            _, mask = cv2.threshold(gray, 250, 255, cv2.THRESH_BINARY_INV)
-            mask = cv2.bitwise_or(mask, stroke_map)
-            
-            # Get all pixels to draw (y, x coordinates)
-            stroke_pixels = np.column_stack(np.where(mask > 0))
-            total_pixels = len(stroke_pixels)
-            
-            if total_pixels == 0:
-                logger.warning("No stroke pixels found, using full image")
-                stroke_pixels = np.column_stack(np.where(np.ones((height, width), dtype=bool)))
-                total_pixels = len(stroke_pixels)
-            
-            logger.info(f"Found {total_pixels} stroke pixels to animate")
+            # The best encoder this FFmpeg build has (probed once per binary version)
+            self.encoder_args = self.toolchain.encoder_args(
+                self.encoder_args, self.ffmpeg_cmd, self.config.get('sink'))
+            self.metadata['toolchain'] = self.toolchain.info()
             
-            # Sort pixels for natural drawing order (top-left to bottom-right with some randomness)
-            # Score = y*0.6 + x*0.4 + small_random (creates diagonal sweep with variation)
-            np.random.seed(42)  # Reproducible
-            scores = stroke_pixels[:, 0] * 0.6 + stroke_pixels[:, 1] * 0.4 + np.random.randn(total_pixels) * 20
-            sorted_indices = np.argsort(scores)
-            stroke_pixels = stroke_pixels[sorted_indices]
+            # Repeat renders (same input bytes and output parameters) are served from the cache
+            cache = OutputCache.for_render(
+                self.config, 'color', self.metadata['version'], [input_png],
+                output_mp4, ('_original.png', '_metadata.json'), self.encoder_args)
+            if cache and cache.fetch({'variant': self.metadata['variant']}):
+                self.progress.stage('done')
+                return True
             
-            logger.info("Sorted pixels for natural drawing progression")
+            self.progress.stage('extracting')
+            planner = RenderPlanner('color', self.config)
+            estimate = planner.prepare(self, input_png)
+            if estimate is None:
+                return False
+            self.progress.estimate(estimate)
+            if planner.steps:
+                # --deadline lowered the settings: the cache entry is the one for the settings actually used
+                width, height = self.config['width'], self.config['height']
+                fps, total_frames = self.timeline.fps, self.timeline.total_frames
+                cache = cache and OutputCache.for_render(
+                    self.config, 'color', self.metadata['version'], [input_png],
+                    output_mp4, ('_original.png', '_metadata.json'), self.encoder_args)
+                if cache and cache.fetch({'variant': self.metadata['variant']}):
+                    self.progress.stage('done')
+                    return True
+            img_color, total_pixels = self.img_color, len(self.stroke_pixels)
             
-            # Start FFmpeg
-            ffmpeg_args = [
-                self.ffmpeg_cmd, '-y',
-                '-f', 'rawvideo', '-vcodec', 'rawvideo',
-                '-s', f'{width}x{height}', '-pix_fmt', 'rgb24', '-r', str(fps),
-                '-i', '-',
-                '-c:v', 'libx264', '-preset', 'fast', '-crf', '23',
-                '-pix_fmt', 'yuv420p', '-movflags', '+faststart',
-                output_mp4
-            ]
+            logger.info(f"Generating {total_frames} color frames ({duration}s @ {fps}fps)")
             
-            ffmpeg_process = subprocess.Popen(
-                ffmpeg_args,
-                stdin=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                stdout=subprocess.DEVNULL,
-                bufsize=10**8
+            # Open the frame sink (FFmpeg pipe unless --sink null/raw)
+            self.sink = create_sink(
+                self.config.get('sink', 'ffmpeg'), output_mp4, width, height, fps, total_frames,
+                ffmpeg_cmd=self.ffmpeg_cmd, progress=self.progress,
+                pixel_order='bgr', pipe_format=self.config.get('pipe_format', 'rgb24'),
+                stall_timeout=self.config.get('encoder_stall_timeout', 30),
+                timeout=self.config.get('encoder_timeout'),
+                container=self.config.get('container', 'mp4'),
+                encoder_args=self.encoder_args
             )
             
-            # Background thread for stderr
-            import threading, queue
-            stderr_queue = queue.Queue()
-            def read_stderr():
-                try:
-                    for line in ffmpeg_process.stderr:
-                        stderr_queue.put(line)
-                except: pass
-            threading.Thread(target=read_stderr, daemon=True).start()
-            
-            # Create white background
-            white_bg = np.ones((height, width, 3), dtype=np.uint8) * 255
+            # Every frame depends only on frame_idx: render it straight into a ring buffer
+            renderer = OrderedFrameRenderer(self.render_index, (height, width, 3),
+                                            threads=self.config.get('render_threads', 0), profiler=self.profiler)
             
             # Generate frames progressively
             logger.info("Generating color frames with progressive drawing...")
             
-            for frame_idx in range(total_frames):
-                # Calculate pixels to reveal
-                progress = (frame_idx + 1) / total_frames
-                pixels_to_draw = int(total_pixels * progress)
-                
-                # Start with white canvas
-                canvas = white_bg.copy()
+            self.progress.stage('rendering')
+            for frame_idx, canvas in renderer.frames(total_frames):
+                # Write the BGR frame (the sink converts, or FFmpeg reads bgr24 directly)
+                t = time.perf_counter()
+                self.sink.write(canvas)
+                self.profiler.lap('write', t)
                 
-                # Draw revealed pixels with their original colors
-                if pixels_to_draw > 0:
-                    revealed_pixels = stroke_pixels[:pixels_to_draw]
-                    ys = revealed_pixels[:, 0]
-                    xs = revealed_pixels[:, 1]
-                    canvas[ys, xs] = img_color[ys, xs]
-                    
-                    # Optional: Add slight blur for smoother appearance
-                    if frame_idx > 0 and frame_idx % 10 == 0:
-                        canvas = cv2.GaussianBlur(canvas, (3, 3), 0)
-                
-                # Convert BGR to RGB for FFmpeg
-                canvas_rgb = cv2.cvtColor(canvas, cv2.COLOR_BGR2RGB)
-                
-                # Write to FFmpeg
-                ffmpeg_process.stdin.write(canvas_rgb.tobytes())
+                self.progress.update(frame_idx + 1)
                 
                 if (frame_idx + 1) % 25 == 0 or frame_idx == 0:
                     logger.info(f"Generated {frame_idx + 1}/{total_frames} frames ({(frame_idx + 1)/total_frames*100:.1f}%)")
             
             # Close and wait
-            ffmpeg_process.stdin.close()
-            logger.info("Waiting for FFmpeg to finish encoding...")
-            return_code = ffmpeg_process.wait(timeout=60)
-            
-            if return_code != 0:
-                stderr_lines = []
-                while not stderr_queue.empty():
-                    try: stderr_lines.append(stderr_queue.get_nowait().decode('utf-8', errors='ignore'))
-                    except: break
-                logger.error(f"FFmpeg failed: {''.join(stderr_lines)}")
-                return False
+            self.progress.update(total_frames, force=True)
+            self.progress.stage('encoding')
+            logger.info(f"Waiting for {self.sink.kind} sink to finish...")
+            with self.profiler.span('encoder_wait'):
+                if not self.sink.close():
+                    return False
+            total_seconds = time.perf_counter() - self.progress.render_start
             
             logger.info(f"✓ Color animation complete: {output_mp4}")
             
             # Save outputs
             output_dir = Path(output_mp4).parent
             final_png = output_dir / (Path(output_mp4).stem + '_original.png')
-            cv2.imwrite(str(final_png), img_color)
+            with self.profiler.span('save_outputs'):
+                cv2.imwrite(str(final_png), img_color)
             
             metadata_path = output_dir / (Path(output_mp4).stem + '_metadata.json')
             self.metadata['total_pixels'] = int(total_pixels)
+            self.metadata['render'] = renderer.info()
+            self.metadata['timeline'] = self.timeline.info()
+            self.metadata['sink'] = self.sink.info()
+            self.metadata['estimate'] = planner.finish(self.profiler.summary(), total_seconds)
+            self.metadata['profile'] = self.profiler.finish(self.config.get('profile_trace'))
+            if cache:
+                self.metadata['cache'] = cache.info()
             with open(metadata_path, 'w') as f:
                 json.dump(self.metadata, f, indent=2)
+            if cache:
+                cache.publish()
             
             logger.info(f"Output files:")
             logger.info(f"  MP4: {output_mp4}")
             logger.info(f"  PNG: {final_png}")
             logger.info(f"  Metadata: {metadata_path}")
             
+            self.progress.stage('done')
             return True
         except Exception as e:
             logger.error(f"Animation error: {e}")
@@ -228,6 +282,8 @@ class ColorSketchAnimator:
 
 
 def main():
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
     parser = argparse.ArgumentParser(description='Create color pen sketch animation')
     parser.add_argument('input', help='Input PNG file')
     parser.add_argument('--output', required=True, help='Output MP4 file')
@@ -237,6 +293,43 @@ def main():
     parser.add_argument('--height', type=int, default=1080, help='Output height')
     parser.add_argument('--variant', default='pen-sketch', help='Animation variant')
     parser.add_argument('--skeletonize', action='store_true', help='Skeletonize (ignored for color)')
+    parser.add_argument('--profile-trace', help='Write a per-stage/per-frame timing trace (.json = Chrome trace, .jsonl = JSON lines)')
+    parser.add_argument('--progress-json', action='store_true',
+                        help='Emit rate-limited JSON-lines progress events on stdout')
+    parser.add_argument('--sink', choices=['ffmpeg', 'pyav', 'null', 'raw'], default='ffmpeg',
+                        help='Frame destination: ffmpeg encodes the MP4 in a subprocess, pyav encodes it in-process '
+                             '(needs PyAV, else falls back to ffmpeg), null discards frames (render cost only), '
+                             'raw writes --output as .y4m or headerless rgb24 (default: ffmpeg)')
+    parser.add_argument('--pipe-format', choices=['rgb24', 'y4m'], default='rgb24',
+                        help='FFmpeg pipe payload: packed rawvideo, or I420 in a Y4M stream '
+                             '(half the bytes, no swscale pass; default: rgb24)')
+    parser.add_argument('--encoder-stall-timeout', type=float, default=30,
+                        help='Kill FFmpeg only after this many seconds without encoder progress; 0 disables (default: 30)')
+    parser.add_argument('--encoder-timeout', type=float, default=None,
+                        help='Hard cap in seconds on waiting for FFmpeg after the last frame (default: none)')
+    parser.add_argument('--container', choices=['mp4', 'fmp4', 'hls'], default='mp4',
+                        help='mp4 moves the index to the front after encoding (+faststart); fmp4 writes a '
+                             'fragmented MP4 that can be streamed while it is still being written; hls writes '
+                             '--output as an .m3u8 playlist of 2 s CMAF segments, updated as each one completes '
+                             '(default: mp4)')
+    parser.add_argument('--render-threads', type=int, default=0,
+                        help='Frames rendered concurrently (0 = one per core, up to 8; 1 = sequential)')
+    parser.add_argument('--seed', type=int, default=42,
+                        help='Seed for the reveal-order jitter; same seed, same video (default: 42)')
+    parser.add_argument('--cache-dir', default=None,
+                        help='Reuse finished renders from this content-addressed output cache '
+                             '(default: $SKETCH_CACHE_DIR; unset = no cache)')
+    parser.add_argument('--cache-max-mb', type=float, default=None,
+                        help=f'Evict least recently used cache entries beyond this size (default: {DEFAULT_MAX_MB})')
+    parser.add_argument('--no-cache', action='store_true', help='Always render, even on a cache hit')
+    parser.add_argument('--deadline', type=float, default=None, metavar='SECONDS',
+                        help='Lower the preset, fps and then resolution until the job is predicted '
+                             'to finish within SECONDS (default: no deadline)')
+    parser.add_argument('--cost-model', default=None,
+                        help='JSON file of render-time corrections, updated after every render '
+                             '(default: $SKETCH_COST_MODEL; unset = built-in costs)')
+    parser.add_argument('--frame', type=float, default=None, metavar='T',
+                        help='Render only the frame at T seconds to --output (.png/.jpg) instead of the video')
     
     args = parser.parse_args()
     
@@ -246,11 +339,28 @@ def main():
         'width': args.width,
         'height': args.height,
         'variant': args.variant,
+        'profile_trace': args.profile_trace,
+        'progress_json': args.progress_json,
+        'sink': args.sink,
+        'pipe_format': args.pipe_format,
+        'encoder_stall_timeout': args.encoder_stall_timeout,
+        'encoder_timeout': args.encoder_timeout,
+        'container': args.container,
+        'render_threads': args.render_threads,
+        'seed': args.seed,
+        'cache_dir': args.cache_dir,
+        'cache_max_mb': args.cache_max_mb,
+        'no_cache': args.no_cache,
+        'deadline': args.deadline,
+        'cost_model': args.cost_model,
         'enhance': True,
     }
     
     animator = ColorSketchAnimator(config)
-    success = animator.create_color_animation(args.input, args.output)
+    if args.frame is not None:
+        success = render_poster(animator, args.input, args.output, args.frame) is not None
+    else:
+        success = animator.create_color_animation(args.input, args.output)
     
     result = {
         'success': success,
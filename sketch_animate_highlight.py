@@ -6,16 +6,30 @@ Animates with marker/highlighter effect, drawing cursor, and glow.
 
 import os
 import sys
-import cv2
-import numpy as np
-import subprocess
 import argparse
 import logging
 import json
 import tempfile
 import shutil
+import time
 from pathlib import Path
 
+from sketch_profile import StageProfiler
+from sketch_progress import ProgressReporter
+from sketch_sinks import create_sink
+from sketch_cache import OutputCache, DEFAULT_MAX_MB
+from sketch_tiles import TileCanvas, DEFAULT_TILE_SIZE
+from sketch_geometry import reveal_order
+from sketch_poster import frame_at, render_poster
+from sketch_timeline import Timeline, linear_ends
+from sketch_cost import RenderPlanner
+from sketch_toolchain import Toolchain
+from sketch_lazy import lazy_import
+
+# OpenCV/NumPy load on first use: --help, argument errors and cache hits skip them
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
@@ -23,27 +37,31 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-sys.stdout.reconfigure(encoding='utf-8')
-sys.stderr.reconfigure(encoding='utf-8')
-
 
 class HighlightAnimator:
     """Educational-style highlighting animation with marker cursor."""
     
+    # x264 profile of the MP4 (also part of the output cache key)
+    ENCODER_ARGS = ['-c:v', 'libx264', '-preset', 'fast', '-crf', '20',
+                    '-pix_fmt', 'yuv420p', '-movflags', '+faststart']
+    
+    # Length of the glow trail behind the marker
+    TRAIL_SECONDS = 0.3
+    
     def __init__(self, config: dict):
         self.config = config
         self.temp_dir = tempfile.mkdtemp(prefix='sketch_highlight_')
         self.metadata = {'version': '4.0-highlight', 'variant': config.get('variant', 'pen-sketch')}
+        self.profiler = StageProfiler(trace=bool(config.get('profile_trace')))
+        self.encoder_args = list(self.ENCODER_ARGS)  # --deadline may pick a faster preset
         logger.info(f"Temp directory: {self.temp_dir}")
         
-        self.ffmpeg_cmd = self._find_ffmpeg()
+        # Find FFmpeg (node_modules/ffmpeg-static, then PATH; cached, see sketch_toolchain.py)
+        self.toolchain = Toolchain.for_config(config)
+        self.ffmpeg_cmd = self.toolchain.find('ffmpeg')
         if self.ffmpeg_cmd:
             logger.info(f"Using FFmpeg: {self.ffmpeg_cmd}")
     
-    def _find_ffmpeg(self):
-        node_ffmpeg = Path(os.getcwd()) / 'node_modules' / 'ffmpeg-static' / 'ffmpeg.exe'
-        return str(node_ffmpeg) if node_ffmpeg.exists() else shutil.which('ffmpeg') or 'ffmpeg'
-    
     def preprocess_image(self, input_path: str, width: int, height: int):
         """Load and enhance image."""
         try:
@@ -77,6 +95,151 @@ class HighlightAnimator:
             logger.error(f"Preprocessing error: {e}")
             return None, None, None
     
+    def prepare(self, input_png: str) -> bool:
+        """Load the image and build the reveal timeline (flat pixel order), shared by video and single frames."""
+        width = self.config.get('width', 1920)
+        height = self.config.get('height', 1080)
+        # Load and process image
+        with self.profiler.span('preprocess'):
+            img_color, edges, stroke_map = self.preprocess_image(input_png, width, height)
+        if img_color is None:
+            return False
+        
+        # Find all pixels to draw (prioritize edges and colored areas)
+        gray = cv2.cvtColor(img_color, cv2.COLOR_BGR2GRAY)
+        _, content_mask = cv2.threshold(gray, 250, 255, cv2.THRESH_BINARY_INV)
+        
+        # Combine edges and content
+        drawing_mask = cv2.bitwise_or(content_mask, stroke_map)
+        
+        if not drawing_mask.any():
+            # Nothing detected: reveal whatever is not pure white (nothing at all for a blank page)
+            logger.warning("No content found, revealing all non-white pixels")
+            drawing_mask = img_color.min(axis=2) < 255
+        
+        # Create drawing path: left-to-right, top-to-bottom with local clustering
+        # (Y and X weighted equally, plus local variation); pixels are flat uint32 indices
+        with self.profiler.span('pixel_order'):
+            rng = np.random.default_rng(self.config.get('seed', 42))  # Per-job seed: reproducible
+            stroke_pixels = reveal_order(drawing_mask, 0.5, 0.5, 30, rng=rng)
+        
+        logger.info(f"Created natural drawing path through {len(stroke_pixels)} pixels")
+        self.img_color, self.stroke_pixels = img_color, stroke_pixels
+        self.timeline = self.compile_timeline()
+        return True
+    
+    def compile_timeline(self):
+        """Pixels revealed, start of the glow trail and cursor per frame."""
+        width = self.config.get('width', 1920)
+        fps = self.config.get('fps', 30)
+        total_frames = int(fps * self.config.get('duration', 5.0))
+        stroke_pixels = self.stroke_pixels
+        timeline = Timeline('highlight', total_frames, fps)
+        pixels = linear_ends(len(stroke_pixels), total_frames)
+        timeline.add_range('pixels', pixels)
+        timeline.set_values('glow_start', np.maximum(0, pixels - int(fps * self.TRAIL_SECONDS) * 50))
+        drawing = (pixels > 0) & (pixels < len(stroke_pixels))
+        cursor_y, cursor_x = np.divmod(stroke_pixels[pixels[drawing]].astype(np.int64), width)
+        timeline.cursor[drawing] = np.column_stack((cursor_x, cursor_y))
+        return timeline
+    
+    def draw_effects(self, tiles, glow_buffer, frame_idx: int):
+        """
+        Draw frame_idx's glow trail and marker cursor into tiles.frame (both come from
+        the compiled timeline); glow_buffer must be zero and is left zeroed.
+        """
+        pixels_drawn = self.timeline.end('pixels', frame_idx)
+        if pixels_drawn <= 0:
+            return
+        canvas = tiles.frame
+        width = tiles.width
+        height = tiles.height
+        
+        # Highlighting effect parameters
+        highlight_trail_frames = int(self.timeline.fps * self.TRAIL_SECONDS)
+        cursor_size = 25  # Drawing cursor size
+        glow_blur = 21
+        glow_color = np.array([20, 30, 50], dtype=np.float32)  # Warm yellow-orange glow
+        
+        # Add highlighting glow effect on recently drawn pixels
+        # Create glow for last N pixels (trailing highlighter effect)
+        glow_start = self.timeline.value('glow_start', frame_idx)
+        if pixels_drawn > glow_start:
+            recent_ys, recent_xs = np.divmod(self.stroke_pixels[glow_start:pixels_drawn], width)
+            recent_count = len(recent_ys)
+            
+            for i, (py, px) in enumerate(zip(recent_ys.tolist(), recent_xs.tolist())):
+                # Fade from strong to weak
+                age = recent_count - i
+                intensity = min(1.0, age / (highlight_trail_frames * 10))
+                
+                # Draw glow circle
+                cv2.circle(glow_buffer, (px, py), 8, intensity, -1)
+            
+            # Blur and apply the glow only on tiles it can reach (circle + blur radius);
+            # each window carries a blur-radius halo so tile seams match a full-frame blur
+            halo = glow_blur // 2
+            glow_tiles = tiles.tiles_near(recent_ys, recent_xs, 8 + halo + 1)
+            glow_runs = list(tiles.runs(glow_tiles))
+            for x0, y0, x1, y1 in glow_runs:
+                wx0, wy0 = max(0, x0 - halo), max(0, y0 - halo)
+                wx1, wy1 = min(width, x1 + halo), min(height, y1 + halo)
+                glow = cv2.GaussianBlur(glow_buffer[wy0:wy1, wx0:wx1], (glow_blur, glow_blur), 0)
+                glow = glow[y0 - wy0:y1 - wy0, x0 - wx0:x1 - wx0, np.newaxis]
+                
+                # Brighten with warm glow
+                region = canvas[y0:y1, x0:x1].astype(np.float32)
+                region += glow * glow_color
+                canvas[y0:y1, x0:x1] = np.clip(region, 0, 255).astype(np.uint8)
+            for x0, y0, x1, y1 in glow_runs:
+                glow_buffer[y0:y1, x0:x1] = 0
+            tiles.add_overlay(glow_tiles)
+        
+        # Draw animated cursor/marker at current position
+        cursor = self.timeline.cursor_at(frame_idx)
+        if cursor is not None:
+            cursor_x, cursor_y = cursor
+            
+            # Pulsing cursor effect
+            pulse = 0.8 + 0.2 * np.sin(frame_idx * 0.3)
+            cursor_radius = int(cursor_size * pulse)
+            
+            window = tiles.overlay_window(cursor_x - cursor_radius - 3, cursor_y - cursor_radius - 3,
+                                          cursor_x + cursor_radius + 4, cursor_y + cursor_radius + 4)
+            if window:
+                x0, y0, x1, y1 = window
+                region = canvas[y0:y1, x0:x1]
+                
+                # Draw cursor as semi-transparent circle
+                overlay = region.copy()
+                cv2.circle(overlay, (cursor_x - x0, cursor_y - y0), cursor_radius,
+                         (100, 150, 255), -1)  # Blue marker cursor
+                cv2.circle(overlay, (cursor_x - x0, cursor_y - y0), cursor_radius,
+                         (50, 100, 200), 3)  # Darker border
+                
+                # Blend cursor with canvas (semi-transparent)
+                alpha = 0.4
+                cv2.addWeighted(region, 1-alpha, overlay, alpha, 0, dst=region)
+    
+    def render_frame(self, t: float):
+        """
+        Frame shown at t seconds, built directly from the timeline after prepare():
+        one scatter of the pixels revealed so far plus that frame's glow and cursor.
+        """
+        width = self.config.get('width', 1920)
+        height = self.config.get('height', 1080)
+        frame_idx = frame_at(t, self.timeline.fps, self.timeline.total_frames)
+        pixels_drawn = self.timeline.end('pixels', frame_idx)
+        
+        tiles = TileCanvas(np.full((height, width, 3), 255, dtype=np.uint8),
+                           self.config.get('tile_size', DEFAULT_TILE_SIZE))
+        revealed = self.stroke_pixels[:pixels_drawn]
+        tiles.layer.reshape(-1, 3)[revealed] = self.img_color.reshape(-1, 3)[revealed]
+        tiles.mark_all()
+        tiles.compose()
+        self.draw_effects(tiles, np.zeros((height, width), dtype=np.float32), frame_idx)
+        return tiles.frame
+    
     def create_highlight_animation(self, input_png: str, output_mp4: str) -> bool:
         """Create highlighting-style animation with marker cursor."""
         try:
@@ -85,183 +248,124 @@ class HighlightAnimator:
             fps = self.config.get('fps', 30)
             duration = self.config.get('duration', 5.0)
             total_frames = int(fps * duration)
+            self.progress = ProgressReporter(total_frames, enabled=self.config.get('progress_json', False))
             
-            # Load and process image
-            img_color, edges, stroke_map = self.preprocess_image(input_png, width, height)
-            if img_color is None:
-                return False
-            
-            logger.info(f"Generating {total_frames} frames with highlighting effect ({duration}s @ {fps}fps)")
-            
-            # Find all pixels to draw (prioritize edges and colored areas)
-            gray = cv2.cvtColor(img_color, cv2.COLOR_BGR2GRAY)
-            _, content_mask = cv2.threshold(gray, 250, 255, cv2.THRESH_BINARY_INV)
+            # The best encoder this FFmpeg build has (probed once per binary version)
+            self.encoder_args = self.toolchain.encoder_args(
+                self.encoder_args, self.ffmpeg_cmd, self.config.get('sink'))
+            self.metadata['toolchain'] = self.toolchain.info()
             
-            # Combine edges and content
-            drawing_mask = cv2.bitwise_or(content_mask, stroke_map)
+            # Repeat renders (same input bytes and output parameters) are served from the cache
+            cache = OutputCache.for_render(
+                self.config, 'highlight', self.metadata['version'], [input_png],
+                output_mp4, ('_original.png', '_metadata.json'), self.encoder_args)
+            if cache and cache.fetch({'variant': self.metadata['variant']}):
+                self.progress.stage('done')
+                return True
             
-            # Get pixel coordinates
-            stroke_pixels = np.column_stack(np.where(drawing_mask > 0))
+            self.progress.stage('extracting')
+            planner = RenderPlanner('highlight', self.config)
+            estimate = planner.prepare(self, input_png)
+            if estimate is None:
+                return False
+            self.progress.estimate(estimate)
+            if planner.steps:
+                # --deadline lowered the settings: the cache entry is the one for the settings actually used
+                width, height = self.config['width'], self.config['height']
+                fps, total_frames = self.timeline.fps, self.timeline.total_frames
+                cache = cache and OutputCache.for_render(
+                    self.config, 'highlight', self.metadata['version'], [input_png],
+                    output_mp4, ('_original.png', '_metadata.json'), self.encoder_args)
+                if cache and cache.fetch({'variant': self.metadata['variant']}):
+                    self.progress.stage('done')
+                    return True
+            img_color, stroke_pixels, timeline = self.img_color, self.stroke_pixels, self.timeline
             total_pixels = len(stroke_pixels)
             
-            if total_pixels == 0:
-                logger.warning("No content found, using full image")
-                stroke_pixels = np.column_stack(np.where(np.ones((height, width), dtype=bool)))
-                total_pixels = len(stroke_pixels)
-            
-            logger.info(f"Found {total_pixels} pixels to animate")
-            
-            # Sort for natural drawing path (diagonal with some clustering)
-            np.random.seed(42)
-            
-            # Create drawing path: left-to-right, top-to-bottom with local clustering
-            scores = (stroke_pixels[:, 0] * 0.5 +  # Y coordinate (top to bottom)
-                     stroke_pixels[:, 1] * 0.5 +   # X coordinate (left to right)
-                     np.random.randn(total_pixels) * 30)  # Local variation for clustering
-            
-            sorted_indices = np.argsort(scores)
-            stroke_pixels = stroke_pixels[sorted_indices]
-            
-            logger.info("Created natural drawing path")
-            
-            # Start FFmpeg
-            ffmpeg_args = [
-                self.ffmpeg_cmd, '-y',
-                '-f', 'rawvideo', '-vcodec', 'rawvideo',
-                '-s', f'{width}x{height}', '-pix_fmt', 'rgb24', '-r', str(fps),
-                '-i', '-',
-                '-c:v', 'libx264', '-preset', 'fast', '-crf', '20',  # Higher quality
-                '-pix_fmt', 'yuv420p', '-movflags', '+faststart',
-                output_mp4
-            ]
+            logger.info(f"Generating {total_frames} frames with highlighting effect ({duration}s @ {fps}fps)")
             
-            ffmpeg_process = subprocess.Popen(
-                ffmpeg_args,
-                stdin=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                stdout=subprocess.DEVNULL,
-                bufsize=10**8
+            # Open the frame sink (FFmpeg pipe unless --sink null/raw)
+            self.sink = create_sink(
+                self.config.get('sink', 'ffmpeg'), output_mp4, width, height, fps, total_frames,
+                ffmpeg_cmd=self.ffmpeg_cmd, progress=self.progress,
+                pixel_order='bgr', pipe_format=self.config.get('pipe_format', 'rgb24'),
+                stall_timeout=self.config.get('encoder_stall_timeout', 30),
+                timeout=self.config.get('encoder_timeout'),
+                container=self.config.get('container', 'mp4'),
+                encoder_args=self.encoder_args
             )
             
-            # Background stderr reader
-            import threading, queue
-            stderr_queue = queue.Queue()
-            def read_stderr():
-                try:
-                    for line in ffmpeg_process.stderr:
-                        stderr_queue.put(line)
-                except: pass
-            threading.Thread(target=read_stderr, daemon=True).start()
-            
-            # Create base layers
-            white_bg = np.ones((height, width, 3), dtype=np.uint8) * 255
-            
-            # Highlighting effect parameters
-            highlight_trail_frames = int(fps * 0.3)  # 0.3 second glow trail
-            cursor_size = 25  # Drawing cursor size
+            # Persistent tiled canvas: revealed pixels accumulate in the layer, glow and
+            # cursor are drawn into the output frame and undone tile by tile next frame
+            tiles = TileCanvas(np.full((height, width, 3), 255, dtype=np.uint8),
+                               self.config.get('tile_size', DEFAULT_TILE_SIZE))
+            glow_buffer = np.zeros((height, width), dtype=np.float32)
+            img_pixels = img_color.reshape(-1, 3)
             
             logger.info("Generating frames with highlighting effect...")
             
             # Generate frames
+            self.progress.stage('rendering')
             for frame_idx in range(total_frames):
-                progress = (frame_idx + 1) / total_frames
-                pixels_drawn = int(total_pixels * progress)
-                
-                # Start with white canvas
-                canvas = white_bg.copy()
+                frame_start = time.perf_counter()
                 
-                # Draw all revealed pixels
-                if pixels_drawn > 0:
-                    revealed = stroke_pixels[:pixels_drawn]
-                    ys, xs = revealed[:, 0], revealed[:, 1]
-                    canvas[ys, xs] = img_color[ys, xs]
-                    
-                    # Add highlighting glow effect on recently drawn pixels
-                    # Create glow for last N pixels (trailing highlighter effect)
-                    glow_start = max(0, pixels_drawn - highlight_trail_frames * 50)
-                    if pixels_drawn > glow_start:
-                        recent_pixels = stroke_pixels[glow_start:pixels_drawn]
-                        
-                        # Create glow mask
-                        glow_mask = np.zeros((height, width), dtype=np.float32)
-                        
-                        for i, (py, px) in enumerate(recent_pixels):
-                            # Fade from strong to weak
-                            age = len(recent_pixels) - i
-                            intensity = min(1.0, age / (highlight_trail_frames * 10))
-                            
-                            # Draw glow circle
-                            cv2.circle(glow_mask, (px, py), 8, intensity, -1)
-                        
-                        # Apply glow (brighten colors)
-                        glow_mask = cv2.GaussianBlur(glow_mask, (21, 21), 0)
-                        glow_mask = glow_mask[:, :, np.newaxis]
-                        
-                        # Brighten with warm glow
-                        glow_color = np.array([20, 30, 50], dtype=np.float32)  # Warm yellow-orange glow
-                        canvas = canvas.astype(np.float32)
-                        canvas += glow_mask * glow_color
-                        canvas = np.clip(canvas, 0, 255).astype(np.uint8)
-                    
-                    # Draw animated cursor/marker at current position
-                    if pixels_drawn < total_pixels:
-                        cursor_y, cursor_x = stroke_pixels[pixels_drawn]
-                        
-                        # Pulsing cursor effect
-                        pulse = 0.8 + 0.2 * np.sin(frame_idx * 0.3)
-                        cursor_radius = int(cursor_size * pulse)
-                        
-                        # Draw cursor as semi-transparent circle
-                        overlay = canvas.copy()
-                        cv2.circle(overlay, (cursor_x, cursor_y), cursor_radius, 
-                                 (100, 150, 255), -1)  # Blue marker cursor
-                        cv2.circle(overlay, (cursor_x, cursor_y), cursor_radius, 
-                                 (50, 100, 200), 3)  # Darker border
-                        
-                        # Blend cursor with canvas (semi-transparent)
-                        alpha = 0.4
-                        canvas = cv2.addWeighted(canvas, 1-alpha, overlay, alpha, 0)
+                # Reveal only the pixels that are new this frame
+                start, end = timeline.span('pixels', frame_idx)
+                if end > start:
+                    new_pixels = stroke_pixels[start:end]
+                    tiles.layer.reshape(-1, 3)[new_pixels] = img_pixels[new_pixels]
+                    tiles.mark_points(*np.divmod(new_pixels, width))
+                canvas = tiles.compose()
+                self.draw_effects(tiles, glow_buffer, frame_idx)
                 
-                # Convert BGR to RGB for FFmpeg
-                canvas_rgb = cv2.cvtColor(canvas, cv2.COLOR_BGR2RGB)
+                # Write the BGR frame (the sink converts, or FFmpeg reads bgr24 directly)
+                t = self.profiler.lap('render', frame_start)
+                self.sink.write(canvas, dirty=tiles.dirty_rect())
+                self.profiler.lap('write', t)
                 
-                # Write frame
-                ffmpeg_process.stdin.write(canvas_rgb.tobytes())
+                self.progress.update(frame_idx + 1)
                 
                 if (frame_idx + 1) % 25 == 0 or frame_idx == 0:
                     logger.info(f"Generated {frame_idx + 1}/{total_frames} frames ({(frame_idx + 1)/total_frames*100:.1f}%)")
             
             # Finalize
-            ffmpeg_process.stdin.close()
-            logger.info("Waiting for FFmpeg to finish...")
-            return_code = ffmpeg_process.wait(timeout=60)
-            
-            if return_code != 0:
-                stderr_lines = []
-                while not stderr_queue.empty():
-                    try: stderr_lines.append(stderr_queue.get_nowait().decode('utf-8', errors='ignore'))
-                    except: break
-                logger.error(f"FFmpeg failed: {''.join(stderr_lines)}")
-                return False
+            self.progress.update(total_frames, force=True)
+            self.progress.stage('encoding')
+            logger.info(f"Waiting for {self.sink.kind} sink to finish...")
+            with self.profiler.span('encoder_wait'):
+                if not self.sink.close():
+                    return False
+            total_seconds = time.perf_counter() - self.progress.render_start
             
             logger.info(f"✓ Highlighting animation complete: {output_mp4}")
             
             # Save outputs
             output_dir = Path(output_mp4).parent
             final_png = output_dir / (Path(output_mp4).stem + '_original.png')
-            cv2.imwrite(str(final_png), img_color)
+            with self.profiler.span('save_outputs'):
+                cv2.imwrite(str(final_png), img_color)
             
             metadata_path = output_dir / (Path(output_mp4).stem + '_metadata.json')
             self.metadata['total_pixels'] = int(total_pixels)
             self.metadata['style'] = 'highlighting'
+            self.metadata['tiles'] = tiles.info()
+            self.metadata['timeline'] = timeline.info()
+            self.metadata['sink'] = self.sink.info()
+            self.metadata['estimate'] = planner.finish(self.profiler.summary(), total_seconds)
+            self.metadata['profile'] = self.profiler.finish(self.config.get('profile_trace'))
+            if cache:
+                self.metadata['cache'] = cache.info()
             with open(metadata_path, 'w') as f:
                 json.dump(self.metadata, f, indent=2)
+            if cache:
+                cache.publish()
             
             logger.info(f"Output files:")
             logger.info(f"  MP4: {output_mp4}")
             logger.info(f"  PNG: {final_png}")
             logger.info(f"  Metadata: {metadata_path}")
             
+            self.progress.stage('done')
             return True
         except Exception as e:
             logger.error(f"Animation error: {e}")
@@ -275,6 +379,8 @@ class HighlightAnimator:
 
 
 def main():
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
     parser = argparse.ArgumentParser(description='Create highlighting-style animation')
     parser.add_argument('input', help='Input PNG file')
     parser.add_argument('--output', required=True, help='Output MP4 file')
@@ -284,6 +390,44 @@ def main():
     parser.add_argument('--height', type=int, default=1080, help='Output height')
     parser.add_argument('--variant', default='pen-sketch', help='Animation variant')
     parser.add_argument('--skeletonize', action='store_true', help='Skeletonize (ignored)')
+    parser.add_argument('--profile-trace', help='Write a per-stage/per-frame timing trace (.json = Chrome trace, .jsonl = JSON lines)')
+    parser.add_argument('--progress-json', action='store_true',
+                        help='Emit rate-limited JSON-lines progress events on stdout')
+    parser.add_argument('--sink', choices=['ffmpeg', 'pyav', 'null', 'raw'], default='ffmpeg',
+                        help='Frame destination: ffmpeg encodes the MP4 in a subprocess, pyav encodes it in-process '
+                             '(needs PyAV, else falls back to ffmpeg), null discards frames (render cost only), '
+                             'raw writes --output as .y4m or headerless rgb24 (default: ffmpeg)')
+    parser.add_argument('--pipe-format', choices=['rgb24', 'y4m'], default='rgb24',
+                        help='FFmpeg pipe payload: packed rawvideo, or I420 in a Y4M stream '
+                             '(half the bytes, no swscale pass; default: rgb24)')
+    parser.add_argument('--encoder-stall-timeout', type=float, default=30,
+                        help='Kill FFmpeg only after this many seconds without encoder progress; 0 disables (default: 30)')
+    parser.add_argument('--encoder-timeout', type=float, default=None,
+                        help='Hard cap in seconds on waiting for FFmpeg after the last frame (default: none)')
+    parser.add_argument('--container', choices=['mp4', 'fmp4', 'hls'], default='mp4',
+                        help='mp4 moves the index to the front after encoding (+faststart); fmp4 writes a '
+                             'fragmented MP4 that can be streamed while it is still being written; hls writes '
+                             '--output as an .m3u8 playlist of 2 s CMAF segments, updated as each one completes '
+                             '(default: mp4)')
+    parser.add_argument('--tile-size', type=int, default=128,
+                        help='Tile edge in pixels for incremental rendering; only tiles touched by new '
+                             'strokes or effects are recomposed each frame (default: 128)')
+    parser.add_argument('--seed', type=int, default=42,
+                        help='Seed for the reveal-order jitter; same seed, same video (default: 42)')
+    parser.add_argument('--cache-dir', default=None,
+                        help='Reuse finished renders from this content-addressed output cache '
+                             '(default: $SKETCH_CACHE_DIR; unset = no cache)')
+    parser.add_argument('--cache-max-mb', type=float, default=None,
+                        help=f'Evict least recently used cache entries beyond this size (default: {DEFAULT_MAX_MB})')
+    parser.add_argument('--no-cache', action='store_true', help='Always render, even on a cache hit')
+    parser.add_argument('--deadline', type=float, default=None, metavar='SECONDS',
+                        help='Lower the preset, fps and then resolution until the job is predicted '
+                             'to finish within SECONDS (default: no deadline)')
+    parser.add_argument('--cost-model', default=None,
+                        help='JSON file of render-time corrections, updated after every render '
+                             '(default: $SKETCH_COST_MODEL; unset = built-in costs)')
+    parser.add_argument('--frame', type=float, default=None, metavar='T',
+                        help='Render only the frame at T seconds to --output (.png/.jpg) instead of the video')
     
     args = parser.parse_args()
     
@@ -293,10 +437,27 @@ def main():
         'width': args.width,
         'height': args.height,
         'variant': args.variant,
+        'profile_trace': args.profile_trace,
+        'progress_json': args.progress_json,
+        'sink': args.sink,
+        'pipe_format': args.pipe_format,
+        'encoder_stall_timeout': args.encoder_stall_timeout,
+        'encoder_timeout': args.encoder_timeout,
+        'container': args.container,
+        'tile_size': args.tile_size,
+        'seed': args.seed,
+        'cache_dir': args.cache_dir,
+        'cache_max_mb': args.cache_max_mb,
+        'no_cache': args.no_cache,
+        'deadline': args.deadline,
+        'cost_model': args.cost_model,
     }
     
     animator = HighlightAnimator(config)
-    success = animator.create_highlight_animation(args.input, args.output)
+    if args.frame is not None:
+        success = render_poster(animator, args.input, args.output, args.frame) is not None
+    else:
+        success = animator.create_highlight_animation(args.input, args.output)
     
     result = {
         'success': success,
@@ -6,16 +6,32 @@ Converts PNG to animated sketch video using OpenCV contour drawing.
 
 import os
 import sys
-import cv2
-import numpy as np
-import subprocess
 import argparse
 import logging
 import json
 import tempfile
 import shutil
+import time
 from pathlib import Path
 
+from sketch_preprocess import adaptive_denoise, skeletonize, DENOISE_MODES, SKELETON_METHODS
+from sketch_geometry import contour_features, order_strokes
+from sketch_scene import save_scene, load_scene, pack_polylines, unpack_polylines
+from sketch_profile import StageProfiler
+from sketch_progress import ProgressReporter
+from sketch_sinks import create_sink
+from sketch_cache import OutputCache, DEFAULT_MAX_MB
+from sketch_vector import VectorAnimation, vector_format, reveal_frames
+from sketch_poster import frame_at, render_poster
+from sketch_timeline import Timeline, linear_ends
+from sketch_cost import RenderPlanner
+from sketch_toolchain import Toolchain
+from sketch_lazy import lazy_import
+
+# OpenCV/NumPy load on first use: --help, argument errors and cache hits skip them
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -26,14 +42,14 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Reconfigure stdout for JSON output
-sys.stdout.reconfigure(encoding='utf-8')
-sys.stderr.reconfigure(encoding='utf-8')
-
 
 class SketchAnimatorV2:
     """Optimized sketch animator using contour-based drawing."""
     
+    # x264 profile of the MP4 (also part of the output cache key)
+    ENCODER_ARGS = ['-c:v', 'libx264', '-preset', 'medium', '-crf', '23',
+                    '-pix_fmt', 'yuv420p', '-movflags', '+faststart']
+    
     def __init__(self, config: dict):
         self.config = config
         self.temp_dir = tempfile.mkdtemp(prefix='sketch_animate_')
@@ -42,23 +58,16 @@ class SketchAnimatorV2:
             'variant': config.get('variant', 'pen-sketch'),
             'processing_params': {}
         }
+        self.profiler = StageProfiler(trace=bool(config.get('profile_trace')))
+        self.encoder_args = list(self.ENCODER_ARGS)  # --deadline may pick a faster preset
         logger.info(f"Temp directory: {self.temp_dir}")
         
-        # Find FFmpeg
-        self.ffmpeg_cmd = self._find_ffmpeg()
+        # Find FFmpeg (node_modules/ffmpeg-static, then PATH; cached, see sketch_toolchain.py)
+        self.toolchain = Toolchain.for_config(config)
+        self.ffmpeg_cmd = self.toolchain.find('ffmpeg')
         if self.ffmpeg_cmd:
             logger.info(f"Using FFmpeg from: {self.ffmpeg_cmd}")
     
-    def _find_ffmpeg(self):
-        """Find FFmpeg executable."""
-        # Check node_modules/ffmpeg-static first
-        node_ffmpeg = Path(os.getcwd()) / 'node_modules' / 'ffmpeg-static' / 'ffmpeg.exe'
-        if node_ffmpeg.exists():
-            return str(node_ffmpeg)
-        
-        # Fall back to system PATH
-        return shutil.which('ffmpeg') or 'ffmpeg'
-    
     def preprocess_image(self, input_path: str, output_path: str) -> bool:
         """Preprocess image: denoise, contrast, threshold."""
         try:
@@ -68,8 +77,11 @@ class SketchAnimatorV2:
                 logger.error(f"Failed to read image: {input_path}")
                 return False
             
-            # Denoise
-            img = cv2.fastNlMeansDenoising(img, None, h=10, templateWindowSize=7, searchWindowSize=21)
+            # Denoise (adaptive: clean inputs skip or use the half-resolution path)
+            with self.profiler.span('denoise'):
+                img, denoise_info = adaptive_denoise(img, mode=self.config.get('denoise_mode', 'auto'),
+                                                     h=10, template_window=7, search_window=21)
+            self.metadata['processing_params']['denoise'] = denoise_info
             logger.info("Applied denoising")
             
             # Enhance contrast
@@ -80,16 +92,9 @@ class SketchAnimatorV2:
             # Optional skeletonization for cleaner strokes
             if self.config.get('skeletonize', False):
                 _, binary = cv2.threshold(img, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-                kernel = np.ones((3, 3), np.uint8)
-                skeleton = np.zeros(binary.shape, np.uint8)
-                while True:
-                    opened = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel)
-                    temp = cv2.subtract(binary, opened)
-                    eroded = cv2.erode(binary, kernel)
-                    skeleton = cv2.bitwise_or(skeleton, temp)
-                    binary = eroded.copy()
-                    if cv2.countNonZero(binary) == 0:
-                        break
+                with self.profiler.span('skeletonize'):
+                    skeleton, skeleton_info = skeletonize(binary, method=self.config.get('skeleton_method', 'auto'))
+                self.metadata['processing_params']['skeleton'] = skeleton_info
                 img = cv2.bitwise_not(skeleton)
                 logger.info("Applied skeletonization")
             
@@ -116,122 +121,251 @@ class SketchAnimatorV2:
         # Find contours
         contours, hierarchy = cv2.findContours(binary, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
         
-        # Sort by area (largest first)
-        contours = sorted(contours, key=cv2.contourArea, reverse=True)
+        # Area/centroid computed once for all contours (vectorized)
+        features = contour_features(contours)
+        if self.config.get('stroke_order', 'travel') == 'travel':
+            # Nearest-neighbour tour over contour centroids (minimizes pen travel)
+            centroids = np.column_stack((features['cx'], features['cy']))
+            with self.profiler.span('stroke_order'):
+                order, _, order_stats = order_strokes(centroids)
+            self.metadata['processing_params']['stroke_order'] = {'mode': 'travel', **order_stats}
+        else:
+            # Sort by area (largest first)
+            order = np.argsort(-features['area'], kind='stable')
+            self.metadata['processing_params']['stroke_order'] = {'mode': 'area'}
+        contours = [contours[i] for i in order.tolist()]
         
         logger.info(f"Extracted {len(contours)} contours for animation")
         return contours, img
     
-    def create_animation(self, input_png: str, output_mp4: str) -> bool:
-        """Create stroke-by-stroke animation."""
-        try:
+    def write_scene(self, scene_path: str, contours, img):
+        """Save ordered contours and the cleaned image as a scene file."""
+        height, width = img.shape[:2]
+        fill_points, fill_offsets = pack_polylines(contours)
+        meta = {
+            'producer': 'v2',
+            'version': self.metadata['version'],
+            'width': width,
+            'height': height,
+            'processing_params': self.metadata['processing_params'],
+        }
+        self.metadata['scene'] = save_scene(scene_path, {
+            'fill_points': fill_points,
+            'fill_offsets': fill_offsets,
+            'reveal_rank': np.arange(len(contours), dtype=np.int32),
+            'image': img,
+        }, meta)
+    
+    def read_scene(self, scene_path: str, width: int, height: int):
+        """Load contours from a scene file instead of preprocessing/extracting them."""
+        logger.info(f"Loading scene: {scene_path}")
+        arrays, meta = load_scene(scene_path)
+        if (meta.get('width'), meta.get('height')) != (width, height):
+            raise ValueError(f"Scene is {meta.get('width')}x{meta.get('height')}, requested {width}x{height}")
+        
+        contours = unpack_polylines(arrays['fill_points'], arrays['fill_offsets'])
+        if 'reveal_rank' in arrays:
+            contours = [contours[i] for i in np.argsort(arrays['reveal_rank'], kind='stable').tolist()]
+        contours = [contour.reshape(-1, 1, 2) for contour in contours]
+        self.metadata['processing_params'].update(meta.get('processing_params', {}))
+        self.metadata['scene'] = {'path': str(scene_path), 'loaded': True}
+        logger.info(f"Loaded {len(contours)} contours from scene")
+        return contours, arrays['image']
+    
+    def prepare(self, input_png: str) -> bool:
+        """Preprocess and extract contours (or load the scene), shared by video and single frames."""
+        width = self.config.get('width', 1920)
+        height = self.config.get('height', 1080)
+        if self.config.get('from_scene'):
+            # Steps 1-2 were done by an earlier run: reuse its scene file
+            cleaned_png = None
+            with self.profiler.span('scene_load'):
+                contours, cleaned_img = self.read_scene(self.config['from_scene'], width, height)
+        else:
             # Step 1: Preprocess
             cleaned_png = os.path.join(self.temp_dir, 'cleaned.png')
-            if not self.preprocess_image(input_png, cleaned_png):
-                return False
+            with self.profiler.span('preprocess'):
+                if not self.preprocess_image(input_png, cleaned_png):
+                    return False
             
             # Step 2: Extract contours
+            with self.profiler.span('extract'):
+                contours, cleaned_img = self.extract_contours(cleaned_png, width, height)
+        if contours is None:
+            logger.error("Failed to extract contours")
+            return False
+        self.contours, self.cleaned_img, self.cleaned_png = contours, cleaned_img, cleaned_png
+        self.timeline = self.compile_timeline()
+        return True
+    
+    def compile_timeline(self):
+        """Contours drawn by the end of each frame."""
+        fps = self.config.get('fps', 30)
+        total_frames = int(fps * self.config.get('duration', 5.0))
+        timeline = Timeline('v2', total_frames, fps)
+        timeline.add_range('contours', linear_ends(len(self.contours), total_frames))
+        return timeline
+    
+    def draw_contour(self, canvas, i: int):
+        """
+        Draw contour i filled and stroked in black. Pass a one-element slice:
+        indexing into the full list makes OpenCV convert every contour per call.
+        """
+        cv2.drawContours(canvas, self.contours[i:i + 1], 0, (0, 0, 0), -1)  # Fill
+        cv2.drawContours(canvas, self.contours[i:i + 1], 0, (0, 0, 0), 2)   # Stroke
+    
+    def render_frame(self, t: float):
+        """Frame shown at t seconds: the contours revealed by then, drawn in order on white."""
+        frame_idx = frame_at(t, self.timeline.fps, self.timeline.total_frames)
+        height, width = self.config.get('height', 1080), self.config.get('width', 1920)
+        canvas = np.ones((height, width, 3), dtype=np.uint8) * 255
+        for i in range(self.timeline.end('contours', frame_idx)):
+            self.draw_contour(canvas, i)
+        return canvas
+    
+    def write_vector(self, output_path: str, contours, fps: int, total_frames: int) -> dict:
+        """Write the contour-by-contour reveal as animated SVG / Lottie on the raster timeline."""
+        animation = VectorAnimation(self.config.get('width', 1920), self.config.get('height', 1080), fps, total_frames)
+        for contour, frame in zip(contours, reveal_frames(len(contours), 0, total_frames)):
+            animation.add_shape(contour, frame, color=(0, 0, 0), stroke_width=2)
+        return animation.write(output_path)
+    
+    def save_outputs(self, output_path: str, cleaned_png, cleaned_img, cache) -> bool:
+        """Write the _cleaned.png and _metadata.json side files, then publish to the output cache."""
+        output_dir = Path(output_path).parent
+        final_png = output_dir / (Path(output_path).stem + '_cleaned.png')
+        if cleaned_png:
+            shutil.copy2(cleaned_png, final_png)
+        else:
+            cv2.imwrite(str(final_png), cleaned_img)
+        
+        # Save metadata
+        metadata_path = output_dir / (Path(output_path).stem + '_metadata.json')
+        self.metadata['profile'] = self.profiler.finish(self.config.get('profile_trace'))
+        if cache:
+            self.metadata['cache'] = cache.info()
+        with open(metadata_path, 'w') as f:
+            json.dump(self.metadata, f, indent=2)
+        if cache:
+            cache.publish()
+        
+        logger.info(f"Output files:")
+        logger.info(f"  Animation: {output_path}")
+        logger.info(f"  PNG: {final_png}")
+        logger.info(f"  Metadata: {metadata_path}")
+        
+        self.progress.stage('done')
+        return True
+    
+    def create_animation(self, input_png: str, output_mp4: str) -> bool:
+        """Create stroke-by-stroke animation."""
+        try:
             width = self.config.get('width', 1920)
             height = self.config.get('height', 1080)
             fps = self.config.get('fps', 30)
             duration = self.config.get('duration', 5.0)
             total_frames = int(fps * duration)
+            self.progress = ProgressReporter(total_frames, enabled=self.config.get('progress_json', False))
             
-            contours, cleaned_img = self.extract_contours(cleaned_png, width, height)
-            if contours is None:
-                logger.error("Failed to extract contours")
-                return False
+            # The best encoder this FFmpeg build has (probed once per binary version)
+            self.encoder_args = self.toolchain.encoder_args(
+                self.encoder_args, self.ffmpeg_cmd, 'vector' if vector_format(output_mp4) else self.config.get('sink'))
+            self.metadata['toolchain'] = self.toolchain.info()
             
-            logger.info(f"Generating {total_frames} frames ({duration}s @ {fps}fps)")
+            # Repeat renders (same input bytes and output parameters) are served from the cache
+            cache = OutputCache.for_render(
+                self.config, 'v2', self.metadata['version'], [self.config.get('from_scene') or input_png],
+                output_mp4, ('_cleaned.png', '_metadata.json'), self.encoder_args)
+            if cache and cache.fetch({'variant': self.metadata['variant']}):
+                self.progress.stage('done')
+                return True
             
-            # Step 3: Start FFmpeg
-            ffmpeg_args = [
-                self.ffmpeg_cmd, '-y',
-                '-f', 'rawvideo',
-                '-vcodec', 'rawvideo',
-                '-s', f'{width}x{height}',
-                '-pix_fmt', 'rgb24',
-                '-r', str(fps),
-                '-i', '-',
-                '-c:v', 'libx264',
-                '-preset', 'medium',
-                '-crf', '23',
-                '-pix_fmt', 'yuv420p',
-                '-movflags', '+faststart',
-                output_mp4
-            ]
+            self.progress.stage('extracting')
+            planner = RenderPlanner('v2', self.config, 'vector' if vector_format(output_mp4) else None)
+            estimate = planner.prepare(self, input_png)
+            if estimate is None:
+                return False
+            self.progress.estimate(estimate)
+            if planner.steps:
+                # --deadline lowered the settings: the cache entry is the one for the settings actually used
+                width, height = self.config['width'], self.config['height']
+                fps, total_frames = self.timeline.fps, self.timeline.total_frames
+                cache = cache and OutputCache.for_render(
+                    self.config, 'v2', self.metadata['version'], [self.config.get('from_scene') or input_png],
+                    output_mp4, ('_cleaned.png', '_metadata.json'), self.encoder_args)
+                if cache and cache.fetch({'variant': self.metadata['variant']}):
+                    self.progress.stage('done')
+                    return True
+            contours, cleaned_img, cleaned_png = self.contours, self.cleaned_img, self.cleaned_png
             
-            ffmpeg_process = subprocess.Popen(
-                ffmpeg_args,
-                stdin=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                stdout=subprocess.DEVNULL,
-                bufsize=10**8
-            )
+            if self.config.get('save_scene'):
+                with self.profiler.span('scene_save'):
+                    self.write_scene(self.config['save_scene'], contours, cleaned_img)
             
-            # Step 4: Generate frames
-            import threading
-            import queue
+            self.metadata['contours'] = len(contours)
             
-            stderr_queue = queue.Queue()
+            # Vector export (--output .svg / .json): the same timed reveal, no frames rendered or encoded
+            if vector_format(output_mp4):
+                with self.profiler.span('vector_export'):
+                    self.metadata['vector'] = self.write_vector(output_mp4, contours, fps, total_frames)
+                return self.save_outputs(output_mp4, cleaned_png, cleaned_img, cache)
             
-            def read_stderr():
-                try:
-                    for line in ffmpeg_process.stderr:
-                        stderr_queue.put(line)
-                except:
-                    pass
+            logger.info(f"Generating {total_frames} frames ({duration}s @ {fps}fps)")
             
-            threading.Thread(target=read_stderr, daemon=True).start()
+            # Step 3: Open the frame sink (FFmpeg pipe unless --sink null/raw)
+            self.sink = create_sink(
+                self.config.get('sink', 'ffmpeg'), output_mp4, width, height, fps, total_frames,
+                ffmpeg_cmd=self.ffmpeg_cmd, progress=self.progress,
+                pixel_order='bgr', pipe_format=self.config.get('pipe_format', 'rgb24'),
+                stall_timeout=self.config.get('encoder_stall_timeout', 30),
+                timeout=self.config.get('encoder_timeout'),
+                container=self.config.get('container', 'mp4'),
+                encoder_args=self.encoder_args
+            )
             
-            # Draw contours progressively
+            # Step 4: Draw contours progressively. Everything is drawn opaque black, so the
+            # canvas is kept between frames and only the newly revealed contours are drawn
+            canvas = np.ones((height, width, 3), dtype=np.uint8) * 255
+            self.progress.stage('rendering')
             for frame_idx in range(total_frames):
-                # Calculate how many contours to draw
-                progress = (frame_idx + 1) / total_frames
-                contours_to_draw = int(len(contours) * progress)
+                frame_start = time.perf_counter()
                 
-                # Create white canvas
-                canvas = np.ones((height, width, 3), dtype=np.uint8) * 255
+                # Draw the contours this frame adds one by one (stroke-by-stroke)
+                drawn, contours_to_draw = self.timeline.span('contours', frame_idx)
+                dirty = None
+                for i in range(drawn, contours_to_draw):
+                    self.draw_contour(canvas, i)
+                    x, y, w, h = cv2.boundingRect(contours[i])
+                    rect = (x - 2, y - 2, x + w + 2, y + h + 2)  # Stroke width margin
+                    dirty = rect if dirty is None else (min(dirty[0], rect[0]), min(dirty[1], rect[1]),
+                                                        max(dirty[2], rect[2]), max(dirty[3], rect[3]))
                 
-                # Draw contours one by one (stroke-by-stroke)
-                for i in range(contours_to_draw):
-                    cv2.drawContours(canvas, contours, i, (0, 0, 0), -1)  # Fill
-                    cv2.drawContours(canvas, contours, i, (0, 0, 0), 2)   # Stroke
+                # Write to the sink: same contour count -> same frame; otherwise only the
+                # dirty rectangle needs converting (black/white canvas, so BGR == RGB)
+                t = self.profiler.lap('render', frame_start)
+                self.sink.write(canvas, key=contours_to_draw, dirty=dirty or (0, 0, 0, 0))
+                self.profiler.lap('write', t)
                 
-                # Write to FFmpeg
-                ffmpeg_process.stdin.write(canvas.tobytes())
+                self.progress.update(frame_idx + 1)
                 
                 if (frame_idx + 1) % 50 == 0 or frame_idx == 0:
                     logger.info(f"Generated {frame_idx + 1}/{total_frames} frames ({(frame_idx + 1)/total_frames*100:.1f}%)")
             
             # Close and wait
-            ffmpeg_process.stdin.close()
-            logger.info("Waiting for FFmpeg to finish encoding...")
-            return_code = ffmpeg_process.wait(timeout=60)
-            
-            if return_code != 0:
-                logger.error(f"FFmpeg failed with code {return_code}")
-                return False
+            self.progress.update(total_frames, force=True)
+            self.progress.stage('encoding')
+            logger.info(f"Waiting for {self.sink.kind} sink to finish...")
+            with self.profiler.span('encoder_wait'):
+                if not self.sink.close():
+                    return False
+            total_seconds = time.perf_counter() - self.progress.render_start
             
             logger.info(f"Animation complete: {output_mp4}")
             
-            # Copy outputs
-            output_dir = Path(output_mp4).parent
-            final_png = output_dir / (Path(output_mp4).stem + '_cleaned.png')
-            shutil.copy2(cleaned_png, final_png)
-            
-            # Save metadata
-            metadata_path = output_dir / (Path(output_mp4).stem + '_metadata.json')
-            self.metadata['contours'] = len(contours)
-            with open(metadata_path, 'w') as f:
-                json.dump(self.metadata, f, indent=2)
-            
-            logger.info(f"Output files:")
-            logger.info(f"  MP4: {output_mp4}")
-            logger.info(f"  PNG: {final_png}")
-            logger.info(f"  Metadata: {metadata_path}")
-            
-            return True
+            self.metadata['sink'] = self.sink.info()
+            self.metadata['timeline'] = self.timeline.info()
+            self.metadata['estimate'] = planner.finish(self.profiler.summary(), total_seconds)
+            return self.save_outputs(output_mp4, cleaned_png, cleaned_img, cache)
         except Exception as e:
             logger.error(f"Animation error: {e}")
             return False
@@ -242,17 +376,63 @@ class SketchAnimatorV2:
 
 
 def main():
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
     parser = argparse.ArgumentParser(description='Create pen sketch animation from PNG')
-    parser.add_argument('input', help='Input PNG file')
-    parser.add_argument('--output', required=True, help='Output MP4 file')
+    parser.add_argument('input', nargs='?', help='Input PNG file (optional with --from-scene)')
+    parser.add_argument('--output', required=True,
+                        help='Output MP4 file; .svg (CSS-animated SVG) or .json (Lottie) exports the vector animation instead')
     parser.add_argument('--duration', type=float, default=5.0, help='Duration in seconds')
     parser.add_argument('--fps', type=int, default=25, help='Frames per second')
     parser.add_argument('--width', type=int, default=1920, help='Output width')
     parser.add_argument('--height', type=int, default=1080, help='Output height')
     parser.add_argument('--variant', default='pen-sketch', help='Animation variant')
     parser.add_argument('--skeletonize', action='store_true', help='Apply skeletonization')
+    parser.add_argument('--save-scene', help='Also write the extracted contours to this scene file')
+    parser.add_argument('--from-scene', help='Render from a saved scene file instead of extracting contours')
+    parser.add_argument('--profile-trace', help='Write a per-stage/per-frame timing trace (.json = Chrome trace, .jsonl = JSON lines)')
+    parser.add_argument('--progress-json', action='store_true',
+                        help='Emit rate-limited JSON-lines progress events on stdout')
+    parser.add_argument('--sink', choices=['ffmpeg', 'pyav', 'null', 'raw'], default='ffmpeg',
+                        help='Frame destination: ffmpeg encodes the MP4 in a subprocess, pyav encodes it in-process '
+                             '(needs PyAV, else falls back to ffmpeg), null discards frames (render cost only), '
+                             'raw writes --output as .y4m or headerless rgb24 (default: ffmpeg)')
+    parser.add_argument('--pipe-format', choices=['rgb24', 'y4m'], default='rgb24',
+                        help='FFmpeg pipe payload: packed rawvideo, or I420 in a Y4M stream '
+                             '(half the bytes, no swscale pass; default: rgb24)')
+    parser.add_argument('--encoder-stall-timeout', type=float, default=30,
+                        help='Kill FFmpeg only after this many seconds without encoder progress; 0 disables (default: 30)')
+    parser.add_argument('--encoder-timeout', type=float, default=None,
+                        help='Hard cap in seconds on waiting for FFmpeg after the last frame (default: none)')
+    parser.add_argument('--container', choices=['mp4', 'fmp4', 'hls'], default='mp4',
+                        help='mp4 moves the index to the front after encoding (+faststart); fmp4 writes a '
+                             'fragmented MP4 that can be streamed while it is still being written; hls writes '
+                             '--output as an .m3u8 playlist of 2 s CMAF segments, updated as each one completes '
+                             '(default: mp4)')
+    parser.add_argument('--skeleton-method', choices=SKELETON_METHODS, default='auto',
+                        help='Thinning algorithm used by --skeletonize (default: auto)')
+    parser.add_argument('--stroke-order', choices=['travel', 'area'], default='travel',
+                        help='Contour drawing order: minimize pen travel or largest first (default: travel)')
+    parser.add_argument('--denoise-mode', choices=DENOISE_MODES, default='auto',
+                        help='Denoising path: auto picks skip/downscale/full from estimated noise (default: auto)')
+    parser.add_argument('--cache-dir', default=None,
+                        help='Reuse finished renders from this content-addressed output cache '
+                             '(default: $SKETCH_CACHE_DIR; unset = no cache)')
+    parser.add_argument('--cache-max-mb', type=float, default=None,
+                        help=f'Evict least recently used cache entries beyond this size (default: {DEFAULT_MAX_MB})')
+    parser.add_argument('--no-cache', action='store_true', help='Always render, even on a cache hit')
+    parser.add_argument('--deadline', type=float, default=None, metavar='SECONDS',
+                        help='Lower the preset, fps and then resolution until the job is predicted '
+                             'to finish within SECONDS (default: no deadline)')
+    parser.add_argument('--cost-model', default=None,
+                        help='JSON file of render-time corrections, updated after every render '
+                             '(default: $SKETCH_COST_MODEL; unset = built-in costs)')
+    parser.add_argument('--frame', type=float, default=None, metavar='T',
+                        help='Render only the frame at T seconds to --output (.png/.jpg) instead of the video')
     
     args = parser.parse_args()
+    if not args.input and not args.from_scene:
+        parser.error('an input PNG is required unless --from-scene is given')
     
     config = {
         'duration': args.duration,
@@ -261,10 +441,30 @@ def main():
         'height': args.height,
         'variant': args.variant,
         'skeletonize': args.skeletonize,
+        'skeleton_method': args.skeleton_method,
+        'denoise_mode': args.denoise_mode,
+        'stroke_order': args.stroke_order,
+        'save_scene': args.save_scene,
+        'from_scene': args.from_scene,
+        'profile_trace': args.profile_trace,
+        'progress_json': args.progress_json,
+        'sink': args.sink,
+        'pipe_format': args.pipe_format,
+        'encoder_stall_timeout': args.encoder_stall_timeout,
+        'encoder_timeout': args.encoder_timeout,
+        'container': args.container,
+        'cache_dir': args.cache_dir,
+        'cache_max_mb': args.cache_max_mb,
+        'no_cache': args.no_cache,
+        'deadline': args.deadline,
+        'cost_model': args.cost_model,
     }
     
     animator = SketchAnimatorV2(config)
-    success = animator.create_animation(args.input, args.output)
+    if args.frame is not None:
+        success = render_poster(animator, args.input, args.output, args.frame) is not None
+    else:
+        success = animator.create_animation(args.input, args.output)
     
     # Output JSON result to stdout
     result = {
@@ -6,16 +6,34 @@ Draws along actual contours/strokes like hand-drawn whiteboard videos.
 
 import os
 import sys
-import cv2
-import numpy as np
-import subprocess
 import argparse
 import logging
 import json
 import tempfile
 import shutil
+import time
 from pathlib import Path
 
+from sketch_preprocess import adaptive_denoise, DENOISE_MODES
+from sketch_geometry import contour_features, order_strokes, select_contours
+from sketch_lod import StrokeLOD, COLLINEAR_AREA, MIN_STROKE_LENGTH, default_point_budget, resolution_scale
+from sketch_scene import save_scene, load_scene, pack_polylines, unpack_polylines
+from sketch_profile import StageProfiler
+from sketch_progress import ProgressReporter
+from sketch_sinks import create_sink
+from sketch_cache import OutputCache, DEFAULT_MAX_MB
+from sketch_tiles import TileCanvas, DEFAULT_TILE_SIZE
+from sketch_vector import VectorAnimation, vector_format, reveal_frames
+from sketch_poster import frame_at, render_poster
+from sketch_timeline import Timeline, linear_ends
+from sketch_cost import RenderPlanner
+from sketch_toolchain import Toolchain
+from sketch_lazy import lazy_import
+
+# OpenCV/NumPy load on first use: --help, argument errors and cache hits skip them
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
@@ -23,27 +41,34 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-sys.stdout.reconfigure(encoding='utf-8')
-sys.stderr.reconfigure(encoding='utf-8')
-
 
 class WhiteboardAnimator:
     """Professional whiteboard-style animation with stroke-by-stroke path drawing."""
     
+    # x264 profile of the MP4 (also part of the output cache key)
+    ENCODER_ARGS = ['-c:v', 'libx264', '-preset', 'fast', '-crf', '20',
+                    '-pix_fmt', 'yuv420p', '-movflags', '+faststart']
+    
+    # Outline stroke thickness (balanced for visibility)
+    OUTLINE_THICKNESS = 3
+    
+    # Timeline phases
+    PASS_OUTLINE, PASS_FILL, PASS_HOLD = 0, 1, 2
+    
     def __init__(self, config: dict):
         self.config = config
         self.temp_dir = tempfile.mkdtemp(prefix='sketch_wb_')
         self.metadata = {'version': '6.2-noise-filtered', 'variant': config.get('variant', 'pen-sketch')}
+        self.profiler = StageProfiler(trace=bool(config.get('profile_trace')))
+        self.encoder_args = list(self.ENCODER_ARGS)  # --deadline may pick a faster preset
         logger.info(f"Temp directory: {self.temp_dir}")
         
-        self.ffmpeg_cmd = self._find_ffmpeg()
+        # Find FFmpeg (node_modules/ffmpeg-static, then PATH; cached, see sketch_toolchain.py)
+        self.toolchain = Toolchain.for_config(config)
+        self.ffmpeg_cmd = self.toolchain.find('ffmpeg')
         if self.ffmpeg_cmd:
             logger.info(f"Using FFmpeg: {self.ffmpeg_cmd}")
     
-    def _find_ffmpeg(self):
-        node_ffmpeg = Path(os.getcwd()) / 'node_modules' / 'ffmpeg-static' / 'ffmpeg.exe'
-        return str(node_ffmpeg) if node_ffmpeg.exists() else shutil.which('ffmpeg') or 'ffmpeg'
-    
     
     
     def extract_drawing_strokes(self, input_path: str, width: int, height: int):
@@ -69,8 +94,10 @@ class WhiteboardAnimator:
             # Convert to grayscale
             gray = cv2.cvtColor(img_enhanced, cv2.COLOR_BGR2GRAY)
             
-            # Pre-process: Denoise to remove background artifacts
-            gray_clean = cv2.fastNlMeansDenoising(gray, None, h=10, templateWindowSize=7, searchWindowSize=21)
+            # Pre-process: Denoise to remove background artifacts (skipped/downscaled for clean inputs)
+            with self.profiler.span('denoise'):
+                gray_clean, self.metadata['denoise'] = adaptive_denoise(
+                    gray, mode=self.config.get('denoise_mode', 'auto'), h=10, template_window=7, search_window=21)
             
             # Apply bilateral filter for edge-preserving smoothing
             gray_clean = cv2.bilateralFilter(gray_clean, 5, 50, 50)
@@ -86,20 +113,20 @@ class WhiteboardAnimator:
             # Find edge contours
             edge_contours, _ = cv2.findContours(edges_clean, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
             
-            # Sort by Y coordinate (top to bottom)
-            def contour_top(cnt):
-                M = cv2.moments(cnt)
-                if M['m00'] != 0:
-                    cy = M['m01'] / M['m00']
-                else:
-                    cy = 0
-                return cy  # Pure top-to-bottom
+            # Area/perimeter/bbox/centroid for every contour in one vectorized pass
+            edge_features = contour_features(edge_contours)
             
-            edge_contours = sorted(edge_contours, key=contour_top)
+            # Filter BEFORE sorting: drop tiny noise contours (be more aggressive) and the
+            # duplicate inner/outer traces RETR_LIST produces for every closed edge line.
+            # Thresholds are tuned at 1080p and scale with the output size
+            scale = resolution_scale(width, height)
+            min_edge_area = 50 * scale ** 2  # Increased from 5 to filter background noise
+            edge_keep, edge_counts = select_contours(edge_features, min_edge_area,
+                                                     dedupe_tolerance=max(1.0, 3.0 * scale))
             
-            # Filter out tiny noise contours (be more aggressive)
-            min_edge_area = 50  # Increased from 5 to filter background noise
-            edge_contours = [cnt for cnt in edge_contours if cv2.contourArea(cnt) >= min_edge_area]
+            # Sort by Y coordinate (top to bottom)
+            edge_keep = edge_keep[np.argsort(edge_features['cy'][edge_keep], kind='stable')]
+            edge_contours = [edge_contours[i] for i in edge_keep]
             
             # ===== PASS 2: Extract COLOR REGIONS (fills) =====
             _, binary = cv2.threshold(gray_clean, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
@@ -111,36 +138,288 @@ class WhiteboardAnimator:
             # Find color region contours
             color_contours, hierarchy = cv2.findContours(binary_clean, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
             
-            # Sort by Y coordinate (top to bottom)
-            color_contours = sorted(color_contours, key=contour_top)
+            color_features = contour_features(color_contours)
             
-            # Filter out tiny noise regions (be more aggressive)
-            min_color_area = 100  # Increased from 15 to filter background noise
-            color_contours = [cnt for cnt in color_contours if cv2.contourArea(cnt) >= min_color_area]
+            # Filter out tiny noise regions (be more aggressive), before sorting
+            min_color_area = 100 * scale ** 2  # Increased from 15 to filter background noise
+            color_keep, color_counts = select_contours(color_features, min_color_area)
             
+            # Sort by Y coordinate (top to bottom)
+            color_keep = color_keep[np.argsort(color_features['cy'][color_keep], kind='stable')]
+            color_contours = [color_contours[i] for i in color_keep]
+            
+            self.metadata['contour_filter'] = {'outlines': edge_counts, 'fills': color_counts}
+            logger.info(f"Contour filter: outlines kept {edge_counts['kept']}/{edge_counts['total']} "
+                        f"(dropped {edge_counts['dropped_small']} small, {edge_counts['dropped_duplicate']} duplicate), "
+                        f"fills kept {color_counts['kept']}/{color_counts['total']}")
             logger.info(f"Extracted {len(edge_contours)} outline strokes and {len(color_contours)} color regions")
             
             # Create outline stroke paths (for pass 1)
             # Use moderate approximation to smooth out noise while keeping detail
             outline_paths = []
-            for contour in edge_contours:
-                epsilon = 0.003 * cv2.arcLength(contour, True)  # Balanced approximation
+            for contour, perimeter in zip(edge_contours, edge_features['perimeter'][edge_keep].tolist()):
+                epsilon = 0.003 * perimeter  # Balanced approximation
                 approx = cv2.approxPolyDP(contour, epsilon, True)
                 points = [(int(p[0][0]), int(p[0][1])) for p in approx]
                 # Require at least 3 points to avoid single-point noise
                 if len(points) >= 3:
                     outline_paths.append(points)
             
+            # Merge collinear runs and thin dense outlines down to the point budget
+            with self.profiler.span('lod'):
+                outline_paths = self.level_of_detail(outline_paths, width, height)
+            
             # Create color fill data (for pass 2)
             color_fills = []
             for contour in color_contours:
                 color_fills.append(contour)
             
+            # Reorder to minimize pen travel (default) instead of a pure top-to-bottom sweep
+            if self.config.get('stroke_order', 'travel') == 'travel':
+                with self.profiler.span('stroke_order'):
+                    outline_paths, color_fills = self.order_for_travel(
+                        outline_paths, color_fills, color_features[color_keep])
+            else:
+                self.metadata['stroke_order'] = {'mode': 'top-down'}
+            
             logger.info(f"Created {len(outline_paths)} outline paths and {len(color_fills)} color fills")
             return img_enhanced, outline_paths, color_fills
         except Exception as e:
             logger.error(f"Stroke extraction error: {e}")
-            return None, None
+            return None, None, None
+    
+    def level_of_detail(self, outline_paths, width, height):
+        """Simplify the outlines against the point budget (sketch_lod.py); records metadata['lod']."""
+        budget = self.config.get('point_budget')
+        if budget is None:
+            budget = default_point_budget(width, height)
+        scale = resolution_scale(width, height)
+        lod = StrokeLOD(outline_paths)
+        outline_paths = lod.select(budget or None, min_area=COLLINEAR_AREA, min_length=MIN_STROKE_LENGTH * scale)
+        info = lod.info()
+        info['resolution_scale'] = round(scale, 4)
+        self.metadata['lod'] = info
+        logger.info(f"Level of detail: {info['points_in']} -> {info['points_out']} outline points "
+                    f"(budget {budget or 'none'}, max area removed {info['max_area']} px^2, "
+                    f"ranked in {info['rank_seconds']:.3f}s)")
+        return outline_paths
+    
+    def order_for_travel(self, outline_paths, color_fills, fill_features):
+        """Order outlines (with reversal) and fills so the marker travels as little as possible."""
+        order_info = {'mode': 'travel'}
+        if outline_paths:
+            starts = np.array([path[0] for path in outline_paths], dtype=np.float64)
+            ends = np.array([path[-1] for path in outline_paths], dtype=np.float64)
+            order, reverse, order_info['outlines'] = order_strokes(starts, ends)
+            outline_paths = [outline_paths[i][::-1] if flip else outline_paths[i]
+                             for i, flip in zip(order.tolist(), reverse.tolist())]
+        if color_fills:
+            centroids = np.column_stack((fill_features['cx'], fill_features['cy']))
+            order, _, order_info['fills'] = order_strokes(centroids)
+            color_fills = [color_fills[i] for i in order.tolist()]
+        self.metadata['stroke_order'] = order_info
+        return outline_paths, color_fills
+    
+    def write_scene(self, scene_path: str, img_color, outline_paths, color_fills):
+        """Save extracted strokes as a scene file so later renders can skip extraction."""
+        height, width = img_color.shape[:2]
+        outline_points, outline_offsets = pack_polylines(outline_paths)
+        fill_points, fill_offsets = pack_polylines(color_fills)
+        meta = {
+            'producer': 'whiteboard',
+            'version': self.metadata['version'],
+            'width': width,
+            'height': height,
+            'extraction': {key: self.metadata[key] for key in ('denoise', 'contour_filter', 'lod', 'stroke_order')
+                           if key in self.metadata},
+        }
+        self.metadata['scene'] = save_scene(scene_path, {
+            'outline_points': outline_points,
+            'outline_offsets': outline_offsets,
+            'fill_points': fill_points,
+            'fill_offsets': fill_offsets,
+            'reveal_rank': np.arange(len(outline_paths) + len(color_fills), dtype=np.int32),
+            'image': img_color,
+        }, meta)
+    
+    def read_scene(self, scene_path: str, width: int, height: int):
+        """Load strokes from a scene file instead of extracting them (memory-mapped, no parsing)."""
+        logger.info(f"Loading scene: {scene_path}")
+        arrays, meta = load_scene(scene_path)
+        if (meta.get('width'), meta.get('height')) != (width, height):
+            raise ValueError(f"Scene is {meta.get('width')}x{meta.get('height')}, requested {width}x{height}")
+        
+        outlines = unpack_polylines(arrays['outline_points'], arrays['outline_offsets'])
+        fills = unpack_polylines(arrays['fill_points'], arrays['fill_offsets'])
+        if 'reveal_rank' in arrays:
+            # Draw in rank order within each pass
+            ranks = arrays['reveal_rank']
+            outlines = [outlines[i] for i in np.argsort(ranks[:len(outlines)], kind='stable').tolist()]
+            fills = [fills[i] for i in np.argsort(ranks[len(outlines):], kind='stable').tolist()]
+        
+        outline_paths = [list(map(tuple, path.tolist())) for path in outlines]
+        color_fills = [contour.reshape(-1, 1, 2) for contour in fills]
+        self.metadata.update(meta.get('extraction', {}))
+        self.metadata['scene'] = {'path': str(scene_path), 'loaded': True}
+        logger.info(f"Loaded {len(outline_paths)} outline paths and {len(color_fills)} color fills from scene")
+        return arrays['image'], outline_paths, color_fills
+    
+    def prepare(self, input_png: str) -> bool:
+        """Extract strokes (or load the scene) and the fill cursor targets, shared by video and single frames."""
+        width = self.config.get('width', 1920)
+        height = self.config.get('height', 1080)
+        # Extract strokes (two-pass: outlines + colors), or reuse a previously saved scene
+        if self.config.get('from_scene'):
+            with self.profiler.span('scene_load'):
+                img_color, outline_paths, color_fills = self.read_scene(self.config['from_scene'], width, height)
+        else:
+            with self.profiler.span('extract'):
+                img_color, outline_paths, color_fills = self.extract_drawing_strokes(input_png, width, height)
+        if img_color is None or (not outline_paths and not color_fills):
+            logger.error("Failed to extract strokes")
+            return False
+        
+        self.img_color, self.outline_paths, self.color_fills = img_color, outline_paths, color_fills
+        self.extracted_outlines = outline_paths
+        self.simplifier = None
+        if self.config.get('simplify'):
+            self.simplify(self.config['simplify'])
+        with self.profiler.span('compile_timeline'):
+            self.timeline = self.compile_timeline()
+        return True
+    
+    def simplify(self, factor: float):
+        """Keep 1/`factor` of the extracted outline points, least visible removed first (fewer segments)."""
+        if self.simplifier is None:
+            self.simplifier = StrokeLOD(self.extracted_outlines)
+        budget = int(sum(map(len, self.extracted_outlines)) / factor)
+        outline_paths = self.simplifier.select(budget, min_area=0.0)
+        logger.info(f"Simplified outlines x{factor:g}: {sum(map(len, self.outline_paths))} -> "
+                    f"{sum(map(len, outline_paths))} points")
+        self.outline_paths = outline_paths
+    
+    def compile_timeline(self):
+        """
+        Turn the strokes and pass timing into per-frame ranges: outline segments
+        (all outlines' segments numbered in drawing order), fills, the pass and
+        the cursor position of every frame.
+        """
+        width = self.config.get('width', 1920)
+        height = self.config.get('height', 1080)
+        fps = self.config.get('fps', 30)
+        total_frames = int(fps * self.config.get('duration', 5.0))
+        outline_frames, color_frames = self.pass_frames(total_frames)
+        outline_paths, color_fills = self.outline_paths, self.color_fills
+        timeline = Timeline('whiteboard', total_frames, fps)
+        center = (width // 2, height // 2)
+        
+        frames = np.arange(total_frames)
+        outline_pass = (frames < outline_frames) & bool(outline_paths)
+        fill_pass = (frames >= outline_frames) & bool(color_fills)
+        timeline.phase[:] = np.where(outline_pass, self.PASS_OUTLINE,
+                                     np.where(fill_pass, self.PASS_FILL, self.PASS_HOLD))
+        
+        # Pass 1: frame f shows the first int(total_points * (f + 1) / outline_frames) outline
+        # points: every stroke that fits, then the partial stroke up to the cursor
+        lengths = np.array([len(path) for path in outline_paths], dtype=np.int64)
+        points_before = np.concatenate(([0], np.cumsum(lengths)))
+        self.segments_before = np.concatenate(([0], np.cumsum(np.maximum(lengths - 1, 0))))
+        targets = linear_ends(int(points_before[-1]), outline_frames) if outline_paths else []
+        segments = np.zeros(len(targets), dtype=np.int64)
+        for f, target in enumerate(np.asarray(targets).tolist()):
+            k = int(np.searchsorted(points_before[1:], target, side='right'))  # complete strokes
+            if k < len(outline_paths) and points_before[k] < target:
+                stroke_path, drawn = outline_paths[k], target - int(points_before[k])
+                segments[f] = self.segments_before[k] + min(drawn - 1, len(stroke_path) - 1)
+                timeline.cursor[f] = stroke_path[min(drawn, len(stroke_path) - 1)]
+            else:
+                segments[f] = self.segments_before[k]
+                timeline.cursor[f] = outline_paths[k - 1][-1] if k else center
+        timeline.add_range('segments', segments)
+        
+        # Pass 2 (and the frames after it): fills, with the cursor on the centre of the
+        # last filled region (degenerate contours keep it where it was)
+        if color_fills:
+            fills = linear_ends(len(color_fills), color_frames, total_frames - outline_frames)
+            timeline.add_range('fills', fills, start_frame=outline_frames)
+            cursor_after = []
+            cursor = center
+            for contour in color_fills:
+                M = cv2.moments(contour)
+                if M['m00'] != 0:
+                    cursor = (int(M['m10'] / M['m00']), int(M['m01'] / M['m00']))
+                cursor_after.append(cursor)
+            drawing = fills < len(color_fills)
+            timeline.cursor[outline_frames:][drawing] = np.array(
+                [cursor_after[n - 1] if n else center for n in fills[drawing].tolist()]).reshape(-1, 2)
+        else:
+            timeline.add_range('fills', [])
+        return timeline
+    
+    def pass_frames(self, total_frames: int):
+        """Frames given to the outline pass (50%) and the fill pass (35%); the rest hold the image."""
+        return int(total_frames * 0.50), int(total_frames * 0.35)
+    
+    def draw_segments(self, layer, stroke_path, start: int, end: int):
+        """Draw segments start..end-1 of an outline (clean black, anti-aliased for smooth edges)."""
+        for i in range(start, end):
+            cv2.line(layer, stroke_path[i], stroke_path[i + 1], (0, 0, 0), self.OUTLINE_THICKNESS, cv2.LINE_AA)
+    
+    def draw_fill(self, layer, contour):
+        """Paint the original colors inside one fill contour, through a mask of its bounding box only."""
+        x, y, w, h = cv2.boundingRect(contour)
+        
+        # Create mask for this fill region
+        mask = np.zeros((h, w), dtype=np.uint8)
+        cv2.drawContours(mask, [contour], 0, 255, -1, offset=(-x, -y))
+        
+        # Apply original colors from image
+        region = layer[y:y + h, x:x + w]
+        region[mask > 0] = self.img_color[y:y + h, x:x + w][mask > 0]
+        return x, y, w, h
+    
+    def draw_segment_range(self, layer, start: int, end: int, tiles=None):
+        """Draw outline segments [start, end) in timeline numbering; marks the touched tiles when given."""
+        segments_before = self.segments_before
+        k = int(np.searchsorted(segments_before, start, side='right')) - 1
+        line_pad = self.OUTLINE_THICKNESS + 2
+        while start < end:
+            stroke_path = self.outline_paths[k]
+            first = start - int(segments_before[k])
+            last = min(end, int(segments_before[k + 1])) - int(segments_before[k])
+            if last > first:
+                self.draw_segments(layer, stroke_path, first, last)
+                if tiles is not None:
+                    drawn = np.array(stroke_path[first:last + 1])
+                    tiles.mark(drawn[:, 0].min() - line_pad, drawn[:, 1].min() - line_pad,
+                               drawn[:, 0].max() + line_pad + 1, drawn[:, 1].max() + line_pad + 1)
+            start = min(end, int(segments_before[k + 1]))
+            k += 1
+    
+    def render_frame(self, t: float):
+        """
+        Frame shown at t seconds, built directly from the compiled timeline after
+        prepare(): the outlines (or fills) revealed by that frame, plus the cursor.
+        """
+        timeline = self.timeline
+        frame_idx = frame_at(t, timeline.fps, timeline.total_frames)
+        phase = timeline.phase[frame_idx]
+        if phase == self.PASS_HOLD:
+            # Final hold: the complete original image
+            return np.array(self.img_color)
+        
+        canvas = np.full(self.img_color.shape, 255, dtype=np.uint8)
+        if phase == self.PASS_OUTLINE:
+            self.draw_segment_range(canvas, 0, timeline.end('segments', frame_idx))
+        else:
+            # Fill pass: every outline, then the fills revealed so far
+            self.draw_segment_range(canvas, 0, int(self.segments_before[-1]))
+            for i in range(timeline.end('fills', frame_idx)):
+                self.draw_fill(canvas, self.color_fills[i])
+        cursor = timeline.cursor_at(frame_idx)
+        if cursor is not None:
+            canvas = self.draw_hand_cursor(canvas, *cursor, frame_idx)
+        return canvas
     
     def draw_hand_cursor(self, canvas, x, y, frame_idx):
         """Draw simple animated marker cursor."""
@@ -156,6 +435,56 @@ class WhiteboardAnimator:
         
         return canvas
     
+    def write_vector(self, output_path: str, outline_paths, color_fills, fps: int, total_frames: int,
+                     outline_frames: int, color_frames: int) -> dict:
+        """
+        Write the two-pass reveal as animated SVG / Lottie on the raster timeline:
+        outlines trace in point order, fills show the original image through their
+        contour; without fills the original image is held after the outlines. The
+        hand cursor is raster-only.
+        """
+        animation = VectorAnimation(self.config.get('width', 1920), self.config.get('height', 1080), fps,
+                                    total_frames, image_href=Path(output_path).stem + '_original.png')
+        total_points = max(1, sum(len(path) for path in outline_paths))
+        points_before = 0
+        for path in outline_paths:
+            # Frame f shows int(total_points * (f + 1) / outline_frames) points
+            start = (points_before + 1) * outline_frames / total_points - 1
+            end = (points_before + len(path)) * outline_frames / total_points - 1
+            animation.add_stroke(path, max(0, start), max(0, end), width=3)
+            points_before += len(path)
+        for contour, frame in zip(color_fills, reveal_frames(len(color_fills), outline_frames, color_frames)):
+            animation.add_region(contour, frame)
+        if not color_fills:
+            # Like the raster: the original image is only held when there is no fill pass
+            # (with fills, the fill pass runs to the last frame)
+            animation.set_hold(outline_frames if outline_paths else 0)
+        return animation.write(output_path)
+    
+    def save_outputs(self, output_path: str, img_color, cache) -> bool:
+        """Write the _original.png and _metadata.json side files, then publish to the output cache."""
+        output_dir = Path(output_path).parent
+        final_png = output_dir / (Path(output_path).stem + '_original.png')
+        with self.profiler.span('save_outputs'):
+            cv2.imwrite(str(final_png), img_color)
+        
+        metadata_path = output_dir / (Path(output_path).stem + '_metadata.json')
+        self.metadata['profile'] = self.profiler.finish(self.config.get('profile_trace'))
+        if cache:
+            self.metadata['cache'] = cache.info()
+        with open(metadata_path, 'w') as f:
+            json.dump(self.metadata, f, indent=2)
+        if cache:
+            cache.publish()
+        
+        logger.info(f"Output files:")
+        logger.info(f"  Animation: {output_path}")
+        logger.info(f"  PNG: {final_png}")
+        logger.info(f"  Metadata: {metadata_path}")
+        
+        self.progress.stage('done')
+        return True
+    
     def create_whiteboard_animation(self, input_png: str, output_mp4: str) -> bool:
         """Create whiteboard-style stroke animation."""
         try:
@@ -164,12 +493,42 @@ class WhiteboardAnimator:
             fps = self.config.get('fps', 30)
             duration = self.config.get('duration', 5.0)
             total_frames = int(fps * duration)
-            
-            # Extract strokes (two-pass: outlines + colors)
-            img_color, outline_paths, color_fills = self.extract_drawing_strokes(input_png, width, height)
-            if img_color is None or (not outline_paths and not color_fills):
-                logger.error("Failed to extract strokes")
+            self.progress = ProgressReporter(total_frames, enabled=self.config.get('progress_json', False))
+            
+            # The best encoder this FFmpeg build has (probed once per binary version)
+            self.encoder_args = self.toolchain.encoder_args(
+                self.encoder_args, self.ffmpeg_cmd, 'vector' if vector_format(output_mp4) else self.config.get('sink'))
+            self.metadata['toolchain'] = self.toolchain.info()
+            
+            # Repeat renders (same input bytes and output parameters) are served from the cache
+            cache = OutputCache.for_render(
+                self.config, 'whiteboard', self.metadata['version'], [self.config.get('from_scene') or input_png],
+                output_mp4, ('_original.png', '_metadata.json'), self.encoder_args)
+            if cache and cache.fetch({'variant': self.metadata['variant']}):
+                self.progress.stage('done')
+                return True
+            
+            self.progress.stage('extracting')
+            planner = RenderPlanner('whiteboard', self.config, 'vector' if vector_format(output_mp4) else None)
+            estimate = planner.prepare(self, input_png)
+            if estimate is None:
                 return False
+            self.progress.estimate(estimate)
+            if planner.steps:
+                # --deadline lowered the settings: the cache entry is the one for the settings actually used
+                width, height = self.config['width'], self.config['height']
+                fps, total_frames = self.timeline.fps, self.timeline.total_frames
+                cache = cache and OutputCache.for_render(
+                    self.config, 'whiteboard', self.metadata['version'], [self.config.get('from_scene') or input_png],
+                    output_mp4, ('_original.png', '_metadata.json'), self.encoder_args)
+                if cache and cache.fetch({'variant': self.metadata['variant']}):
+                    self.progress.stage('done')
+                    return True
+            img_color, outline_paths, color_fills = self.img_color, self.outline_paths, self.color_fills
+            
+            if self.config.get('save_scene'):
+                with self.profiler.span('scene_save'):
+                    self.write_scene(self.config['save_scene'], img_color, outline_paths, color_fills)
             
             logger.info(f"Creating {total_frames} frame whiteboard animation ({duration}s @ {fps}fps)")
             
@@ -178,8 +537,7 @@ class WhiteboardAnimator:
             # Pass 2 (next 35% of frames): Fill colors (top to bottom)
             # Pass 3 (last 15% of frames): Show complete original image
             
-            outline_frames = int(total_frames * 0.50)
-            color_frames = int(total_frames * 0.35)
+            outline_frames, color_frames = self.pass_frames(total_frames)
             hold_frames = total_frames - outline_frames - color_frames
             
             # Calculate points/fills per frame for each pass
@@ -193,170 +551,119 @@ class WhiteboardAnimator:
             logger.info(f"Pass 2: Filling {len(color_fills)} colors over {color_frames} frames")
             logger.info(f"Pass 3: Holding complete image for {hold_frames} frames")
             
-            # Start FFmpeg
-            ffmpeg_args = [
-                self.ffmpeg_cmd, '-y',
-                '-f', 'rawvideo', '-vcodec', 'rawvideo',
-                '-s', f'{width}x{height}', '-pix_fmt', 'rgb24', '-r', str(fps),
-                '-i', '-',
-                '-c:v', 'libx264', '-preset', 'fast', '-crf', '20',  # Good quality/speed balance
-                '-pix_fmt', 'yuv420p', '-movflags', '+faststart',
-                output_mp4
-            ]
-            
-            ffmpeg_process = subprocess.Popen(
-                ffmpeg_args,
-                stdin=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                stdout=subprocess.DEVNULL,
-                bufsize=10**8
-            )
-            
-            # Background stderr reader
-            import threading, queue
-            stderr_queue = queue.Queue()
-            def read_stderr():
-                try:
-                    for line in ffmpeg_process.stderr:
-                        stderr_queue.put(line)
-                except: pass
-            threading.Thread(target=read_stderr, daemon=True).start()
+            self.metadata['outline_strokes'] = len(outline_paths)
+            self.metadata['color_fills'] = len(color_fills)
+            self.metadata['outline_frames'] = outline_frames
+            self.metadata['color_frames'] = color_frames
+            self.metadata['hold_frames'] = hold_frames
+            self.metadata['style'] = 'whiteboard-two-pass-hold'
+            self.metadata['guarantees_full_resemblance'] = True
             
-            # Create clean white background
-            white_bg = np.ones((height, width, 3), dtype=np.uint8) * 255
+            # Vector export (--output .svg / .json): the same timed reveal, no frames rendered or encoded
+            if vector_format(output_mp4):
+                with self.profiler.span('vector_export'):
+                    self.metadata['vector'] = self.write_vector(
+                        output_mp4, outline_paths, color_fills, fps, total_frames, outline_frames, color_frames)
+                return self.save_outputs(output_mp4, img_color, cache)
+            
+            # Open the frame sink (FFmpeg pipe unless --sink null/raw)
+            self.sink = create_sink(
+                self.config.get('sink', 'ffmpeg'), output_mp4, width, height, fps, total_frames,
+                ffmpeg_cmd=self.ffmpeg_cmd, progress=self.progress,
+                pixel_order='bgr', pipe_format=self.config.get('pipe_format', 'rgb24'),
+                stall_timeout=self.config.get('encoder_stall_timeout', 30),
+                timeout=self.config.get('encoder_timeout'),
+                container=self.config.get('container', 'mp4'),
+                encoder_args=self.encoder_args
+            )
+
+            # Static layer: every fill-pass frame starts from the completed outlines
+            timeline = self.timeline
+            outline_layer = np.full((height, width, 3), 255, dtype=np.uint8)
+            self.draw_segment_range(outline_layer, 0, int(self.segments_before[-1]))
             
-            # Stroke thickness (balanced for visibility)
-            outline_thickness = 3  # Good balance for clean lines
+            # Persistent tiled canvas: strokes and fills are drawn once into the layer,
+            # the cursor only into the output frame (undone tile by tile next frame)
+            tiles = TileCanvas(np.full((height, width, 3), 255, dtype=np.uint8),
+                               self.config.get('tile_size', DEFAULT_TILE_SIZE))
             
             logger.info("Generating frames with two-pass drawing (outlines then colors)...")
             
-            # Generate frames
+            # Generate frames: each one draws its compiled ranges
+            self.progress.stage('rendering')
             for frame_idx in range(total_frames):
-                # Start with white canvas
-                canvas = white_bg.copy()
-                cursor_x, cursor_y = width // 2, height // 2
+                frame_start = time.perf_counter()
+                frame_key = None
+                frame_dirty = None
+                phase = timeline.phase[frame_idx]
                 
-                # ===== PASS 1: Draw outlines (first 60% of frames) =====
-                if frame_idx < outline_frames and outline_paths:
-                    # Calculate outline drawing progress (linear for consistent speed)
-                    outline_progress = (frame_idx + 1) / outline_frames
-                    target_outline_points = int(total_outline_points * outline_progress)
+                # ===== PASS 1: Draw outlines (first 50% of frames) =====
+                if phase == self.PASS_OUTLINE:
+                    # Draw only the segments added since the previous frame (same order as a full redraw)
+                    self.draw_segment_range(tiles.layer, *timeline.span('segments', frame_idx), tiles)
+                    canvas = tiles.compose()
                     
-                    # Draw outline strokes progressively
-                    drawn_points = 0
-                    for stroke_path in outline_paths:
-                        if drawn_points + len(stroke_path) <= target_outline_points:
-                            # Draw complete stroke (clean black line)
-                            for i in range(len(stroke_path) - 1):
-                                pt1, pt2 = stroke_path[i], stroke_path[i + 1]
-                                # Main outline (black, anti-aliased for smooth edges)
-                                cv2.line(canvas, pt1, pt2, (0, 0, 0), outline_thickness, cv2.LINE_AA)
-                            drawn_points += len(stroke_path)
-                            cursor_x, cursor_y = stroke_path[-1]
-                        elif drawn_points < target_outline_points:
-                            # Draw partial stroke
-                            points_to_draw = target_outline_points - drawn_points
-                            for i in range(min(points_to_draw - 1, len(stroke_path) - 1)):
-                                pt1, pt2 = stroke_path[i], stroke_path[i + 1]
-                                # Main outline
-                                cv2.line(canvas, pt1, pt2, (0, 0, 0), outline_thickness, cv2.LINE_AA)
-                            cursor_x, cursor_y = stroke_path[min(points_to_draw, len(stroke_path) - 1)]
-                            break
-                        else:
-                            break
+                # ===== PASS 2: Fill colors (next 35% of frames) =====
+                elif phase == self.PASS_FILL:
+                    # First, ALL outlines (completed, cached layer)
+                    if tiles.layer is not outline_layer:
+                        tiles.reset(outline_layer)
                     
-                    # Draw cursor during outline pass
-                    canvas = self.draw_hand_cursor(canvas, cursor_x, cursor_y, frame_idx)
-                
-                # ===== PASS 2: Fill colors (last 40% of frames) =====
-                elif frame_idx >= outline_frames and color_fills:
-                    # First, draw ALL outlines (completed)
-                    for stroke_path in outline_paths:
-                        for i in range(len(stroke_path) - 1):
-                            pt1, pt2 = stroke_path[i], stroke_path[i + 1]
-                            # Main outline (clean black, anti-aliased)
-                            cv2.line(canvas, pt1, pt2, (0, 0, 0), outline_thickness, cv2.LINE_AA)
-                    
-                    # Calculate color fill progress (linear for consistent speed)
-                    color_frame_idx = frame_idx - outline_frames
-                    color_progress = (color_frame_idx + 1) / color_frames
-                    fills_to_draw = int(total_color_fills * color_progress)
-                    
-                    # Draw color fills progressively (top to bottom)
-                    for i in range(min(fills_to_draw, len(color_fills))):
-                        contour = color_fills[i]
-                        
-                        # Create mask for this fill region
-                        mask = np.zeros((height, width), dtype=np.uint8)
-                        cv2.drawContours(mask, [contour], 0, 255, -1)
-                        
-                        # Apply original colors from image
-                        canvas[mask > 0] = img_color[mask > 0]
-                        
-                        # Update cursor position to center of filled region
-                        M = cv2.moments(contour)
-                        if M['m00'] != 0:
-                            cursor_x = int(M['m10'] / M['m00'])
-                            cursor_y = int(M['m01'] / M['m00'])
-                    
-                    # Draw cursor during fill pass
-                    if fills_to_draw < total_color_fills:
-                        canvas = self.draw_hand_cursor(canvas, cursor_x, cursor_y, frame_idx)
+                    # Draw the fills added since the previous frame (top to bottom)
+                    start, end = timeline.span('fills', frame_idx)
+                    for i in range(start, end):
+                        x, y, w, h = self.draw_fill(tiles.layer, color_fills[i])
+                        tiles.mark(x, y, x + w, y + h)
+                    canvas = tiles.compose()
                 
                 # ===== PASS 3: Show complete original image (final hold) =====
                 else:
                     # Show the COMPLETE original image for full resemblance
                     # No approximations, no missing details
-                    canvas = img_color.copy()
+                    canvas = img_color
+                    frame_key = 'hold'  # Identical frames: the sink reuses the first conversion
                     
                     # Optional: Add subtle "completion" effect on first hold frame
                     if frame_idx == outline_frames + color_frames:
                         logger.info("Transition to complete image hold")
                 
-                # Convert BGR to RGB and write frame
-                canvas_rgb = cv2.cvtColor(canvas, cv2.COLOR_BGR2RGB)
-                ffmpeg_process.stdin.write(canvas_rgb.tobytes())
+                if phase != self.PASS_HOLD:
+                    # Cursor while drawing; once every fill is done the frame stops changing
+                    cursor = timeline.cursor_at(frame_idx)
+                    if cursor is not None:
+                        cursor_x, cursor_y = cursor
+                        tiles.overlay_window(cursor_x - 22, cursor_y - 22, cursor_x + 25, cursor_y + 25)
+                        canvas = self.draw_hand_cursor(canvas, cursor_x, cursor_y, frame_idx)
+                    else:
+                        frame_key = 'complete'
+                    frame_dirty = tiles.dirty_rect()
+                
+                # Write the BGR frame (the sink converts, or FFmpeg reads bgr24 directly)
+                t = self.profiler.lap('render', frame_start)
+                self.sink.write(canvas, key=frame_key, dirty=frame_dirty)
+                self.profiler.lap('write', t)
+                
+                self.progress.update(frame_idx + 1)
                 
                 if (frame_idx + 1) % 25 == 0 or frame_idx == 0:
                     logger.info(f"Generated {frame_idx + 1}/{total_frames} frames ({(frame_idx + 1)/total_frames*100:.1f}%)")
             
             # Finalize
-            ffmpeg_process.stdin.close()
-            logger.info("Waiting for FFmpeg to finish...")
-            return_code = ffmpeg_process.wait(timeout=60)
-            
-            if return_code != 0:
-                stderr_lines = []
-                while not stderr_queue.empty():
-                    try: stderr_lines.append(stderr_queue.get_nowait().decode('utf-8', errors='ignore'))
-                    except: break
-                logger.error(f"FFmpeg failed: {''.join(stderr_lines)}")
-                return False
+            self.progress.update(total_frames, force=True)
+            self.progress.stage('encoding')
+            logger.info(f"Waiting for {self.sink.kind} sink to finish...")
+            with self.profiler.span('encoder_wait'):
+                if not self.sink.close():
+                    return False
+            total_seconds = time.perf_counter() - self.progress.render_start
             
             logger.info(f"✓ Whiteboard animation complete: {output_mp4}")
             
-            # Save outputs
-            output_dir = Path(output_mp4).parent
-            final_png = output_dir / (Path(output_mp4).stem + '_original.png')
-            cv2.imwrite(str(final_png), img_color)
-            
-            metadata_path = output_dir / (Path(output_mp4).stem + '_metadata.json')
-            self.metadata['outline_strokes'] = len(outline_paths)
-            self.metadata['color_fills'] = len(color_fills)
-            self.metadata['outline_frames'] = outline_frames
-            self.metadata['color_frames'] = color_frames
-            self.metadata['hold_frames'] = hold_frames
-            self.metadata['style'] = 'whiteboard-two-pass-hold'
-            self.metadata['guarantees_full_resemblance'] = True
-            with open(metadata_path, 'w') as f:
-                json.dump(self.metadata, f, indent=2)
-            
-            logger.info(f"Output files:")
-            logger.info(f"  MP4: {output_mp4}")
-            logger.info(f"  PNG: {final_png}")
-            logger.info(f"  Metadata: {metadata_path}")
-            
-            return True
+            self.metadata['tiles'] = tiles.info()
+            self.metadata['timeline'] = timeline.info()
+            self.metadata['sink'] = self.sink.info()
+            self.metadata['estimate'] = planner.finish(self.profiler.summary(), total_seconds)
+            return self.save_outputs(output_mp4, img_color, cache)
         except Exception as e:
             logger.error(f"Animation error: {e}")
             import traceback
@@ -369,17 +676,67 @@ class WhiteboardAnimator:
 
 
 def main():
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
     parser = argparse.ArgumentParser(description='Create whiteboard-style animation')
-    parser.add_argument('input', help='Input PNG file')
-    parser.add_argument('--output', required=True, help='Output MP4 file')
+    parser.add_argument('input', nargs='?', help='Input PNG file (optional with --from-scene)')
+    parser.add_argument('--output', required=True,
+                        help='Output MP4 file; .svg (CSS-animated SVG) or .json (Lottie) exports the vector animation instead')
     parser.add_argument('--duration', type=float, default=5.0, help='Duration in seconds')
     parser.add_argument('--fps', type=int, default=25, help='Frames per second')
     parser.add_argument('--width', type=int, default=1920, help='Output width')
     parser.add_argument('--height', type=int, default=1080, help='Output height')
     parser.add_argument('--variant', default='pen-sketch', help='Animation variant')
     parser.add_argument('--skeletonize', action='store_true', help='Skeletonize (ignored)')
+    parser.add_argument('--save-scene', help='Also write the extracted strokes to this scene file')
+    parser.add_argument('--from-scene', help='Render from a saved scene file instead of extracting strokes')
+    parser.add_argument('--profile-trace', help='Write a per-stage/per-frame timing trace (.json = Chrome trace, .jsonl = JSON lines)')
+    parser.add_argument('--progress-json', action='store_true',
+                        help='Emit rate-limited JSON-lines progress events on stdout')
+    parser.add_argument('--sink', choices=['ffmpeg', 'pyav', 'null', 'raw'], default='ffmpeg',
+                        help='Frame destination: ffmpeg encodes the MP4 in a subprocess, pyav encodes it in-process '
+                             '(needs PyAV, else falls back to ffmpeg), null discards frames (render cost only), '
+                             'raw writes --output as .y4m or headerless rgb24 (default: ffmpeg)')
+    parser.add_argument('--pipe-format', choices=['rgb24', 'y4m'], default='rgb24',
+                        help='FFmpeg pipe payload: packed rawvideo, or I420 in a Y4M stream '
+                             '(half the bytes, no swscale pass; default: rgb24)')
+    parser.add_argument('--encoder-stall-timeout', type=float, default=30,
+                        help='Kill FFmpeg only after this many seconds without encoder progress; 0 disables (default: 30)')
+    parser.add_argument('--encoder-timeout', type=float, default=None,
+                        help='Hard cap in seconds on waiting for FFmpeg after the last frame (default: none)')
+    parser.add_argument('--container', choices=['mp4', 'fmp4', 'hls'], default='mp4',
+                        help='mp4 moves the index to the front after encoding (+faststart); fmp4 writes a '
+                             'fragmented MP4 that can be streamed while it is still being written; hls writes '
+                             '--output as an .m3u8 playlist of 2 s CMAF segments, updated as each one completes '
+                             '(default: mp4)')
+    parser.add_argument('--tile-size', type=int, default=128,
+                        help='Tile edge in pixels for incremental rendering; only tiles touched by new '
+                             'strokes or effects are recomposed each frame (default: 128)')
+    parser.add_argument('--stroke-order', choices=['travel', 'top-down'], default='travel',
+                        help='Stroke drawing order: minimize pen travel or sweep top to bottom (default: travel)')
+    parser.add_argument('--point-budget', type=int, default=None, metavar='N',
+                        help='Outline points kept by level-of-detail simplification '
+                             '(default: 40000 at 1080p, scaled to the output size; 0 = no budget)')
+    parser.add_argument('--denoise-mode', choices=DENOISE_MODES, default='auto',
+                        help='Denoising path: auto picks skip/downscale/full from estimated noise (default: auto)')
+    parser.add_argument('--cache-dir', default=None,
+                        help='Reuse finished renders from this content-addressed output cache '
+                             '(default: $SKETCH_CACHE_DIR; unset = no cache)')
+    parser.add_argument('--cache-max-mb', type=float, default=None,
+                        help=f'Evict least recently used cache entries beyond this size (default: {DEFAULT_MAX_MB})')
+    parser.add_argument('--no-cache', action='store_true', help='Always render, even on a cache hit')
+    parser.add_argument('--deadline', type=float, default=None, metavar='SECONDS',
+                        help='Lower the preset, fps, outline detail and then resolution until the job is predicted '
+                             'to finish within SECONDS (default: no deadline)')
+    parser.add_argument('--cost-model', default=None,
+                        help='JSON file of render-time corrections, updated after every render '
+                             '(default: $SKETCH_COST_MODEL; unset = built-in costs)')
+    parser.add_argument('--frame', type=float, default=None, metavar='T',
+                        help='Render only the frame at T seconds to --output (.png/.jpg) instead of the video')
     
     args = parser.parse_args()
+    if not args.input and not args.from_scene:
+        parser.error('an input PNG is required unless --from-scene is given')
     
     config = {
         'duration': args.duration,
@@ -387,10 +744,31 @@ def main():
         'width': args.width,
         'height': args.height,
         'variant': args.variant,
+        'denoise_mode': args.denoise_mode,
+        'stroke_order': args.stroke_order,
+        'point_budget': args.point_budget,
+        'save_scene': args.save_scene,
+        'from_scene': args.from_scene,
+        'profile_trace': args.profile_trace,
+        'progress_json': args.progress_json,
+        'sink': args.sink,
+        'pipe_format': args.pipe_format,
+        'encoder_stall_timeout': args.encoder_stall_timeout,
+        'encoder_timeout': args.encoder_timeout,
+        'container': args.container,
+        'tile_size': args.tile_size,
+        'cache_dir': args.cache_dir,
+        'cache_max_mb': args.cache_max_mb,
+        'no_cache': args.no_cache,
+        'deadline': args.deadline,
+        'cost_model': args.cost_model,
     }
     
     animator = WhiteboardAnimator(config)
-    success = animator.create_whiteboard_animation(args.input, args.output)
+    if args.frame is not None:
+        success = render_poster(animator, args.input, args.output, args.frame) is not None
+    else:
+        success = animator.create_whiteboard_animation(args.input, args.output)
     
     result = {
         'success': success,
@@ -0,0 +1,563 @@
+#!/usr/bin/env python3
+"""
+Sketch Animation Benchmark - Throughput/latency harness for the five animators
+Generates synthetic inputs (line art, dense color, noisy photo) at 720p/1080p/4K,
+runs every animator against them with frames discarded in-process (null sink),
+piped to a stub encoder, encoded to FFmpeg's null muxer, written as a real MP4
+through the FFmpeg pipe, or encoded in-process with PyAV. Reports frames/sec, extraction time and peak memory
+(plus, with --poster, the cold-start latency of a single poster frame) and time to first
+frame. --startup checks the CLI cold start instead. Results can be saved
+as a JSON baseline and compared against a previous run to catch regressions
+between commits.
+
+Usage:
+    python sketch_benchmark.py                                   # full matrix, null sink
+    python sketch_benchmark.py --animators whiteboard color --resolutions 1080p
+    python sketch_benchmark.py --save-baseline bench/baseline.json
+    python sketch_benchmark.py --compare bench/baseline.json --threshold 0.15
+    python sketch_benchmark.py --animators color --render-threads 1 4 8 16   # thread scaling
+    python sketch_benchmark.py --resolutions 1080p --poster                  # + poster-frame cold start
+    python sketch_benchmark.py --startup --startup-budget-ms 150             # import cost of `--help`
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import statistics
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent
+
+RESOLUTIONS = {
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+    '4k': (3840, 2160),
+}
+
+INPUT_KINDS = ('lineart', 'color', 'noisy')
+
+ENCODERS = ('sink', 'stub', 'null', 'real', 'pyav')
+
+# name -> (module, class, entry method, profile stages counted as extraction)
+ANIMATORS = {
+    'whiteboard': ('sketch_animate_whiteboard', 'WhiteboardAnimator', 'create_whiteboard_animation',
+                   ('extract', 'scene_load')),
+    'highlight': ('sketch_animate_highlight', 'HighlightAnimator', 'create_highlight_animation',
+                  ('preprocess', 'pixel_order')),
+    'color': ('sketch_animate_color', 'ColorSketchAnimator', 'create_color_animation',
+              ('preprocess', 'pixel_order')),
+    'v2': ('sketch_animate_v2', 'SketchAnimatorV2', 'create_animation',
+           ('preprocess', 'extract', 'scene_load')),
+    'potrace': ('sketch_animate', 'SketchAnimator', 'process',
+                ('preprocess', 'convert_pbm', 'potrace', 'parse_svg')),
+}
+
+# Modules an animator's `--help` must not import (they load on first use, sketch_lazy.py)
+HEAVY_MODULES = ('cv2', 'numpy', 'av', 'scipy', 'PIL')
+
+# Import time allowed for an animator's `--help` (-X importtime, all modules)
+STARTUP_BUDGET_MS = 150.0
+
+# Animators that render frames on a thread pool (config 'render_threads')
+THREADED_ANIMATORS = ('color', 'potrace')
+
+# Test-double encoder: drains the rawvideo pipe and reports FFmpeg-style frame
+# counters, so the render loop and pipe are measured without encoding cost.
+_STUB_ENCODER = r'''
+import sys
+args = sys.argv[1:]
+if '-version' in args:
+    print('ffmpeg version benchmark-stub')
+    sys.exit(0)
+if '-encoders' in args or '-filters' in args:
+    sys.exit(0)  # Capability probe (sketch_toolchain.py): nothing listed, encoder args stay as they are
+received = frames = 0
+if 'yuv4mpegpipe' in args:
+    header = sys.stdin.buffer.readline().split()
+    w, h = (int(next(t[1:] for t in header if t.startswith(k))) for k in (b'W', b'H'))
+    frame_bytes = len(b'FRAME\n') + w * h * 3 // 2
+else:
+    w, h = map(int, args[args.index('-s') + 1].split('x')) if '-s' in args else (1920, 1080)
+    frame_bytes = w * h * 3
+while True:
+    chunk = sys.stdin.buffer.read(1 << 20)
+    if not chunk:
+        break
+    received += len(chunk)
+    while received >= frame_bytes:
+        received -= frame_bytes
+        frames += 1
+        if frames % 10 == 0:
+            sys.stderr.write(f'frame={frames:5d} fps=0.0 q=0.0 size=0kB\r')
+sys.stderr.write(f'frame={frames:5d} fps=0.0 q=0.0 Lsize=0kB\n')
+open(args[-1], 'wb').write(b'stub')
+'''
+
+# Real FFmpeg, but the output file is replaced by the null muxer: measures
+# encoding without muxing/disk writes.
+_NULL_ENCODER = r'''
+import sys, subprocess
+args = sys.argv[1:]
+if not {'-version', '-encoders', '-filters'} & set(args):
+    output = args.pop()
+    open(output, 'wb').write(b'null')
+    args += ['-f', 'null', '-']
+sys.exit(subprocess.call([REAL_FFMPEG] + args))
+'''
+
+
+def find_ffmpeg():
+    """Same lookup order as the animators."""
+    node_ffmpeg = Path(os.getcwd()) / 'node_modules' / 'ffmpeg-static' / 'ffmpeg.exe'
+    return str(node_ffmpeg) if node_ffmpeg.exists() else shutil.which('ffmpeg')
+
+
+def make_input(kind: str, width: int, height: int, path: str, seed: int = 7):
+    """Render a deterministic synthetic input image."""
+    import cv2
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    scale = width / 1920.0
+    if kind == 'lineart':
+        img = np.full((height, width, 3), 255, np.uint8)
+        for _ in range(60):
+            pts = rng.integers(0, (width, height), size=(int(rng.integers(3, 7)), 2)).astype(np.int32)
+            cv2.polylines(img, [pts], bool(rng.integers(0, 2)), (0, 0, 0), max(1, int(3 * scale)), cv2.LINE_AA)
+        for _ in range(25):
+            center = tuple(int(v) for v in rng.integers(0, (width, height)))
+            cv2.circle(img, center, int(rng.integers(20, 160) * scale), (0, 0, 0), max(1, int(2 * scale)), cv2.LINE_AA)
+        for i in range(8):
+            cv2.putText(img, f'Label {i}', (int(80 * scale), int((120 + i * 110) * scale)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1.6 * scale, (0, 0, 0), max(1, int(3 * scale)), cv2.LINE_AA)
+    elif kind == 'color':
+        img = np.full((height, width, 3), 255, np.uint8)
+        for _ in range(400):
+            color = tuple(int(c) for c in rng.integers(0, 230, 3))
+            center = tuple(int(v) for v in rng.integers(0, (width, height)))
+            if rng.random() < 0.5:
+                axes = tuple(int(v * scale) for v in rng.integers(10, 140, 2))
+                cv2.ellipse(img, center, axes, float(rng.integers(0, 180)), 0, 360, color, -1, cv2.LINE_AA)
+            else:
+                size = rng.integers(10, 200, 2) * scale
+                cv2.rectangle(img, center, (int(center[0] + size[0]), int(center[1] + size[1])), color, -1)
+            cv2.circle(img, center, int(6 * scale) + 1, (0, 0, 0), max(1, int(2 * scale)), cv2.LINE_AA)
+    elif kind == 'noisy':
+        ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+        base = 150 + 60 * np.sin(xs / (97 * scale)) * np.cos(ys / (131 * scale))
+        img = np.dstack([base, base * 0.9 + 20, base * 0.8 + 30]).clip(0, 255).astype(np.uint8)
+        for _ in range(40):
+            color = tuple(int(c) for c in rng.integers(0, 255, 3))
+            center = tuple(int(v) for v in rng.integers(0, (width, height)))
+            cv2.circle(img, center, int(rng.integers(20, 200) * scale), color, -1, cv2.LINE_AA)
+        img = (img.astype(np.float32) + rng.normal(0, 12, img.shape)).clip(0, 255).astype(np.uint8)
+        # Round-trip through JPEG for realistic block artifacts
+        _, encoded = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, 70])
+        img = cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+    else:
+        raise ValueError(f"Unknown input kind: {kind}")
+    cv2.imwrite(path, img)
+    return path
+
+
+def write_encoder(kind: str, workdir: str):
+    """Create the stub/null encoder executable; returns its path (None for 'sink', 'real' and 'pyav')."""
+    if kind in ('sink', 'real', 'pyav'):
+        return None
+    bin_dir = Path(workdir) / f'encoder-{kind}'
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    script = bin_dir / 'encoder.py'
+    source = _STUB_ENCODER if kind == 'stub' else _NULL_ENCODER.replace('REAL_FFMPEG', repr(find_ffmpeg()))
+    script.write_text(source)
+    if sys.platform == 'win32':
+        launcher = bin_dir / 'ffmpeg.cmd'
+        launcher.write_text(f'@"{sys.executable}" "{script}" %*\n')
+    else:
+        launcher = bin_dir / 'ffmpeg'
+        launcher.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{script}" "$@"\n')
+        launcher.chmod(0o755)
+    return str(launcher)
+
+
+def run_case(case: dict) -> dict:
+    """Run one animator on one input (called in a fresh child process)."""
+    import importlib
+    import logging
+
+    sys.path.insert(0, str(REPO_DIR))
+    logging.disable(logging.INFO)
+    module_name, class_name, method, extract_stages = ANIMATORS[case['animator']]
+    width, height = RESOLUTIONS[case['resolution']]
+    config = {
+        'width': width,
+        'height': height,
+        'fps': case['fps'],
+        'duration': case['duration'],
+        'variant': 'benchmark',
+    }
+    if case['encoder'] == 'sink':
+        config['sink'] = 'null'
+    elif case['encoder'] == 'pyav':
+        config['sink'] = 'pyav'
+    config['pipe_format'] = case.get('pipe_format', 'rgb24')
+    if case.get('render_threads') is not None:
+        config['render_threads'] = case['render_threads']
+    encoder = case.get('encoder_path')
+    if encoder:
+        config['ffmpeg_path'] = encoder
+        os.environ['PATH'] = os.path.dirname(encoder) + os.pathsep + os.environ.get('PATH', '')
+
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    animator = getattr(module, class_name)(config)
+    if encoder and hasattr(animator, 'ffmpeg_cmd'):
+        animator.ffmpeg_cmd = encoder
+
+    if case.get('poster'):
+        # Cold start of one mid-animation frame in a fresh process: import + extraction + render + write
+        from sketch_poster import render_poster
+        info = render_poster(animator, case['input'], str(Path(case['output']).with_suffix('.png')),
+                             case['duration'] / 2)
+        wall = time.perf_counter() - start
+        if not info:
+            return {'ok': False, 'error': 'poster frame failed'}
+        return {'ok': True, 'poster_seconds': round(wall, 3),
+                'poster_render_ms': round(info['render_seconds'] * 1000, 2)}
+
+    output = case['output']
+    start = time.perf_counter()
+    ok = bool(getattr(animator, method)(case['input'], output))
+    wall = time.perf_counter() - start
+
+    result = {'ok': ok, 'wall_seconds': round(wall, 3)}
+    metadata_path = Path(output).parent / (Path(output).stem + '_metadata.json')
+    if ok and metadata_path.exists():
+        metadata = json.loads(metadata_path.read_text())
+        profile = metadata.get('profile', {})
+        sink = metadata.get('sink') or metadata.get('processing_params', {}).get('sink', {})
+        render = metadata.get('render') or metadata.get('processing_params', {}).get('render', {})
+        estimate = metadata.get('estimate') or metadata.get('processing_params', {}).get('estimate', {})
+        stages = profile.get('stages', {})
+        frames = profile.get('frames', {})
+        frame_seconds = sum(step['total_seconds'] for step in frames.values())
+        total_frames = int(case['fps'] * case['duration'])
+        result.update({
+            'frames': total_frames,
+            'fps': round(total_frames / wall, 2),
+            'frame_loop_fps': round(total_frames / frame_seconds, 2) if frame_seconds else None,
+            'extract_seconds': round(sum(stages.get(name, {}).get('seconds', 0.0) for name in extract_stages), 3),
+            'encoder_wait_seconds': stages.get('encoder_wait', {}).get('seconds'),
+            # Time the render loop spent handing frames over (pipe writes or in-process encode)
+            'write_seconds': frames.get('write', {}).get('total_seconds'),
+            'encode_seconds': sink.get('encode_seconds'),
+            'render_p95_ms': frames.get('render', {}).get('p95_ms'),
+            'threads': render.get('threads'),
+            # From process start (interpreter, imports, extraction) to the first frame handed to the sink
+            'time_to_first_frame_seconds': profile.get('startup', {}).get('time_to_first_frame_seconds'),
+            'peak_rss_mb': profile.get('peak_rss_mb'),
+            'encoder_peak_rss_mb': profile.get('peak_rss_children_mb'),
+            # Cost model check (sketch_cost.py): predicted vs measured first frame -> closed sink
+            'estimated_seconds': estimate.get('total_seconds'),
+            'estimate_actual_seconds': estimate.get('actual', {}).get('total_seconds'),
+        })
+    return result
+
+
+def run_matrix(args) -> list:
+    workdir = args.workdir or tempfile.mkdtemp(prefix='sketch_bench_')
+    Path(workdir).mkdir(parents=True, exist_ok=True)
+    encoder_path = write_encoder(args.encoder, workdir)
+    if args.encoder in ('null', 'real') and not find_ffmpeg():
+        raise SystemExit(f"--encoder {args.encoder} needs FFmpeg on PATH")
+    if args.encoder == 'pyav':
+        try:
+            import av  # noqa: F401
+        except ImportError:
+            raise SystemExit("--encoder pyav needs PyAV (pip install av)")
+
+    thread_counts = sorted(set(args.render_threads)) if args.render_threads else [None]
+    if thread_counts[-1] and thread_counts[-1] > (os.cpu_count() or 1):
+        print(f"warning: {thread_counts[-1]} render threads on {os.cpu_count()} cores; "
+              f"scaling beyond the core count is not meaningful", file=sys.stderr)
+
+    results = []
+    for resolution in args.resolutions:
+        width, height = RESOLUTIONS[resolution]
+        for kind in args.inputs:
+            input_path = os.path.join(workdir, f'{kind}_{resolution}.png')
+            if not os.path.exists(input_path):
+                # In its own process, so the harness stays small and the cases' peak RSS is their own
+                subprocess.run([sys.executable, __file__, '--make-input',
+                                json.dumps([kind, width, height, input_path])], check=True, timeout=args.timeout)
+            for name, threads in ((name, threads) for name in args.animators
+                                  for threads in (thread_counts if name in THREADED_ANIMATORS else thread_counts[:1])):
+                case = {
+                    'animator': name,
+                    'input_kind': kind,
+                    'resolution': resolution,
+                    'encoder': args.encoder,
+                    'encoder_path': encoder_path,
+                    'pipe_format': args.pipe_format,
+                    'render_threads': threads if name in THREADED_ANIMATORS else None,
+                    'fps': args.fps,
+                    'duration': args.duration,
+                    'input': input_path,
+                    'output': os.path.join(workdir, f'{name}_{kind}_{resolution}.mp4'),
+                }
+                try:
+                    child = subprocess.run([sys.executable, __file__, '--run-case', json.dumps(case)],
+                                           cwd=os.getcwd(), capture_output=True, text=True, timeout=args.timeout)
+                    lines = child.stdout.strip().splitlines()
+                    result = json.loads(lines[-1]) if lines else {'ok': False, 'error': child.stderr[-500:]}
+                except subprocess.TimeoutExpired:
+                    result = {'ok': False, 'error': f'timeout after {args.timeout}s'}
+                record = {key: case[key] for key in ('animator', 'input_kind', 'resolution', 'encoder', 'pipe_format',
+                                                     'render_threads', 'fps', 'duration')}
+                record.update(result)
+                if args.poster and record.get('ok'):
+                    record.update(run_poster(dict(case, poster=True), args.timeout))
+                results.append(record)
+                print_row(record)
+
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def run_poster(case: dict, timeout: float) -> dict:
+    """Time a single poster frame (--frame at half the duration) in its own fresh process."""
+    try:
+        child = subprocess.run([sys.executable, __file__, '--run-case', json.dumps(case)],
+                               cwd=os.getcwd(), capture_output=True, text=True, timeout=timeout)
+        lines = child.stdout.strip().splitlines()
+        result = json.loads(lines[-1]) if lines else {'ok': False}
+    except subprocess.TimeoutExpired:
+        result = {'ok': False}
+    if not result.get('ok'):
+        return {'poster_seconds': None, 'poster_render_ms': None}
+    return {'poster_seconds': result['poster_seconds'], 'poster_render_ms': result['poster_render_ms']}
+
+
+def import_times(stderr: str) -> dict:
+    """Cumulative microseconds per top-level module from `python -X importtime` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name.startswith('  '):  # Nested imports are already in their importer's cumulative time
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def imported_modules(stderr: str) -> set:
+    """Every module (nested ones included) named in `python -X importtime` output."""
+    return {line.rsplit('|', 1)[1].strip() for line in stderr.splitlines()
+            if line.startswith('import time:') and 'cumulative' not in line}
+
+
+def run_startup(args) -> list:
+    """
+    Cold start of each animator's CLI: `python -X importtime <animator>.py --help`
+    in fresh processes (median of --startup-runs after one warm-up for bytecode
+    and the page cache). A case fails when it imports a HEAVY_MODULES entry or
+    its imports exceed the budget.
+    """
+    results = []
+    for name in args.animators:
+        script = str(REPO_DIR / f'{ANIMATORS[name][0]}.py')
+        import_ms, wall_ms, heavy = [], [], set()
+        for run in range(args.startup_runs + 1):
+            start = time.perf_counter()
+            child = subprocess.run([sys.executable, '-X', 'importtime', script, '--help'],
+                                   capture_output=True, text=True, timeout=args.timeout)
+            wall = time.perf_counter() - start
+            modules = import_times(child.stderr)
+            heavy.update(module.split('.')[0] for module in imported_modules(child.stderr)
+                         if module.split('.')[0] in HEAVY_MODULES)
+            if run and child.returncode == 0:
+                import_ms.append(sum(modules.values()) / 1000.0)
+                wall_ms.append(wall * 1000.0)
+        record = {'animator': name, 'ok': bool(import_ms) and not heavy,
+                  'import_ms': round(statistics.median(import_ms), 1) if import_ms else None,
+                  'wall_ms': round(statistics.median(wall_ms), 1) if wall_ms else None,
+                  'heavy_imports': sorted(heavy), 'budget_ms': args.startup_budget_ms}
+        if record['import_ms'] is not None and record['import_ms'] > args.startup_budget_ms:
+            record['ok'] = False
+        results.append(record)
+        print(f"{name:12s} --help  imports {record['import_ms'] or 0:7.1f} ms  process {record['wall_ms'] or 0:7.1f} ms"
+              + (f"  heavy: {', '.join(record['heavy_imports'])}" if heavy else '')
+              + ('' if record['ok'] else f"  FAILED (budget {args.startup_budget_ms:.0f} ms)"), file=sys.stderr)
+    return results
+
+
+def case_key(record: dict) -> str:
+    key = f"{record['animator']}/{record['input_kind']}/{record['resolution']}/{record['encoder']}"
+    pipe_format = record.get('pipe_format', 'rgb24')
+    if pipe_format != 'rgb24':
+        key = f'{key}/{pipe_format}'
+    if record.get('render_threads'):
+        key = f"{key}/t{record['render_threads']}"
+    return key
+
+
+def scaling(results: list) -> list:
+    """
+    Thread scaling per case: speedup in fps over the smallest thread count, and
+    efficiency = speedup / (threads / smallest threads); 1.0 is perfect scaling.
+    """
+    groups = {}
+    for record in results:
+        if record.get('ok') and record.get('render_threads'):
+            groups.setdefault(case_key(dict(record, render_threads=None)), []).append(record)
+    rows = []
+    for key, records in groups.items():
+        records.sort(key=lambda record: record['render_threads'])
+        base = records[0]
+        for record in records:
+            speedup = record['fps'] / base['fps'] if base['fps'] else 0.0
+            efficiency = speedup / (record['render_threads'] / base['render_threads'])
+            rows.append({'case': key, 'threads': record['render_threads'], 'fps': record['fps'],
+                         'speedup': round(speedup, 2), 'efficiency': round(efficiency, 2)})
+            print(f"{key:40s} {record['render_threads']:3d} threads {record['fps']:8.2f} fps  "
+                  f"speedup {speedup:5.2f}x  efficiency {efficiency * 100:5.1f}%", file=sys.stderr)
+    return rows
+
+
+def print_row(record: dict):
+    if not record.get('ok'):
+        print(f"{case_key(record):40s} FAILED {record.get('error', '')[:80]}", file=sys.stderr)
+        return
+    print(f"{case_key(record):40s} {record['fps']:8.2f} fps  loop {record['frame_loop_fps'] or 0:8.2f} fps  "
+          f"extract {record['extract_seconds']:7.3f}s  p95 {record['render_p95_ms'] or 0:8.2f} ms  "
+          f"job {record['wall_seconds']:7.2f}s  write {record.get('write_seconds') or 0:6.2f}s  "
+          f"rss {record['peak_rss_mb']} MiB"
+          + (f"  est {record['estimated_seconds']:.2f}/{record['estimate_actual_seconds']:.2f}s"
+             if record.get('estimated_seconds') is not None and record.get('estimate_actual_seconds') is not None else '')
+          + (f"  first frame {record['time_to_first_frame_seconds']:.3f}s"
+             if record.get('time_to_first_frame_seconds') is not None else '')
+          + (f"  poster {record['poster_seconds']:.3f}s" if record.get('poster_seconds') is not None else ''),
+          file=sys.stderr)
+
+
+def compare(results: list, baseline: list, threshold: float) -> list:
+    """Return regressions: a case that now fails, or fps dropped / extraction slowed by more than threshold."""
+    previous = {case_key(record): record for record in baseline if record.get('ok')}
+    regressions = []
+    for record in results:
+        before = previous.get(case_key(record))
+        if not before:
+            continue
+        if not record.get('ok'):
+            print(f"{case_key(record):40s} {'ok':28s} passed -> FAILED  REGRESSION", file=sys.stderr)
+            regressions.append({'case': case_key(record), 'metric': 'ok', 'before': True, 'after': False,
+                                'error': record.get('error', '')[:200]})
+            continue
+        checks = [
+            ('fps', before['fps'], record['fps'], record['fps'] < before['fps'] * (1 - threshold)),
+            ('extract_seconds', before['extract_seconds'], record['extract_seconds'],
+             record['extract_seconds'] > before['extract_seconds'] * (1 + threshold) + 0.01),
+        ]
+        for metric in ('time_to_first_frame_seconds', 'poster_seconds'):
+            if before.get(metric) is not None and record.get(metric) is not None:
+                checks.append((metric, before[metric], record[metric],
+                               record[metric] > before[metric] * (1 + threshold) + 0.01))
+        for metric, old, new, regressed in checks:
+            change = (new - old) / old * 100 if old else 0.0
+            print(f"{case_key(record):40s} {metric:28s} {old:9.3f} -> {new:9.3f} ({change:+.1f}%)"
+                  f"{'  REGRESSION' if regressed else ''}", file=sys.stderr)
+            if regressed:
+                regressions.append({'case': case_key(record), 'metric': metric, 'before': old, 'after': new})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the sketch animators')
+    parser.add_argument('--animators', nargs='+', choices=list(ANIMATORS), default=list(ANIMATORS))
+    parser.add_argument('--inputs', nargs='+', choices=INPUT_KINDS, default=list(INPUT_KINDS))
+    parser.add_argument('--resolutions', nargs='+', choices=list(RESOLUTIONS), default=list(RESOLUTIONS))
+    parser.add_argument('--encoder', choices=ENCODERS, default='sink',
+                        help='sink: in-process null sink (render only), stub: drain the pipe without encoding, '
+                             'null: real FFmpeg to the null muxer, real: write MP4 files through the FFmpeg pipe, '
+                             'pyav: write MP4 files with the in-process PyAV encoder (default: sink)')
+    parser.add_argument('--pipe-format', choices=['rgb24', 'y4m'], default='rgb24',
+                        help='FFmpeg pipe payload for the stub/null/real encoders (default: rgb24)')
+    parser.add_argument('--render-threads', nargs='+', type=int,
+                        help='Render thread counts to sweep for the thread-pool animators (color, potrace), '
+                             'e.g. 1 4 8 16; scaling efficiency is reported against the smallest count')
+    parser.add_argument('--poster', action='store_true',
+                        help='Also time a cold-start poster frame (the frame at half the duration, rendered '
+                             'alone in a fresh process) per case, reported as poster_seconds')
+    parser.add_argument('--startup', action='store_true',
+                        help='Only check the CLI cold start: time each animator\'s `--help` with -X importtime '
+                             'and fail if it imports OpenCV/NumPy/PyAV/SciPy/PIL or exceeds --startup-budget-ms')
+    parser.add_argument('--startup-budget-ms', type=float, default=STARTUP_BUDGET_MS,
+                        help=f'Import time allowed for `--help` (default: {STARTUP_BUDGET_MS:.0f})')
+    parser.add_argument('--startup-runs', type=int, default=5,
+                        help='Timed `--help` runs per animator, median reported (default: 5)')
+    parser.add_argument('--duration', type=float, default=2.0, help='Animation duration per case (default: 2.0)')
+    parser.add_argument('--fps', type=int, default=25, help='Frames per second (default: 25)')
+    parser.add_argument('--timeout', type=float, default=900, help='Per-case timeout in seconds (default: 900)')
+    parser.add_argument('--workdir', help='Keep generated inputs/outputs here instead of a temp directory')
+    parser.add_argument('--output', help='Write results JSON here')
+    parser.add_argument('--save-baseline', help='Write results as a baseline JSON file')
+    parser.add_argument('--compare', help='Compare against a baseline JSON file (exit 1 on regression)')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Relative change counted as a regression (default: 0.10)')
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    parser.add_argument('--make-input', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.make_input:
+        make_input(*json.loads(args.make_input))
+        return
+
+    if args.run_case:
+        print(json.dumps(run_case(json.loads(args.run_case))))
+        return
+
+    if args.startup:
+        results = run_startup(args)
+        if args.output:
+            Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+            Path(args.output).write_text(json.dumps({'startup': results}, indent=2))
+        failed = [record['animator'] for record in results if not record['ok']]
+        print(json.dumps({'startup': results, 'failed': failed}))
+        sys.exit(1 if failed else 0)
+
+    results = run_matrix(args)
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'platform': sys.platform,
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+    if args.render_threads and len(set(args.render_threads)) > 1:
+        report['scaling'] = scaling(results)
+    for path in (args.output, args.save_baseline):
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            Path(path).write_text(json.dumps(report, indent=2))
+
+    regressions = []
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        regressions = compare(results, baseline['results'], args.threshold)
+
+    print(json.dumps({
+        'cases': len(results),
+        'failed': sum(1 for record in results if not record.get('ok')),
+        'regressions': regressions,
+        'scaling': report.get('scaling', []),
+    }))
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Sketch Output Cache - Content-addressed cache of finished animations
+A render is keyed by the SHA-256 of its input file(s), the animator and its
+version string, every config value that changes the pixels (size, fps,
+duration, seed, ...) and the encoder profile. A hit hard-links (or copies) the
+cached MP4 and side files into place instead of rendering.
+
+Layout under the cache root:
+
+    entries/<key>/    one finished render: output.mp4, original.png, ..., entry.json
+    tmp/              entries being published (renamed into entries/ when complete)
+
+Publishing is a single rename of a fully written directory, so concurrent
+writers of the same key never expose a partial entry (the loser discards its
+copy). The cache is bounded by size: hits refresh an entry's mtime and the
+oldest entries are evicted after each publish.
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+CACHE_FORMAT = 1
+DEFAULT_MAX_MB = 2048
+
+# Config keys that never change the rendered output: kept out of the key so
+# retries with a new job id, progress mode or thread count still hit
+RUNTIME_CONFIG_KEYS = frozenset({
+    'variant', 'progress_json', 'profile_trace', 'save_scene', 'from_scene',
+    'encoder_stall_timeout', 'encoder_timeout', 'tile_size', 'render_threads',
+    'ffmpeg_path', 'cache_dir', 'cache_max_mb', 'no_cache', 'deadline', 'cost_model', 'toolchain_cache',
+})
+
+# Sinks whose output is an encoded MP4 worth caching (null/raw are measurement modes)
+CACHEABLE_SINKS = ('ffmpeg', 'pyav')
+
+# Stale tmp/ directories (crashed publishers) are removed after this many seconds
+STALE_TMP_SECONDS = 3600
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(animator: str, version: str, input_paths: list, config: dict,
+              encoder_args: list = None) -> str:
+    """Hex key for one render: input contents + output-affecting parameters."""
+    params = {
+        'format': CACHE_FORMAT,
+        'animator': animator,
+        'version': version,
+        'inputs': [file_digest(p) for p in input_paths],
+        'config': {k: v for k, v in sorted(config.items()) if k not in RUNTIME_CONFIG_KEYS},
+        'encoder': list(encoder_args or []),
+    }
+    blob = json.dumps(params, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(blob).hexdigest()
+
+
+def detach_outputs(paths):
+    """
+    Unlink destinations that share an inode with something else (a cache entry
+    placed by an earlier hit). Writers truncate in place, so without this a
+    render into a previous hit's output would overwrite the cached entry.
+    """
+    for dest in paths:
+        try:
+            if os.stat(dest).st_nlink > 1:
+                os.unlink(dest)
+        except OSError:
+            pass
+
+
+def output_files(output_path: str, suffixes: tuple) -> dict:
+    """
+    Map cache entry file names to the destination paths of one render:
+    'output.mp4' -> output_path, '_original.png' -> 'original.png' -> <stem>_original.png, ...
+    """
+    root, ext = os.path.splitext(output_path)
+    files = {'output' + ext: output_path}
+    for suffix in suffixes:
+        files[suffix.lstrip('_.')] = root + suffix
+    return files
+
+
+class OutputCache:
+    """
+    Size-bounded LRU cache of finished renders.
+
+        cache = OutputCache.for_render(config, 'color', version, [input_png],
+                                       output_mp4, ('_original.png', '_metadata.json'), ENCODER_ARGS)
+        if cache and cache.fetch({'variant': variant}):
+            return True                       # outputs linked into place
+        ... render, write outputs (metadata['cache'] = cache.info()) ...
+        if cache:
+            cache.publish()
+    """
+
+    def __init__(self, root: str, max_mb: float = DEFAULT_MAX_MB):
+        self.root = os.path.abspath(root)
+        self.max_bytes = int(max(0, max_mb) * 1024 * 1024)
+        self.entries_dir = os.path.join(self.root, 'entries')
+        self.tmp_dir = os.path.join(self.root, 'tmp')
+        os.makedirs(self.entries_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self.key = None
+        self.files = {}
+        self.stats = {'hit': False, 'linked': 0, 'copied': 0, 'evicted': 0}
+
+    @classmethod
+    def for_render(cls, config: dict, animator: str, version: str, input_paths: list,
+                   output_path: str, suffixes: tuple, encoder_args: list = None):
+        """
+        Cache bound to one render (its key and output files), configured by
+        --cache-dir / SKETCH_CACHE_DIR. None when disabled, when the sink does not
+        produce an MP4, or when the run must actually render (profiling, scene export);
+        the output files are then detached from any earlier hit before the render writes them.
+        """
+        root = config.get('cache_dir') or os.environ.get('SKETCH_CACHE_DIR')
+        uncached = (not root or config.get('no_cache')
+                    or config.get('sink', 'ffmpeg') not in CACHEABLE_SINKS
+                    or config.get('container') == 'hls'  # A playlist plus a variable number of segments
+                    or config.get('profile_trace') or config.get('save_scene'))
+        if uncached:
+            detach_outputs(output_files(output_path, suffixes).values())
+            return None
+        max_mb = config.get('cache_max_mb') or float(os.environ.get('SKETCH_CACHE_MAX_MB', DEFAULT_MAX_MB))
+        try:
+            cache = cls(root, max_mb)
+            cache.key = cache_key(animator, version, input_paths, config, encoder_args)
+        except OSError as e:
+            logger.warning(f"Output cache disabled ({root}: {e})")
+            detach_outputs(output_files(output_path, suffixes).values())
+            return None
+        cache.files = output_files(output_path, suffixes)
+        return cache
+
+    def _entry(self, key: str) -> str:
+        return os.path.join(self.entries_dir, key)
+
+    def _place(self, source: str, dest: str):
+        """Hard-link source to dest (copy across filesystems), replacing dest atomically."""
+        os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+        tmp = f"{dest}.cache-{os.getpid()}"
+        if os.path.lexists(tmp):
+            os.unlink(tmp)
+        try:
+            os.link(source, tmp)
+            self.stats['linked'] += 1
+        except OSError:
+            shutil.copyfile(source, tmp)
+            self.stats['copied'] += 1
+        os.replace(tmp, dest)
+
+    def fetch(self, metadata_updates: dict = None) -> bool:
+        """
+        Place the cached render at its destination paths; False on a miss.
+        The metadata JSON is rewritten (not linked) with metadata_updates and a
+        'cache' record. On a miss, destinations that are hard links into the cache
+        are unlinked so the new render cannot write through into an entry.
+        """
+        key, files = self.key, self.files
+        entry = self._entry(key)
+        if not os.path.exists(os.path.join(entry, 'entry.json')) or \
+                not all(os.path.exists(os.path.join(entry, name)) for name in files):
+            self.detach(files)
+            return False
+        try:
+            for name, dest in files.items():
+                source = os.path.join(entry, name)
+                if name.endswith('metadata.json'):
+                    with open(source) as f:
+                        metadata = json.load(f)
+                    metadata.update(metadata_updates or {})
+                    metadata['cache'] = {'hit': True, 'key': key}
+                    tmp = f"{dest}.cache-{os.getpid()}"
+                    with open(tmp, 'w') as f:
+                        json.dump(metadata, f, indent=2)
+                    os.replace(tmp, dest)
+                else:
+                    self._place(source, dest)
+            os.utime(entry)
+        except (OSError, ValueError) as e:
+            # Evicted underneath us or unreadable: render instead
+            logger.warning(f"Output cache entry {key[:12]} unusable ({e}), rendering")
+            self.detach(files)
+            return False
+        self.stats['hit'] = True
+        logger.info(f"Output cache hit {key[:12]}: {len(files)} files from {entry}")
+        return True
+
+    def detach(self, files: dict):
+        """Unlink destinations that share an inode with something else (a cache entry)."""
+        detach_outputs(files.values())
+
+    def publish(self) -> bool:
+        """Copy the finished render into the cache; a concurrent publisher of the same key may win."""
+        key, files = self.key, self.files
+        entry = self._entry(key)
+        if os.path.exists(entry):
+            return False
+        try:
+            staging = tempfile.mkdtemp(prefix=f'{key[:12]}-', dir=self.tmp_dir)
+        except OSError as e:
+            logger.warning(f"Output cache publish skipped: {e}")
+            return False
+        try:
+            size = 0
+            for name, source in files.items():
+                shutil.copyfile(source, os.path.join(staging, name))
+                size += os.path.getsize(source)
+            with open(os.path.join(staging, 'entry.json'), 'w') as f:
+                json.dump({'key': key, 'files': sorted(files), 'bytes': size,
+                           'created': time.time()}, f)
+            os.chmod(staging, 0o755)  # mkdtemp creates 0700; entries are shared with other processes
+            try:
+                os.rename(staging, entry)
+            except OSError:
+                # Another process published the same key first: its copy is equivalent
+                return False
+            logger.info(f"Output cache stored {key[:12]} ({size / 1e6:.1f} MB)")
+        except OSError as e:
+            logger.warning(f"Output cache publish failed: {e}")
+            return False
+        finally:
+            if os.path.exists(staging):
+                shutil.rmtree(staging, ignore_errors=True)
+        self.evict()
+        return True
+
+    def _entry_size(self, entry: str) -> int:
+        size = 0
+        for name in os.listdir(entry):
+            try:
+                size += os.path.getsize(os.path.join(entry, name))
+            except OSError:
+                pass
+        return size
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        for key in os.listdir(self.entries_dir):
+            path = self._entry(key)
+            try:
+                entries.append((os.stat(path).st_mtime, self._entry_size(path), path))
+            except OSError:
+                continue  # Removed concurrently
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            # Rename first so readers never see a half-deleted entry
+            trash = os.path.join(self.tmp_dir, f'evict-{os.getpid()}-{os.path.basename(path)}')
+            try:
+                os.rename(path, trash)
+            except OSError:
+                continue
+            shutil.rmtree(trash, ignore_errors=True)
+            total -= size
+            self.stats['evicted'] += 1
+        now = time.time()
+        for name in os.listdir(self.tmp_dir):
+            path = os.path.join(self.tmp_dir, name)
+            try:
+                if now - os.stat(path).st_mtime > STALE_TMP_SECONDS:
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError:
+                pass
+
+    def info(self) -> dict:
+        """Summary for _metadata.json."""
+        return {'hit': self.stats['hit'], 'key': self.key}
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Sketch Cost Model - Render/encode time estimates and deadline-aware quality selection
+Once extraction has compiled the timeline (sketch_timeline.py) the drawing work
+of every frame is known: how many pixels, segments, fills or contours it adds
+(or, for ranges redrawn in full each frame, how many it shows). With per-animator
+costs per megapixel-frame and per item, and the x264 preset throughput table
+for the encoder, that predicts the render and encode time before the first
+frame is drawn:
+
+    {"render_seconds": 3.1, "encode_seconds": 4.2, "total_seconds": 4.2, ...}
+
+Encoding in an FFmpeg subprocess overlaps rendering (total = the slower side);
+the in-process PyAV encoder adds to it. `--deadline SECONDS` walks a ladder of
+cheaper settings until the whole job is predicted to fit: faster x264 preset,
+lower fps, fewer outline points (whiteboard), lower resolution (re-extracts at the
+new size). The built-in costs are rough single-core figures; `--cost-model
+FILE` / $SKETCH_COST_MODEL keeps per-animator correction factors learned from
+finished renders.
+"""
+
+import os
+import json
+import time
+import logging
+
+from sketch_sinks import estimate_encode_seconds, split_encoder_args, X264_PRESET_MPIXELS_PER_SECOND
+
+logger = logging.getLogger(__name__)
+
+COST_MODEL_FORMAT = 1
+
+# Drawing cost in seconds per frame ('frames'), per megapixel-frame ('frame') and
+# per timeline item, single-threaded; fitted to 640x360 .. 1920x1080 renders of
+# line art, photos and dense diagrams (within about 30% of the measured time)
+RENDER_COSTS = {
+    'color': {'pixels': 4.4e-8},
+    'highlight': {'frames': 4.7e-3, 'frame': 1.9e-3, 'pixels': 8.6e-8},
+    'whiteboard': {'frames': 1.3e-4, 'frame': 2.2e-4, 'segments': 7.8e-6, 'fills': 1.0e-5},
+    'v2': {'frames': 2.0e-6, 'frame': 1.3e-6, 'contours': 1.2e-5},
+    'potrace': {'frame': 1.37e-2},
+}
+
+# Handing a frame to the sink (pixel conversion, pipe write), seconds per megapixel-frame
+WRITE_SECONDS_PER_MPIXEL = 0.002
+
+# Ranges every frame redraws in full (cost per item shown per frame, not per item added)
+CUMULATIVE_RANGES = {'color': ('pixels',)}
+
+# Ranges whose item counts grow with the frame area (pixels, unlike strokes)
+AREA_RANGES = ('pixels',)
+
+# Sinks that encode: FFmpeg runs alongside the renderer, PyAV on the same thread
+ENCODING_SINKS = {'ffmpeg': 'parallel', 'pyav': 'serial'}
+
+# Deadline ladder, cheapest quality loss first
+ENCODER_TIERS = ('veryfast', 'ultrafast')
+FPS_STEPS = (24, 20, 15)
+SIMPLIFY_STEPS = (2.0, 4.0)
+SCALE_STEPS = (0.75, 0.5)
+
+# Weight of a new sample in the calibration factors (exponential moving average)
+CALIBRATION_WEIGHT = 0.3
+
+# Saving outputs and closing the container after the last frame
+FINISH_SECONDS = 0.5
+
+
+def scene_work(kind: str, timeline, width: int, height: int) -> dict:
+    """Work units of one render: megapixel-frames and items per timeline range."""
+    work = {'frames': float(timeline.total_frames), 'frame': timeline.total_frames * width * height / 1e6}
+    for name in timeline.ranges:
+        ends = timeline.arrays[name]
+        if not len(ends):
+            work[name] = 0.0
+        elif name in CUMULATIVE_RANGES.get(kind, ()):
+            work[name] = float(ends.sum())
+        else:
+            work[name] = float(ends[-1])
+    return work
+
+
+def set_preset(encoder_args: list, preset: str):
+    """Replace (or add) the -preset value of an encoder argument list in place."""
+    if '-preset' in encoder_args:
+        encoder_args[encoder_args.index('-preset') + 1] = preset
+    else:
+        encoder_args += ['-preset', preset]
+
+
+class CostModel:
+    """
+    Per-animator correction factors for the built-in costs, kept in a small
+    JSON file. record() folds a finished render into them; concurrent writers
+    simply race (the last one wins), the file is always replaced whole.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.kinds = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+                if data.get('format') == COST_MODEL_FORMAT:
+                    self.kinds = data.get('kinds', {})
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring cost model {path}: {e}")
+
+    @classmethod
+    def for_config(cls, config: dict):
+        return cls(config.get('cost_model') or os.environ.get('SKETCH_COST_MODEL'))
+
+    def scale(self, kind: str, name: str) -> float:
+        return float(self.kinds.get(kind, {}).get(name, 1.0))
+
+    def record(self, kind: str, ratios: dict):
+        """Move the factors of `kind` towards the measured actual/built-in `ratios` and save the file."""
+        ratios = {name: ratio for name, ratio in ratios.items() if ratio and ratio > 0}
+        if not self.path or not ratios:
+            return
+        entry = self.kinds.setdefault(kind, {})
+        for name, ratio in ratios.items():
+            old = entry.get(name)
+            entry[name] = round(ratio if old is None else old + CALIBRATION_WEIGHT * (ratio - old), 4)
+        entry['samples'] = entry.get('samples', 0) + 1
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(tmp, 'w') as f:
+                json.dump({'format': COST_MODEL_FORMAT, 'kinds': self.kinds}, f, indent=2)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"Could not update cost model {self.path}: {e}")
+
+
+class RenderPlanner:
+    """
+    Runs an animator's extraction, estimates the render and, with a deadline,
+    lowers the settings until it fits. The animator provides prepare(input_png),
+    compile_timeline() -> Timeline, a mutable encoder_args list and, optionally,
+    simplify(factor); config changes (fps, width, height, simplify) are made in
+    animator.config.
+
+        planner = RenderPlanner('whiteboard', self.config)
+        estimate = planner.prepare(self, input_png)    # None if extraction failed
+        self.progress.estimate(estimate)
+        ... render and encode ...
+        self.metadata['estimate'] = planner.finish(self.profiler.summary(), total_seconds)
+    """
+
+    def __init__(self, kind: str, config: dict, sink: str = None):
+        self.kind = kind
+        self.config = config
+        self.sink = sink or config.get('sink', 'ffmpeg')
+        self.deadline = config.get('deadline') if self.sink != 'vector' else None
+        self.model = CostModel.for_config(config)
+        self.started = time.perf_counter()
+        self.steps = []
+        self.estimate = None
+        self.work = None
+        self.raw = None
+
+    def fits(self, estimate: dict, extra_seconds: float = 0.0) -> bool:
+        """Whether the predicted render (after extra_seconds of other work) ends before the deadline."""
+        elapsed = time.perf_counter() - self.started
+        return elapsed + extra_seconds + estimate['total_seconds'] + FINISH_SECONDS <= self.deadline
+
+    def predict(self, work: dict, width: int, height: int, frames: int, preset: str) -> dict:
+        """Seconds for the given work at one output size, frame count and x264 preset."""
+        if self.sink == 'vector':
+            work = {}
+        costs = RENDER_COSTS.get(self.kind, {})
+        draw = sum(costs.get(name, 0.0) * amount for name, amount in work.items())
+        write = WRITE_SECONDS_PER_MPIXEL * work.get('frame', 0.0) if self.sink != 'null' else 0.0
+        mode = ENCODING_SINKS.get(self.sink)
+        encode = estimate_encode_seconds(frames, width, height, preset) if mode else 0.0
+        self.raw = {'draw': draw, 'encode': encode}
+        render = draw * self.model.scale(self.kind, 'render') + write
+        encode *= self.model.scale(self.kind, 'encode')
+        total = render + encode if mode == 'serial' else max(render, encode)
+        return {
+            'render_seconds': round(render, 2),
+            'encode_seconds': round(encode, 2),
+            'total_seconds': round(total, 2),
+            'frames': frames,
+            'width': width,
+            'height': height,
+            'preset': preset,
+        }
+
+    def measure(self, animator) -> dict:
+        """Estimate for the animator's current timeline, settings and encoder."""
+        config, timeline = self.config, animator.timeline
+        width, height = config.get('width', 1920), config.get('height', 1080)
+        self.work = scene_work(self.kind, timeline, width, height)
+        preset = split_encoder_args(animator.encoder_args).get('preset', 'medium')
+        return self.predict(self.work, width, height, timeline.total_frames, preset)
+
+    def scaled(self, estimate: dict, scale: float) -> dict:
+        """Predicted estimate after re-extracting at `scale` times the resolution."""
+        area = scale * scale
+        work = {name: amount * area if name == 'frame' or name in AREA_RANGES else amount
+                for name, amount in self.work.items()}
+        width, height = scaled_size(estimate['width'], estimate['height'], scale)
+        return self.predict(work, width, height, estimate['frames'], estimate['preset'])
+
+    def prepare(self, animator, input_png: str):
+        """animator.prepare() plus the estimate; fits --deadline by lowering settings. None on failure."""
+        start = time.perf_counter()
+        if not animator.prepare(input_png):
+            return None
+        extract_seconds = time.perf_counter() - start
+        estimate = self.measure(animator)
+        if self.deadline and not self.fits(estimate):
+            estimate = self.fit(animator, input_png, estimate, extract_seconds)
+            if estimate is None:
+                return None
+        estimate['extract_seconds'] = round(extract_seconds, 2)
+        if self.deadline:
+            estimate['deadline_seconds'] = self.deadline
+            estimate['deadline_met'] = self.fits(estimate)
+            estimate['steps'] = list(self.steps)
+            if self.steps:
+                logger.info(f"Deadline {self.deadline:g}s: {', '.join(self.steps)}")
+            if not estimate['deadline_met']:
+                logger.warning(f"Deadline {self.deadline:g}s: predicted to overrun even at the lowest settings")
+        self.estimate = estimate
+        logger.info(f"Estimate: render {estimate['render_seconds']:.1f}s, encode {estimate['encode_seconds']:.1f}s "
+                    f"({estimate['frames']} frames at {estimate['width']}x{estimate['height']}, "
+                    f"preset {estimate['preset']})")
+        return estimate
+
+    def fit(self, animator, input_png: str, estimate: dict, extract_seconds: float):
+        """Walk the deadline ladder until the estimate fits in the remaining time (or the ladder ends)."""
+        config = self.config
+        rate = X264_PRESET_MPIXELS_PER_SECOND
+        x264 = split_encoder_args(animator.encoder_args).get('c:v', 'libx264') == 'libx264'
+        for preset in ENCODER_TIERS if x264 else ():
+            if rate.get(preset, 0) <= rate.get(estimate['preset'], 0) or estimate['encode_seconds'] == 0:
+                continue
+            set_preset(animator.encoder_args, preset)
+            self.steps.append(f'preset={preset}')
+            estimate = self.measure(animator)
+            if self.fits(estimate):
+                return estimate
+        for fps in FPS_STEPS:
+            if fps >= config.get('fps', 30):
+                continue
+            config['fps'] = fps
+            animator.timeline = animator.compile_timeline()
+            self.steps.append(f'fps={fps}')
+            estimate = self.measure(animator)
+            if self.fits(estimate):
+                return estimate
+        if hasattr(animator, 'simplify') and estimate['render_seconds'] >= estimate['encode_seconds']:
+            for factor in SIMPLIFY_STEPS:
+                config['simplify'] = factor
+                animator.simplify(factor)
+                animator.timeline = animator.compile_timeline()
+                self.steps.append(f'simplify={factor:g}')
+                estimate = self.measure(animator)
+                if self.fits(estimate):
+                    return estimate
+        if config.get('from_scene'):
+            return estimate  # A scene is extracted at one size
+        for scale in SCALE_STEPS:
+            predicted = self.scaled(estimate, scale)
+            if self.fits(predicted, extract_seconds * scale * scale):
+                break
+        config['width'], config['height'] = predicted['width'], predicted['height']
+        self.steps.append(f"size={predicted['width']}x{predicted['height']}")
+        logger.info(f"Deadline: re-extracting at {predicted['width']}x{predicted['height']}")
+        if not animator.prepare(input_png):
+            return None
+        return self.measure(animator)
+
+    def finish(self, profile: dict, total_seconds: float) -> dict:
+        """
+        Compare the estimate with the finished render (drawing and sink write time
+        from the profile, wall time from the first frame to the closed sink), update
+        the cost model and return the estimate with the actual times for _metadata.json.
+        """
+        estimate = dict(self.estimate or {})
+        frames = profile.get('frames', {})
+        draw = frames.get('render', {}).get('total_seconds')
+        write = frames.get('write', {}).get('total_seconds', 0.0)
+        estimate['actual'] = {'render_seconds': round(draw + write, 2) if draw is not None else None,
+                              'total_seconds': round(total_seconds, 2)}
+        estimate['work'] = {name: round(amount, 3) for name, amount in (self.work or {}).items()}
+        ratios = {}
+        if self.raw and draw and self.raw['draw']:
+            ratios['render'] = draw / self.raw['draw']
+        if self.raw and self.raw['encode']:
+            if ENCODING_SINKS.get(self.sink) == 'serial':
+                encoded = write  # PyAV encodes inside write()
+            elif draw is not None and total_seconds > 1.1 * (draw + write):
+                encoded = total_seconds  # Encoder-bound: the pipeline ran at the encoder's pace
+            else:
+                encoded = None  # Render-bound: the encoder's speed is unknown
+            if encoded:
+                ratios['encode'] = encoded / self.raw['encode']
+        self.model.record(self.kind, ratios)
+        return estimate
+
+
+def scaled_size(width: int, height: int, scale: float):
+    """Width and height scaled by `scale`, rounded down to even numbers (yuv420p)."""
+    return max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2)
@@ -0,0 +1,572 @@
+#!/usr/bin/env python3
+"""
+Sketch Geometry Helpers - Vectorized contour features, filtering and stroke ordering
+Computes per-contour features in one pass, drops noise/duplicate contours with a
+uniform grid index and orders strokes to minimize pen travel.
+"""
+
+from __future__ import annotations
+
+import time
+import logging
+
+from sketch_lazy import lazy_import
+
+np = lazy_import('numpy')
+
+logger = logging.getLogger(__name__)
+
+# Above this many strokes the pure-Python greedy tour (about 0.3s at this size)
+# is replaced by a vectorized Hilbert-curve tour; 2-opt refines both
+GREEDY_MAX_STROKES = 20000
+
+# Minimum 2-opt time for a Hilbert tour: the curve alone travels several
+# times further than greedy; 2-opt narrows the gap
+HILBERT_REFINE_SECONDS = 0.4
+
+# Structured dtype spec (a plain list, so importing this module does not import NumPy)
+CONTOUR_DTYPE = [
+    ('area', '<f8'),
+    ('perimeter', '<f8'),
+    ('cx', '<f8'),
+    ('cy', '<f8'),
+    ('x0', '<i4'),
+    ('y0', '<i4'),
+    ('x1', '<i4'),
+    ('y1', '<i4'),
+    ('n_points', '<i4'),
+]
+
+
+def contour_features(contours) -> np.ndarray:
+    """
+    Compute area, perimeter, bounding box and centroid for all contours at once.
+
+    Equivalent to calling cv2.contourArea / cv2.arcLength(closed=True) /
+    cv2.boundingRect / cv2.moments per contour, but done as a single pass over
+    the concatenated point array. Degenerate contours (zero area) get the mean
+    of their points as centroid. Bounding boxes are inclusive (x0..x1, y0..y1).
+    """
+    n = len(contours)
+    features = np.zeros(n, dtype=CONTOUR_DTYPE)
+    if n == 0:
+        return features
+
+    counts = np.fromiter((len(c) for c in contours), dtype=np.int64, count=n)
+    pts = np.concatenate([np.asarray(c).reshape(-1, 2) for c in contours]).astype(np.float64)
+    offsets = np.zeros(n, dtype=np.int64)
+    np.cumsum(counts[:-1], out=offsets[1:])
+
+    # Index of the next point on the same (closed) contour
+    nxt = np.arange(len(pts), dtype=np.int64) + 1
+    nxt[offsets + counts - 1] = offsets
+    x, y = pts[:, 0], pts[:, 1]
+    xn, yn = x[nxt], y[nxt]
+    cross = x * yn - xn * y
+
+    signed_area = 0.5 * np.add.reduceat(cross, offsets)
+    m10 = np.add.reduceat((x + xn) * cross, offsets) / 6.0
+    m01 = np.add.reduceat((y + yn) * cross, offsets) / 6.0
+    mean_x = np.add.reduceat(x, offsets) / counts
+    mean_y = np.add.reduceat(y, offsets) / counts
+
+    nonzero = signed_area != 0
+    safe_area = np.where(nonzero, signed_area, 1.0)
+    features['area'] = np.abs(signed_area)
+    features['perimeter'] = np.add.reduceat(np.hypot(xn - x, yn - y), offsets)
+    features['x0'] = np.minimum.reduceat(x, offsets)
+    features['y0'] = np.minimum.reduceat(y, offsets)
+    features['x1'] = np.maximum.reduceat(x, offsets)
+    features['y1'] = np.maximum.reduceat(y, offsets)
+    features['cx'] = np.where(nonzero, m10 / safe_area, mean_x)
+    features['cy'] = np.where(nonzero, m01 / safe_area, mean_y)
+    features['n_points'] = counts
+    return features
+
+
+class SpatialGrid:
+    """
+    Uniform grid over 2D points for radius and nearest-neighbour queries.
+
+    Cells are stored CSR-style (one flat member list plus per-cell offsets);
+    deletions are lazy via the skip flags passed to nearest().
+    """
+
+    def __init__(self, points: np.ndarray, cell_size: float = None, ids: np.ndarray = None):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        n = len(points)
+        self.min_xy = points.min(axis=0).tolist() if n else [0.0, 0.0]
+        extent = (points.max(axis=0) - self.min_xy).tolist() if n else [1.0, 1.0]
+        if cell_size is None:
+            # About two points per cell on average
+            cell_size = max(1.0, float(np.sqrt(max(extent[0], 1.0) * max(extent[1], 1.0) * 2.0 / max(n, 1))))
+        self.cell_size = cell_size
+        self.cols = int(extent[0] // cell_size) + 1
+        self.rows = int(extent[1] // cell_size) + 1
+
+        cell_xy = ((points - self.min_xy) // cell_size).astype(np.int64)
+        cell_ids = cell_xy[:, 1] * self.cols + cell_xy[:, 0]
+        order = np.argsort(cell_ids, kind='stable')
+        members = order if ids is None else np.asarray(ids)[order]
+        self.members = members.tolist()
+        self.offsets = np.searchsorted(cell_ids[order], np.arange(self.rows * self.cols + 1)).tolist()
+        # Plain Python floats indexed by member id: the query loops avoid NumPy scalar overhead
+        if ids is None:
+            self._xs = points[:, 0].tolist()
+            self._ys = points[:, 1].tolist()
+        else:
+            size = int(np.max(ids)) + 1 if n else 0
+            xs = np.zeros(size)
+            ys = np.zeros(size)
+            xs[ids] = points[:, 0]
+            ys[ids] = points[:, 1]
+            self._xs, self._ys = xs.tolist(), ys.tolist()
+        self.count = n
+
+    def cell_of(self, x: float, y: float):
+        col = min(max(int((x - self.min_xy[0]) // self.cell_size), 0), self.cols - 1)
+        row = min(max(int((y - self.min_xy[1]) // self.cell_size), 0), self.rows - 1)
+        return col, row
+
+    def query(self, x: float, y: float, radius: float):
+        """Ids of points in cells overlapping the square of half-size radius (candidates only)."""
+        col0, row0 = self.cell_of(x - radius, y - radius)
+        col1, row1 = self.cell_of(x + radius, y + radius)
+        members, offsets = self.members, self.offsets
+        found = []
+        for row in range(row0, row1 + 1):
+            base = row * self.cols
+            found.extend(members[offsets[base + col0]:offsets[base + col1 + 1]])
+        return found
+
+    def nearest(self, x: float, y: float, skip=None):
+        """
+        Nearest point as (id, squared distance), or (None, inf) when nothing is left.
+
+        skip is an optional sequence of flags indexed by id for lazily deleted points.
+        """
+        col, row = self.cell_of(x, y)
+        xs, ys = self._xs, self._ys
+        members, offsets, cols = self.members, self.offsets, self.cols
+        best, best_d2 = None, float('inf')
+        max_ring = max(cols, self.rows)
+        ring = 0
+        while ring <= max_ring:
+            for r in range(row - ring, row + ring + 1):
+                if r < 0 or r >= self.rows:
+                    continue
+                edge_row = r == row - ring or r == row + ring
+                step = 1 if edge_row else 2 * ring
+                for c in range(col - ring, col + ring + 1, max(step, 1)):
+                    if c < 0 or c >= cols:
+                        continue
+                    cid = r * cols + c
+                    for idx in members[offsets[cid]:offsets[cid + 1]]:
+                        if skip is not None and skip[idx]:
+                            continue
+                        dx = xs[idx] - x
+                        dy = ys[idx] - y
+                        d2 = dx * dx + dy * dy
+                        if d2 < best_d2:
+                            best, best_d2 = idx, d2
+            # Everything beyond this ring is at least ring * cell_size away
+            if best is not None and best_d2 <= (ring * self.cell_size) ** 2:
+                break
+            ring += 1
+        return best, best_d2
+
+
+def suppress_duplicates(features: np.ndarray, candidates: np.ndarray, tolerance: float = 3.0) -> np.ndarray:
+    """
+    Drop near-identical contours among candidates (indices into features).
+
+    Edge maps traced with RETR_LIST yield an inner and an outer contour for
+    every closed line, so the same stroke would be drawn twice. Two contours
+    count as duplicates when their centroids and all bounding-box sides lie
+    within tolerance pixels; the larger one is kept. Neighbours come from a
+    uniform grid over the centroids, so this stays linear in the contour count.
+    """
+    if len(candidates) < 2:
+        return candidates
+    sub = features[candidates]
+    centroids = np.column_stack((sub['cx'], sub['cy']))
+    grid = SpatialGrid(centroids, cell_size=max(2.0 * tolerance, 1.0))
+    cx, cy = sub['cx'].tolist(), sub['cy'].tolist()
+    boxes = np.column_stack((sub['x0'], sub['y0'], sub['x1'], sub['y1'])).tolist()
+    dropped = [False] * len(sub)
+    for i in np.argsort(-sub['area'], kind='stable').tolist():
+        if dropped[i]:
+            continue
+        bi = boxes[i]
+        for j in grid.query(cx[i], cy[i], tolerance):
+            if j == i or dropped[j]:
+                continue
+            if abs(cx[j] - cx[i]) > tolerance or abs(cy[j] - cy[i]) > tolerance:
+                continue
+            bj = boxes[j]
+            if max(abs(bj[0] - bi[0]), abs(bj[1] - bi[1]), abs(bj[2] - bi[2]), abs(bj[3] - bi[3])) <= tolerance:
+                dropped[j] = True
+    return candidates[~np.array(dropped)]
+
+
+def select_contours(features: np.ndarray, min_area: float, dedupe_tolerance: float = None):
+    """
+    Filter contours before any sorting: area threshold, then optional duplicate suppression.
+
+    Returns (indices, counts) where indices keep the input order and counts
+    reports how many contours were kept and dropped at each step.
+    """
+    keep = np.flatnonzero(features['area'] >= min_area)
+    counts = {'total': int(len(features)), 'dropped_small': int(len(features) - len(keep))}
+    if dedupe_tolerance is not None:
+        deduped = suppress_duplicates(features, keep, dedupe_tolerance)
+        counts['dropped_duplicate'] = int(len(keep) - len(deduped))
+        keep = deduped
+    counts['kept'] = int(len(keep))
+    return keep, counts
+
+
+def _hilbert_index(x: np.ndarray, y: np.ndarray, bits: int = 12) -> np.ndarray:
+    """Vectorized Hilbert curve index of integer coordinates in [0, 2**bits)."""
+    x = x.astype(np.int64).copy()
+    y = y.astype(np.int64).copy()
+    d = np.zeros(len(x), dtype=np.int64)
+    s = 1 << (bits - 1)
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        d += s * s * ((3 * rx) ^ ry)
+        # Rotate the quadrant so the curve stays continuous
+        flip = ~ry & rx
+        x = np.where(flip, s - 1 - x, x)
+        y = np.where(flip, s - 1 - y, y)
+        swap = ~ry
+        x, y = np.where(swap, y, x), np.where(swap, x, y)
+        s >>= 1
+    return d
+
+
+def _curve_order(points: np.ndarray, bits: int = 12) -> np.ndarray:
+    """Indices of points sorted along a Hilbert curve over their bounding box."""
+    lo = points.min(axis=0)
+    scale = ((1 << bits) - 1) / max(float((points.max(axis=0) - lo).max()), 1.0)
+    q = ((points - lo) * scale).astype(np.int64)
+    return np.argsort(_hilbert_index(q[:, 0], q[:, 1], bits), kind='stable')
+
+
+def _candidate_lists(points: np.ndarray, k: int = 8, window: int = 12) -> list:
+    """
+    Approximate k nearest neighbours of every point, nearest first.
+
+    Points close on a Hilbert curve are close in the plane, so comparing each
+    point with its +/-window curve neighbours finds most true neighbours with a
+    handful of vectorized passes instead of a per-point search. Missing
+    entries are filled with len(points) (callers treat that id as used).
+    """
+    m = len(points)
+    order = _curve_order(points)
+    sp = points[order]
+    dist = np.full((m, 2 * window), np.inf)
+    idx = np.full((m, 2 * window), m, dtype=np.int64)
+    for off in range(1, min(window, m - 1) + 1):
+        d = np.hypot(*(sp[off:] - sp[:-off]).T)
+        dist[:-off, off - 1] = d
+        idx[:-off, off - 1] = order[off:]
+        dist[off:, window + off - 1] = d
+        idx[off:, window + off - 1] = order[:-off]
+    k = min(k, 2 * window)
+    part = np.argpartition(dist, k - 1, axis=1)[:, :k]
+    part = np.take_along_axis(part, np.argsort(np.take_along_axis(dist, part, axis=1), axis=1), axis=1)
+    nearest = np.empty((m, k), dtype=np.int64)
+    nearest[order] = np.take_along_axis(idx, part, axis=1)
+    return nearest.tolist()
+
+
+def _greedy_tour(starts: np.ndarray, ends, first: int, first_flipped: bool):
+    """
+    Greedy nearest-neighbour tour over strokes; a stroke may be entered from either end.
+
+    Next strokes come from precomputed candidate lists; the spatial grid is only
+    searched when every candidate of the current endpoint is already used.
+    ends=None means closed strokes (entry point == exit point).
+    """
+    n = len(starts)
+    closed = ends is None
+    # Endpoint ids: i -> start of stroke i, n + i -> end of stroke i
+    endpoints = starts if closed else np.concatenate((starts, ends))
+    m = len(endpoints)
+    candidates = _candidate_lists(endpoints)
+    xs, ys = endpoints[:, 0].tolist(), endpoints[:, 1].tolist()
+    used = [False] * m + [True]  # Trailing sentinel for padded candidate slots
+    grid = None
+    grid_dead = 0
+    order = [0] * n
+    flipped = [False] * n
+
+    current, flip = first, first_flipped
+    for k in range(n):
+        order[k] = current
+        flipped[k] = flip
+        used[current] = True
+        if not closed:
+            used[current + n] = True
+        grid_dead += 1 if closed else 2
+        if k == n - 1:
+            break
+        tail = current if (flip or closed) else current + n
+        nxt = -1
+        for c in candidates[tail]:
+            if not used[c]:
+                nxt = c
+                break
+        if nxt < 0:
+            if grid is None or grid_dead * 4 > grid.count * 3:
+                # Built lazily, and rebuilt over the live endpoints once mostly used up
+                live = np.flatnonzero(~np.array(used[:-1]))
+                grid = SpatialGrid(endpoints[live], ids=live)
+                grid_dead = 0
+            nxt, _ = grid.nearest(xs[tail], ys[tail], skip=used)
+        current, flip = (nxt - n, True) if nxt >= n else (nxt, False)
+    return np.array(order, dtype=np.int64), np.array(flipped, dtype=bool)
+
+
+def _curve_tour(starts: np.ndarray, ends: np.ndarray, first: int, bits: int = 12):
+    """Space-filling-curve tour for large stroke counts (fully vectorized)."""
+    order = _curve_order((starts + ends) * 0.5, bits)
+    # Rotate the cyclic curve so the tour begins at the requested stroke
+    pos = int(np.flatnonzero(order == first)[0])
+    return np.roll(order, -pos)
+
+
+def _orient(starts: np.ndarray, ends: np.ndarray, order: np.ndarray, first_flipped: bool):
+    """Optimal per-stroke direction for a fixed order (2-state dynamic programming)."""
+    n = len(order)
+    s, e = starts[order], ends[order]
+    # jump[a][b]: from stroke k-1 exiting at a (0 = its end, 1 = its start)
+    # to stroke k entering at b (0 = its start, 1 = its end)
+    exits = (e[:-1], s[:-1])
+    entries = (s[1:], e[1:])
+    jump = [[np.hypot(*(entries[b] - exits[a]).T).tolist() for b in (0, 1)] for a in (0, 1)]
+
+    inf = float('inf')
+    cost0, cost1 = (inf, 0.0) if first_flipped else (0.0, inf)
+    # back_b[k]: state of stroke k given stroke k+1 is in state b
+    back0, back1 = [], []
+    for j00, j10, j01, j11 in zip(jump[0][0], jump[1][0], jump[0][1], jump[1][1]):
+        c0, c1 = cost0 + j00, cost1 + j10
+        f0, f1 = cost0 + j01, cost1 + j11
+        if c0 <= c1:
+            back0.append(0)
+        else:
+            back0.append(1)
+            c0 = c1
+        if f0 <= f1:
+            back1.append(0)
+        else:
+            back1.append(1)
+            f0 = f1
+        cost0, cost1 = c0, f0
+
+    states = [0] * n
+    state = 0 if cost0 <= cost1 else 1
+    for k in range(n - 1, 0, -1):
+        states[k] = state
+        state = back1[k - 1] if state else back0[k - 1]
+    states[0] = state
+    return np.array(states, dtype=bool)
+
+
+def _two_opt_pass(S: np.ndarray, E: np.ndarray, order: np.ndarray, flipped: np.ndarray,
+                  window: int = 24) -> int:
+    """
+    One vectorized 2-opt pass over an oriented stroke tour; returns the moves applied.
+
+    Reversing tour positions i..j also flips each stroke in the segment, so only
+    the two boundary jumps change: (E[i-1]->S[i], E[j]->S[j+1]) become
+    (E[i-1]->E[j], S[i]->S[j+1]). The best j within `window` is found for every
+    i at once; the improving moves that do not touch each other are applied
+    together, best first.
+    """
+    n = len(order)
+    # float32 copies: a pass is bound by memory traffic, and sub-pixel errors only skip negligible moves
+    sx, sy, ex, ey = (np.ascontiguousarray(a, dtype=np.float32) for a in (S[:, 0], S[:, 1], E[:, 0], E[:, 1]))
+    link = np.hypot(sx[1:] - ex[:-1], sy[1:] - ey[:-1])  # link[k]: E[k] -> S[k+1]
+    window = min(window, n - 1)
+    deltas = np.full((window, n), np.inf, dtype=np.float32)
+    for w in range(window):
+        # Row w: the move reversing i..i+w, for i = 1..m
+        m = n - 1 - w
+        delta = deltas[w, 1:1 + m]
+        np.hypot(ex[:m] - ex[1 + w:], ey[:m] - ey[1 + w:], out=delta)
+        delta -= link[:m]
+        delta[:-1] += np.hypot(sx[1:m] - sx[2 + w:], sy[1:m] - sy[2 + w:]) - link[1 + w:]
+    best_w = deltas.argmin(axis=0)
+    best = deltas[best_w, np.arange(n)]
+
+    candidates = np.flatnonzero(best < -1e-3)
+    if not len(candidates):
+        return 0
+    candidates = candidates[np.argsort(best[candidates], kind='stable')]
+    taken = bytearray(n + 1)
+    first, last = [], []
+    for i, w in zip(candidates.tolist(), best_w[candidates].tolist()):
+        # A move owns its segment and both boundary jumps
+        if any(taken[i - 1:i + w + 2]):
+            continue
+        taken[i - 1:i + w + 2] = b'\x01' * (w + 3)
+        first.append(i)
+        last.append(i + w)
+
+    first, last = np.array(first), np.array(last)
+    lengths = last - first + 1
+    offset = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    positions = np.repeat(first, lengths) + offset
+    perm = np.arange(n)
+    perm[positions] = np.repeat(last, lengths) - offset
+    reversed_ = np.zeros(n, dtype=bool)
+    reversed_[positions] = True
+    S[:], E[:] = np.where(reversed_[:, None], E[perm], S[perm]), np.where(reversed_[:, None], S[perm], E[perm])
+    order[:] = order[perm]
+    flipped[:] = flipped[perm] ^ reversed_
+    return len(first)
+
+
+def _two_opt(S: np.ndarray, E: np.ndarray, order: np.ndarray, flipped: np.ndarray,
+             time_budget: float, window: int = 24):
+    """
+    Windowed 2-opt passes on an oriented stroke tour until no move improves it
+    or the next pass would not finish within time_budget.
+    """
+    deadline = time.perf_counter() + time_budget
+    moves = 0
+    last_pass = 0.0
+    while time.perf_counter() + last_pass < deadline:
+        start = time.perf_counter()
+        applied = _two_opt_pass(S, E, order, flipped, window)
+        last_pass = time.perf_counter() - start
+        if not applied:
+            break
+        moves += applied
+    return moves
+
+
+def travel_length(starts: np.ndarray, ends: np.ndarray) -> float:
+    """Total pen-up travel for strokes drawn in the given order/orientation."""
+    if len(starts) < 2:
+        return 0.0
+    gaps = starts[1:] - ends[:-1]
+    return float(np.hypot(gaps[:, 0], gaps[:, 1]).sum())
+
+
+def order_strokes(starts, ends=None, time_budget: float = 0.1):
+    """
+    Order strokes to minimize pen travel between them.
+
+    starts/ends are (N, 2) arrays of stroke endpoints; pass ends=None for
+    strokes that begin and end at the same point (filled regions). The tour
+    starts at the top-most stroke and is built greedily with a spatial grid
+    (or along a Hilbert curve above GREEDY_MAX_STROKES), then refined with 2-opt
+    for up to time_budget seconds on top of the construction (at least
+    HILBERT_REFINE_SECONDS for a Hilbert tour).
+
+    Returns (order, reversed_mask, stats): order indexes the input strokes,
+    reversed_mask[k] is True when stroke order[k] should be drawn end-to-start.
+    """
+    start_time = time.perf_counter()
+    starts = np.asarray(starts, dtype=np.float64).reshape(-1, 2)
+    closed = ends is None
+    ends = starts if closed else np.asarray(ends, dtype=np.float64).reshape(-1, 2)
+    n = len(starts)
+    stats = {'strokes': n, 'travel_before': round(travel_length(starts, ends), 1)}
+    if n < 2:
+        stats.update({'method': 'none', 'travel_after': stats['travel_before'], 'two_opt_moves': 0, 'seconds': 0.0})
+        return np.arange(n), np.zeros(n, dtype=bool), stats
+
+    top = int(np.argmin(np.minimum(starts[:, 1], ends[:, 1])))
+    first_flipped = bool(not closed and ends[top, 1] < starts[top, 1])
+
+    if n <= GREEDY_MAX_STROKES:
+        order, flipped = _greedy_tour(starts, None if closed else ends, top, first_flipped)
+        method = 'greedy'
+    else:
+        order = _curve_tour(starts, ends, top)
+        flipped = np.zeros(n, dtype=bool) if closed else _orient(starts, ends, order, first_flipped)
+        method = 'hilbert'
+        time_budget = max(time_budget, HILBERT_REFINE_SECONDS)
+    if closed:
+        flipped[:] = False
+    S = np.where(flipped[:, None], ends[order], starts[order])
+    E = np.where(flipped[:, None], starts[order], ends[order])
+    initial_travel = travel_length(S, E)
+
+    moves = _two_opt(S, E, order, flipped, time_budget)
+    if closed:
+        flipped[:] = False
+
+    stats.update({
+        'method': method,
+        'travel_initial': round(initial_travel, 1),
+        'travel_after': round(travel_length(S, E), 1),
+        'two_opt_moves': moves,
+        'seconds': round(time.perf_counter() - start_time, 4),
+    })
+    return order, flipped, stats
+
+
+def _gaussian_levels(levels: int = 256) -> np.ndarray:
+    """Standard normal quantiles at `levels` equal-probability bin centres (float32)."""
+    from statistics import NormalDist
+
+    normal = NormalDist()
+    return np.array([normal.inv_cdf((i + 0.5) / levels) for i in range(levels)], dtype=np.float32)
+
+
+def reveal_order(mask: np.ndarray, weight_y: float, weight_x: float, jitter: float, rng=None,
+                 band_rows: int = 64) -> np.ndarray:
+    """
+    Pixel reveal order for the pixel-by-pixel animators.
+
+    Returns the flat (y * width + x) uint32 indices of the non-zero pixels of
+    `mask`, ordered by weight_y * y + weight_x * x + jitter * N(0, 1). The score
+    is quantized to whole-pixel buckets (coarser only past 16 bits) and packed
+    above the pixel index in one uint64 key, so a single integer sort yields the
+    order directly: no float64 argsort, no index indirection, and ties keep
+    raster order. The Gaussian jitter is drawn as one random byte per pixel from
+    256 quantile levels. Keys are built in bands of `band_rows` rows, so the only
+    full-size buffers are the 8-byte keys and the 4-byte result.
+    """
+    height, width = mask.shape[:2]
+    total = int(np.count_nonzero(mask))
+    if total == 0:
+        return np.empty(0, dtype=np.uint32)
+    if height * width > 2**32:
+        raise ValueError(f"Canvas {width}x{height} is too large for 32-bit pixel indices")
+    rng = rng if rng is not None else np.random.default_rng()
+    noise = _gaussian_levels() * np.float32(jitter)
+
+    # Score bounds are known up front, so keys are quantized in a single pass
+    low = min(0.0, weight_y * (height - 1)) + min(0.0, weight_x * (width - 1)) + float(noise.min())
+    high = max(0.0, weight_y * (height - 1)) + max(0.0, weight_x * (width - 1)) + float(noise.max())
+    step = max(1.0, (high - low) / 65535.0)
+
+    # Scores in bucket units: per-row and per-column terms, broadcast one band at a time
+    noise = (noise - np.float32(low)) / np.float32(step)
+    row_term = np.arange(height, dtype=np.float32) * np.float32(weight_y / step)
+    col_term = np.arange(width, dtype=np.float32) * np.float32(weight_x / step)
+    keys = np.empty(total, dtype=np.uint64)
+    offset = 0
+    for y0 in range(0, height, band_rows):
+        y1 = min(y0 + band_rows, height)
+        local = np.flatnonzero(mask[y0:y1].reshape(-1))
+        if len(local) == 0:
+            continue
+        score = (row_term[y0:y1, None] + col_term).reshape(-1)[local]
+        score += noise[rng.integers(0, 256, len(local), dtype=np.uint8)]
+        band = keys[offset:offset + len(local)]
+        band[:] = score.astype(np.uint16)
+        band <<= np.uint64(32)
+        band |= (local + y0 * width).astype(np.uint64)
+        offset += len(local)
+
+    keys.sort()
+    return keys.astype(np.uint32)
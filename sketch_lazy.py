@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Sketch Lazy Imports - Deferred loading of OpenCV and NumPy
+Importing cv2 (which imports NumPy) takes most of an animator's start-up, and
+`--help`, argument errors and cache hits never touch a pixel. Modules bind the
+heavy libraries through a stand-in that imports them on first attribute access:
+
+    cv2 = lazy_import('cv2')
+    np = lazy_import('numpy')
+
+    np.zeros(...)        # the first use imports NumPy; later uses are plain attribute lookups
+
+Only attribute access is deferred, so module-level constants and annotations
+must not touch them (use `from __future__ import annotations` for the latter).
+"""
+
+import sys
+import types
+import importlib
+
+
+class LazyModule(types.ModuleType):
+    """Module stand-in that imports the real module when an attribute is first read."""
+
+    def __getattr__(self, name: str):
+        module = importlib.import_module(self.__name__)
+        # Copy the real namespace in, so later lookups never reach __getattr__ again
+        self.__dict__.update(module.__dict__)
+        return getattr(module, name)
+
+
+def lazy_import(name: str):
+    """The module if it is already imported, else a LazyModule for it."""
+    module = sys.modules.get(name)
+    return module if module is not None else LazyModule(name)
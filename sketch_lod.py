@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Sketch Level of Detail - Point-budget outline simplification
+Outlines come out of extraction as polylines with a fixed relative tolerance,
+so dense inputs produce tens of thousands of points and every frame pays for
+them. StrokeLOD ranks every vertex of every outline once with Visvalingam-Whyatt
+elimination (one priority queue across all outlines: the vertex whose triangle
+with its neighbours has the smallest area goes first); any level of detail is a
+prefix of that removal order:
+
+    lod = StrokeLOD(outline_paths)
+    paths = lod.select(budget=40000, min_area=COLLINEAR_AREA)
+
+Near-collinear runs (triangle area below min_area) are always merged into one
+segment; the budget then removes the least visible vertices of the whole scene,
+so flat stretches of detailed outlines are thinned before simple ones lose shape.
+Tolerances are in output pixels; resolution_scale() scales the pixel thresholds
+tuned at 1080p to other output sizes.
+"""
+
+import math
+import time
+import heapq
+import bisect
+import logging
+
+from sketch_lazy import lazy_import
+
+np = lazy_import('numpy')
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_PIXELS = 1920 * 1080
+
+# Outline points kept at 1080p (scaled with the output's linear size)
+DEFAULT_POINT_BUDGET = 40000
+
+# Vertices whose triangle with their neighbours is smaller than this (px^2; on
+# the integer grid 0 or 0.5) deviate by under a pixel and are always merged
+COLLINEAR_AREA = 1.0
+
+# Strokes shorter than this (px at 1080p) after simplification are dropped
+MIN_STROKE_LENGTH = 4.0
+
+
+def resolution_scale(width: int, height: int) -> float:
+    """Linear size of the output relative to 1080p (1/3 at 640x360, 2 at 4K)."""
+    return math.sqrt(width * height / REFERENCE_PIXELS)
+
+
+def default_point_budget(width: int, height: int) -> int:
+    return int(DEFAULT_POINT_BUDGET * resolution_scale(width, height))
+
+
+class StrokeLOD:
+    """
+    Visvalingam-Whyatt ranking of all outline vertices. Path endpoints and the
+    first min_points points of every path are never removed. Ranking runs only
+    as far as select() needs it and resumes where it stopped.
+    """
+
+    def __init__(self, paths, min_points: int = 3):
+        start = time.perf_counter()
+        self.paths = paths
+        self.min_points = min_points
+        counts = np.array([len(path) for path in paths], dtype=np.int64)
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+        self.points = (np.array([p for path in paths for p in path], dtype=np.int64).reshape(-1, 2)
+                       if len(paths) else np.zeros((0, 2), dtype=np.int64))
+        self.order, self.areas = [], []
+        self._init_queue(counts)
+        self.rank_seconds = time.perf_counter() - start
+        self.selected = None
+
+    def _init_queue(self, counts):
+        """Linked lists of the path vertices and a heap of their triangle areas."""
+        n = len(self.points)
+        x, y = self.points[:, 0].astype(np.float64), self.points[:, 1].astype(np.float64)
+        index = np.arange(n, dtype=np.int64)
+        first = np.zeros(n, dtype=bool)
+        last = np.zeros(n, dtype=bool)
+        first[self.offsets[:-1][counts > 0]] = True
+        last[self.offsets[1:][counts > 0] - 1] = True
+        prev = np.where(first, -1, index - 1)
+        nxt = np.where(last, -1, index + 1)
+        interior = ~(first | last)
+        area = np.full(n, np.inf)
+        a, b, i = prev[interior], nxt[interior], index[interior]
+        area[interior] = 0.5 * np.abs((x[i] - x[a]) * (y[b] - y[a]) - (x[b] - x[a]) * (y[i] - y[a]))
+        path_of = np.repeat(np.arange(len(counts)), counts)
+        candidates = np.flatnonzero(interior & (counts[path_of] > self.min_points))
+        # The elimination loop works on Python lists (far faster than numpy element access)
+        self._x, self._y = x.tolist(), y.tolist()
+        self._prev, self._next, self._current = prev.tolist(), nxt.tolist(), area.tolist()
+        self._path_of, self._remaining = path_of.tolist(), counts.tolist()
+        self._heap = [(self._current[i], i) for i in candidates.tolist()]
+        heapq.heapify(self._heap)
+
+    def _rank(self, removals: int, min_area: float):
+        """Continue the elimination until `removals` vertices are out and the next one is at least min_area."""
+        x, y, prev, nxt, current = self._x, self._y, self._prev, self._next, self._current
+        path_of, remaining, heap = self._path_of, self._remaining, self._heap
+        order, areas, min_points = self.order, self.areas, self.min_points
+        heappop, heappush = heapq.heappop, heapq.heappush
+        while heap and (len(order) < removals or heap[0][0] < min_area):
+            value, i = heappop(heap)
+            if value != current[i]:
+                continue  # Stale entry: the vertex was re-queued or removed
+            p = path_of[i]
+            if remaining[p] <= min_points:
+                continue
+            remaining[p] -= 1
+            current[i] = -1.0
+            order.append(i)
+            areas.append(value)
+            a, b = prev[i], nxt[i]
+            nxt[a], prev[b] = b, a
+            for j in (a, b):
+                pa, pb = prev[j], nxt[j]
+                if pa < 0 or pb < 0:
+                    continue
+                # Never below the area just removed, so removals stay in area order
+                tri = 0.5 * abs((x[j] - x[pa]) * (y[pb] - y[pa]) - (x[pb] - x[pa]) * (y[j] - y[pa]))
+                current[j] = max(tri, value)
+                heappush(heap, (current[j], j))
+
+    def select(self, budget: int = None, min_area: float = COLLINEAR_AREA, min_length: float = 0.0):
+        """
+        Outlines with every vertex under min_area removed and, with a budget,
+        as many more as needed to get down to `budget` points (as far as the
+        per-path minimum allows). Strokes shorter than min_length are dropped.
+        """
+        start = time.perf_counter()
+        n = len(self.points)
+        self._rank(n - int(budget) if budget is not None else 0, min_area)
+        self.rank_seconds += time.perf_counter() - start
+        removed = bisect.bisect_left(self.areas, min_area)
+        if budget is not None:
+            removed = max(removed, min(n - int(budget), len(self.order)))
+        keep = np.ones(n, dtype=bool)
+        keep[self.order[:removed]] = False
+
+        paths, dropped = [], 0
+        for s, e in zip(self.offsets[:-1].tolist(), self.offsets[1:].tolist()):
+            points = self.points[s:e][keep[s:e]]
+            if min_length > 0 and np.hypot(*np.diff(points, axis=0).T).sum() < min_length:
+                dropped += 1
+                continue
+            paths.append(list(map(tuple, points.tolist())))
+        self.selected = {
+            'budget': None if budget is None else int(budget),
+            'min_area': float(min_area),
+            'max_area': round(float(self.areas[removed - 1]), 3) if removed else 0.0,
+            'points_out': int(sum(len(path) for path in paths)),
+            'segments_out': int(sum(len(path) - 1 for path in paths)),
+            'paths_out': len(paths),
+            'dropped_short': dropped,
+        }
+        return paths
+
+    def info(self) -> dict:
+        """Summary for _metadata.json: points/segments before and after, the budget and the largest area removed."""
+        info = {
+            'points_in': int(len(self.points)),
+            'segments_in': int(len(self.points) - len(self.paths)),
+            'paths_in': len(self.paths),
+            'rank_seconds': round(self.rank_seconds, 4),
+        }
+        info.update(self.selected or {})
+        return info
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Sketch Poster Frames - Random-access single-frame rendering for thumbnails and scrubbing
+Every animator splits its job into prepare() (extraction: the reveal timeline,
+strokes or contours) and render_frame(t), which builds the frame shown at t
+seconds directly from that timeline with about one frame's worth of drawing,
+instead of rendering and encoding every frame before it. `--frame T` on each
+animator writes that frame as an image.
+"""
+
+import os
+import time
+import shutil
+import logging
+
+from sketch_cache import detach_outputs
+
+logger = logging.getLogger(__name__)
+
+# Guards t * fps against float error (t = 2/25 must land on frame 2, not 1)
+FRAME_EPSILON = 1e-6
+
+
+def frame_at(t: float, fps: float, total_frames: int) -> int:
+    """Index of the frame on screen at t seconds, clamped to the animation."""
+    frame_idx = int(max(0.0, float(t)) * fps + FRAME_EPSILON)
+    return max(0, min(frame_idx, total_frames - 1))
+
+
+def write_image(path: str, frame) -> bool:
+    """Write a BGR frame as PNG/JPEG/WebP (by extension) with OpenCV, or PIL without it."""
+    detach_outputs([path])  # Never write through a hard link into the output cache
+    try:
+        import cv2
+    except ImportError:
+        from PIL import Image
+        Image.fromarray(frame[:, :, ::-1]).save(path)
+        return True
+    return bool(cv2.imwrite(path, frame))
+
+
+def render_poster(animator, input_png: str, output_path: str, t: float):
+    """
+    Render the frame at t seconds of the animation `animator` would produce for
+    input_png and write it to output_path. Returns timings, or None on failure.
+    """
+    try:
+        start = time.perf_counter()
+        if not animator.prepare(input_png):
+            return None
+        prepared = time.perf_counter()
+        frame = animator.render_frame(t)
+        rendered = time.perf_counter()
+        if frame is None:
+            logger.error(f"Could not render the frame at {t:g}s")
+            return None
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        if not write_image(output_path, frame):
+            logger.error(f"Could not write {output_path}")
+            return None
+        info = {
+            't': float(t),
+            'prepare_seconds': round(prepared - start, 4),
+            'render_seconds': round(rendered - prepared, 4),
+        }
+        logger.info(f"✓ Frame at {t:g}s: {output_path} (prepare {info['prepare_seconds']:.3f}s, "
+                    f"render {info['render_seconds'] * 1000:.1f} ms)")
+        return info
+    except Exception as e:
+        logger.error(f"Frame render error: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+    finally:
+        temp_dir = getattr(animator, 'temp_dir', None)
+        if temp_dir and os.path.exists(temp_dir):
+            shutil.rmtree(temp_dir, ignore_errors=True)
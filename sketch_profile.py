@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Sketch Profiling Helpers - Lightweight per-stage instrumentation for the animators
+Named spans for one-off stages (denoise, extraction, encoder wait, ...), per-frame
+timing samples summarised as p50/p95/max, peak RSS, start-up latency (process
+start to profiler, and to the first written frame), and an opt-in trace export
+(Chrome trace JSON or JSON lines) for flame-style analysis.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+def _process_start() -> float:
+    """
+    perf_counter() value at which this process started: from /proc on Linux
+    (so interpreter start-up and imports count), else the time this module was imported.
+    """
+    now = time.perf_counter()
+    try:
+        with open('/proc/self/stat') as f:
+            # Fields after the parenthesised command name; starttime is field 22
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        age = uptime - start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return now
+    return now - age if 0.0 <= age < 60.0 else now
+
+
+PROCESS_START = _process_start()
+
+
+def _percentile(sorted_values: list, q: float) -> float:
+    """Linearly interpolated percentile of an already sorted list (stdlib only, like np.percentile)."""
+    position = (len(sorted_values) - 1) * q / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def _vm_hwm_mb():
+    """VmHWM (peak RSS) from /proc/self/status in MiB, None where /proc is unavailable."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except (OSError, ValueError, IndexError):
+        return None
+    return None
+
+
+def peak_rss_mb(children: bool = False):
+    """
+    Peak resident set size of this process (or its waited-for children) in MiB, None if unknown.
+
+    On Linux ru_maxrss survives fork/exec, so a job spawned by a large parent
+    would report the parent's high-water mark; this process's figure comes from
+    VmHWM instead, with ru_maxrss only as the fallback elsewhere. The children
+    figure has no such source and carries the same caveat: it is the largest of
+    the waited-for children, each of which may have inherited its parent's peak.
+    """
+    if not children:
+        peak = _vm_hwm_mb()
+        if peak is not None:
+            return peak
+    try:
+        import resource
+    except ImportError:
+        if children:
+            return None
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return round(getattr(info, 'peak_wset', info.rss) / 2**20, 1)
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in bytes on macOS, kilobytes elsewhere
+    return round(peak / (2**20 if sys.platform == 'darwin' else 1024), 1)
+
+
+class StageProfiler:
+    """
+    Collects named spans and per-frame samples for one animation job.
+
+    Usage in the frame loop (one perf_counter call per measured step):
+
+        t = time.perf_counter()
+        ...render...
+        t = profiler.lap('render', t)
+        ...write...
+        profiler.lap('write', t)
+
+    Individual events are only kept when trace=True, so the default cost is
+    a list append per sample.
+    """
+
+    def __init__(self, trace: bool = False):
+        self.origin = time.perf_counter()
+        self.spans = {}
+        self.samples = {}
+        self.events = [] if trace else None
+        self.first_frame = None
+
+    @contextmanager
+    def span(self, name: str):
+        """Time a one-off stage; repeated spans with the same name accumulate."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            count, total = self.spans.get(name, (0, 0.0))
+            self.spans[name] = (count + 1, total + end - start)
+            if self.events is not None:
+                self.events.append((name, 'stage', start, end))
+
+    def lap(self, name: str, start: float) -> float:
+        """
+        Record a per-frame sample that started at `start`; returns now for chaining.
+        Safe to call from render worker threads (setdefault/append are atomic).
+        """
+        end = time.perf_counter()
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples.setdefault(name, [])
+        samples.append(end - start)
+        if self.first_frame is None and name == 'write':
+            self.first_frame = end
+        if self.events is not None:
+            self.events.append((name, 'frame', start, end))
+        return end
+
+    def summary(self) -> dict:
+        """Timing breakdown for _metadata.json (seconds for stages, milliseconds for frames)."""
+        frames = {}
+        for name, samples in self.samples.items():
+            values = sorted(samples)
+            frames[name] = {
+                'count': len(values),
+                'total_seconds': round(sum(values), 4),
+                'p50_ms': round(_percentile(values, 50) * 1000.0, 3),
+                'p95_ms': round(_percentile(values, 95) * 1000.0, 3),
+                'max_ms': round(values[-1] * 1000.0, 3),
+            }
+        return {
+            'wall_seconds': round(time.perf_counter() - self.origin, 4),
+            'stages': {name: {'count': count, 'seconds': round(total, 4)}
+                       for name, (count, total) in self.spans.items()},
+            'frames': frames,
+            'startup': {
+                'ready_seconds': round(self.origin - PROCESS_START, 4),
+                'time_to_first_frame_seconds': (round(self.first_frame - PROCESS_START, 4)
+                                                if self.first_frame is not None else None),
+            },
+            'peak_rss_mb': peak_rss_mb(),
+            'peak_rss_children_mb': peak_rss_mb(children=True),
+        }
+
+    def log_summary(self, summary: dict = None):
+        """One log line per stage / frame step, slowest first."""
+        summary = summary or self.summary()
+        stages = sorted(summary['stages'].items(), key=lambda item: -item[1]['seconds'])
+        logger.info(f"Profile: {summary['wall_seconds']:.2f}s wall, peak RSS {summary['peak_rss_mb']} MiB")
+        startup = summary['startup']
+        first_frame = startup['time_to_first_frame_seconds']
+        logger.info(f"  start-up: ready after {startup['ready_seconds']:.3f}s"
+                    + (f", first frame after {first_frame:.3f}s" if first_frame is not None else ""))
+        for name, stage in stages:
+            logger.info(f"  stage {name}: {stage['seconds']:.3f}s")
+        for name, frame in summary['frames'].items():
+            logger.info(f"  frame {name}: p50 {frame['p50_ms']:.2f} ms, p95 {frame['p95_ms']:.2f} ms, "
+                        f"max {frame['max_ms']:.2f} ms ({frame['total_seconds']:.2f}s total)")
+
+    def finish(self, trace_path: str = None) -> dict:
+        """Summarise, log and (optionally) export the trace; returns the summary for metadata."""
+        summary = self.summary()
+        self.log_summary(summary)
+        if trace_path:
+            self.export_trace(trace_path)
+        return summary
+
+    def export_trace(self, path: str) -> bool:
+        """
+        Write recorded events: '.jsonl' -> one JSON object per line, anything else ->
+        Chrome trace format (open in chrome://tracing or ui.perfetto.dev).
+        """
+        if self.events is None:
+            logger.warning("Trace export requested but tracing was not enabled")
+            return False
+        pid = os.getpid()
+        records = [{
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': round((start - self.origin) * 1e6, 1),
+            'dur': round((end - start) * 1e6, 1),
+            'pid': pid,
+            'tid': 1 if category == 'frame' else 0,
+        } for name, category, start, end in self.events]
+        with open(path, 'w') as f:
+            if path.endswith('.jsonl'):
+                for record in records:
+                    f.write(json.dumps(record) + '\n')
+            else:
+                json.dump({'traceEvents': records, 'displayTimeUnit': 'ms'}, f)
+        logger.info(f"Saved profile trace: {path} ({len(records)} events)")
+        return True
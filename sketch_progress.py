@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Sketch Progress Events - Machine-readable progress stream for the job manager
+Emits rate-limited JSON lines on stdout ({"event": "progress", ...}) next to the
+final JSON result, and reads FFmpeg's stderr so encoder throughput is known.
+
+Event shapes (one JSON object per line):
+
+    {"event": "stage", "stage": "extracting" | "rendering" | "encoding" | "done", "elapsed_seconds": ...}
+    {"event": "estimate", "render_seconds": 3.1, "encode_seconds": 4.2, "total_seconds": 4.7, "frames": 250,
+     "width": 1920, "height": 1080, "preset": "fast", "extract_seconds": 0.8, "elapsed_seconds": 0.9}
+    {"event": "progress", "stage": "rendering" | "encoding", "frame": 120, "total_frames": 250, "percent": 48.0,
+     "render_fps": 61.2, "encoder_fps": 55.0, "encoder_frame": 110, "eta_seconds": 2.4,
+     "elapsed_seconds": 3.1}
+"""
+
+import re
+import sys
+import json
+import time
+import threading
+
+_FRAME_STAT = re.compile(rb'frame=\s*(\d+)')
+
+
+class ProgressReporter:
+    """
+    Rate-limited progress emitter. update() costs one perf_counter call when no
+    event is due, so it can be called on every frame of the hot loop.
+    Encoder status lines also trigger events, so progress keeps flowing while
+    the main thread is blocked flushing the pipe buffer or waiting for FFmpeg.
+    Disabled reporters never write anything but still track encoder progress.
+    """
+
+    def __init__(self, total_frames: int, enabled: bool = False, min_interval: float = 0.5, stream=None):
+        self.total_frames = max(1, int(total_frames))
+        self.enabled = enabled
+        self.min_interval = min_interval
+        self.stream = stream or sys.stdout
+        self.start = time.perf_counter()
+        self.render_start = None
+        self.render_end = None
+        self.next_emit = 0.0
+        self.current_stage = 'starting'
+        self.frame = 0
+        self.encoder_frame = 0
+        self._lock = threading.Lock()
+
+    def _emit(self, event: dict):
+        with self._lock:
+            self.stream.write(json.dumps(event) + '\n')
+            self.stream.flush()
+
+    def stage(self, name: str):
+        """Announce a pipeline stage; 'rendering' also starts the fps clock."""
+        now = time.perf_counter()
+        self.current_stage = name
+        if name == 'rendering':
+            self.render_start = now
+        if self.enabled:
+            self._emit({'event': 'stage', 'stage': name, 'elapsed_seconds': round(now - self.start, 2)})
+
+    def estimate(self, estimate: dict):
+        """Announce the predicted render/encode time (sketch_cost.py), once extraction is done."""
+        if estimate and 'frames' in estimate:
+            self.total_frames = max(1, int(estimate['frames']))  # --deadline may have lowered the fps
+        if self.enabled and estimate:
+            self._emit({'event': 'estimate', **estimate,
+                        'elapsed_seconds': round(time.perf_counter() - self.start, 2)})
+
+    def update(self, frames_done: int, force: bool = False):
+        """Record frames rendered so far; emits at most once per min_interval."""
+        self.frame = frames_done
+        if frames_done >= self.total_frames and self.render_end is None:
+            self.render_end = time.perf_counter()
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if now < self.next_emit and not force:
+            return
+        self.next_emit = now + self.min_interval
+        self._emit(self.snapshot(now))
+
+    def encoder_update(self, encoder_frame: int):
+        """Record the encoder's frame counter (stderr reader thread or in-process encoder)."""
+        self.encoder_frame = encoder_frame
+        if not self.enabled or self.render_start is None:
+            return
+        now = time.perf_counter()
+        if now >= self.next_emit:
+            self.next_emit = now + self.min_interval
+            self._emit(self.snapshot(now))
+
+    def snapshot(self, now: float = None) -> dict:
+        """Current progress as an event dict (also used for the final summary)."""
+        now = now or time.perf_counter()
+        render_start = self.render_start or self.start
+        render_fps = self.frame / max(1e-6, (self.render_end or now) - render_start)
+        encoder_fps = self.encoder_frame / max(1e-6, now - render_start)
+        # Whichever side is slower decides when the video is ready
+        eta = None
+        remaining_render = self.total_frames - self.frame
+        remaining_encode = self.total_frames - self.encoder_frame
+        if render_fps > 0:
+            eta = remaining_render / render_fps if remaining_render > 0 else 0.0
+            if encoder_fps > 0:
+                eta = max(eta, remaining_encode / encoder_fps)
+        return {
+            'event': 'progress',
+            'stage': self.current_stage,
+            'frame': self.frame,
+            'total_frames': self.total_frames,
+            'percent': round(100.0 * self.frame / self.total_frames, 1),
+            'render_fps': round(render_fps, 1),
+            'encoder_fps': round(encoder_fps, 1) if self.encoder_frame else None,
+            'encoder_frame': self.encoder_frame,
+            'eta_seconds': round(eta, 1) if eta is not None else None,
+            'elapsed_seconds': round(now - self.start, 2),
+        }
+
+    def read_encoder_stderr(self, pipe, lines):
+        """
+        Drain FFmpeg's stderr (run in a daemon thread): collect lines for error
+        reporting and track the encoder frame counter from its '\\r'-terminated
+        status lines, which a plain line iterator would only see at exit.
+        """
+        pending = b''
+        try:
+            while True:
+                chunk = pipe.read1(65536) if hasattr(pipe, 'read1') else pipe.read(65536)
+                if not chunk:
+                    break
+                pending += chunk
+                *complete, pending = re.split(rb'[\r\n]', pending)
+                for line in complete:
+                    if not line:
+                        continue
+                    match = _FRAME_STAT.match(line)
+                    if match:
+                        self.encoder_update(int(match.group(1)))
+                    else:
+                        lines.put(line + b'\n')
+            if pending:
+                lines.put(pending)
+        except Exception:
+            pass
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Sketch Scene Files - Compact binary container for extracted stroke geometry
+Stores the output of an animator's extraction stage (outline polylines, fill
+contours, reveal ranks, enhanced image) so it can be re-rendered, cached or
+shared between processes without re-running extraction.
+
+File layout (all integers little-endian, every section 64-byte aligned):
+
+    header   16 bytes     magic b'SKSCENE1', uint32 version, uint32 section count
+    table    count x 64   one entry per section (SECTION_DTYPE):
+                              name    16 bytes ASCII, NUL padded
+                              dtype    8 bytes NumPy dtype string (e.g. '<i4')
+                              ndim    uint32
+                              (pad)   uint32
+                              shape   3 x uint64 (unused dims are 0)
+                              offset  uint64   byte offset of the data from file start
+    data     raw C-order array bytes at the offsets above
+
+Standard sections (all optional):
+
+    meta             uint8 (n,)      UTF-8 JSON: producer, width, height, extraction metadata
+    outline_points   int32 (N, 2)    x, y of all outline polylines, concatenated
+    outline_offsets  int64 (n + 1)   polyline i is outline_points[offsets[i]:offsets[i + 1]]
+    fill_points      int32 (M, 2)    x, y of all fill contours, concatenated
+    fill_offsets     int64 (m + 1)   same CSR layout as outline_offsets
+    reveal_rank      int32 (n + m)   draw position of every outline, then every fill
+    image            uint8 (H, W[, 3]) enhanced/cleaned image (BGR)
+
+Loading maps the file with np.memmap and returns views into it: nothing is
+parsed or copied except the small JSON meta section.
+"""
+
+from __future__ import annotations
+
+import os
+import json
+import time
+import logging
+import tempfile
+
+from sketch_lazy import lazy_import
+
+np = lazy_import('numpy')
+
+logger = logging.getLogger(__name__)
+
+SCENE_MAGIC = b'SKSCENE1'
+SCENE_VERSION = 1
+SCENE_ALIGN = 64
+
+# Structured dtype specs (plain lists, so importing this module does not import NumPy)
+HEADER_DTYPE = [
+    ('magic', 'S8'),
+    ('version', '<u4'),
+    ('count', '<u4'),
+]
+
+SECTION_DTYPE = [
+    ('name', 'S16'),
+    ('dtype', 'S8'),
+    ('ndim', '<u4'),
+    ('pad', '<u4'),
+    ('shape', '<u8', (3,)),
+    ('offset', '<u8'),
+]
+
+
+def _align(offset: int) -> int:
+    return (offset + SCENE_ALIGN - 1) // SCENE_ALIGN * SCENE_ALIGN
+
+
+def pack_polylines(polylines):
+    """Concatenate polylines/contours into (points int32 (N, 2), offsets int64 (n + 1))."""
+    offsets = np.zeros(len(polylines) + 1, dtype=np.int64)
+    if not polylines:
+        return np.zeros((0, 2), dtype=np.int32), offsets
+    arrays = [np.asarray(p, dtype=np.int32).reshape(-1, 2) for p in polylines]
+    np.cumsum([len(a) for a in arrays], out=offsets[1:])
+    return np.concatenate(arrays), offsets
+
+
+def unpack_polylines(points: np.ndarray, offsets: np.ndarray):
+    """Split CSR points back into per-polyline (k, 2) views (no copy)."""
+    bounds = offsets.tolist()
+    return [points[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def save_scene(path: str, arrays: dict, meta: dict = None) -> dict:
+    """
+    Write named arrays (plus JSON meta) as a scene file.
+
+    The file is written next to its destination and renamed into place, so
+    readers never see a partial scene. Returns info (path, bytes, sections, seconds).
+    """
+    start = time.perf_counter()
+    sections = {}
+    if meta is not None:
+        sections['meta'] = np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8)
+    for name, array in arrays.items():
+        if array is None:
+            continue
+        array = np.ascontiguousarray(array)
+        if array.ndim > 3 or len(name.encode('ascii')) > 16:
+            raise ValueError(f"Scene section {name!r} has unsupported name or shape {array.shape}")
+        sections[name] = array.astype(array.dtype.newbyteorder('<'), copy=False)
+
+    header_dtype, section_dtype = np.dtype(HEADER_DTYPE), np.dtype(SECTION_DTYPE)
+    table = np.zeros(len(sections), dtype=section_dtype)
+    offset = _align(header_dtype.itemsize + section_dtype.itemsize * len(sections))
+    for entry, (name, array) in zip(table, sections.items()):
+        entry['name'] = name.encode('ascii')
+        entry['dtype'] = array.dtype.str.encode('ascii')
+        entry['ndim'] = array.ndim
+        entry['shape'][:array.ndim] = array.shape
+        entry['offset'] = offset
+        offset = _align(offset + array.nbytes)
+
+    header = np.zeros(1, dtype=header_dtype)
+    header['magic'] = SCENE_MAGIC
+    header['version'] = SCENE_VERSION
+    header['count'] = len(sections)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.scene_', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header.tobytes())
+            f.write(table.tobytes())
+            for entry, array in zip(table, sections.values()):
+                f.seek(int(entry['offset']))
+                f.write(memoryview(array).cast('B'))
+            f.truncate(offset)
+        os.chmod(tmp_path, 0o644)  # mkstemp creates 0600; scenes are shared with other processes
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    info = {
+        'path': str(path),
+        'bytes': offset,
+        'sections': list(sections),
+        'seconds': round(time.perf_counter() - start, 4),
+    }
+    logger.info(f"Saved scene: {path} ({offset / 1024:.0f} KiB, {len(sections)} sections)")
+    return info
+
+
+def load_scene(path: str):
+    """
+    Memory-map a scene file.
+
+    Returns (arrays, meta): arrays maps section name -> read-only view into the
+    mapped file (meta excluded), meta is the decoded JSON dict (empty if absent).
+    """
+    header_dtype, section_dtype = np.dtype(HEADER_DTYPE), np.dtype(SECTION_DTYPE)
+    mapped = np.memmap(path, dtype=np.uint8, mode='r')
+    if mapped.size < header_dtype.itemsize:
+        raise ValueError(f"Not a scene file (too short): {path}")
+    header = mapped[:header_dtype.itemsize].view(header_dtype)[0]
+    if header['magic'] != SCENE_MAGIC:
+        raise ValueError(f"Not a scene file (bad magic): {path}")
+    if header['version'] != SCENE_VERSION:
+        raise ValueError(f"Unsupported scene version {int(header['version'])}: {path}")
+
+    count = int(header['count'])
+    table_end = header_dtype.itemsize + section_dtype.itemsize * count
+    table = mapped[header_dtype.itemsize:table_end].view(section_dtype)
+
+    arrays = {}
+    meta = {}
+    for entry in table:
+        name = entry['name'].decode('ascii')
+        dtype = np.dtype(entry['dtype'].decode('ascii'))
+        shape = tuple(int(d) for d in entry['shape'][:int(entry['ndim'])])
+        start = int(entry['offset'])
+        end = start + dtype.itemsize * int(np.prod(shape, dtype=np.int64))
+        if end > mapped.size:
+            raise ValueError(f"Scene section {name!r} is truncated: {path}")
+        array = mapped[start:end].view(dtype).reshape(shape)
+        if name == 'meta':
+            meta = json.loads(array.tobytes().decode('utf-8'))
+        else:
+            arrays[name] = array
+    return arrays, meta
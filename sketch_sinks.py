@@ -0,0 +1,666 @@
+#!/usr/bin/env python3
+"""
+Sketch Frame Sinks - Pluggable destinations for rendered animation frames
+Every animator hands its frames to a sink instead of talking to FFmpeg
+directly, so rendering can be profiled (or run) without an encoder:
+
+    ffmpeg   pipe into an FFmpeg subprocess (the default; writes the MP4)
+    pyav     in-process libav encoder via PyAV (optional; falls back to ffmpeg if not installed)
+    null     counts frames and bytes, discards the pixels (pure render cost)
+    raw      memory-mapped file: '.y4m' -> YUV4MPEG2 4:2:0, anything else -> headerless rgb24
+    memory   keeps copies of every frame in a list (tests, in-process consumers)
+
+The FFmpeg pipe carries either packed rgb24/bgr24 (FFmpeg converts to yuv420p
+in swscale) or, with pipe_format='y4m', I420 frames converted here. I420 is
+half the bytes of rgb24, and its conversion can be cached: frames the caller
+marks as unchanged (same `key`) are resent without converting again, and a
+`dirty` rectangle limits conversion to the region that changed.
+
+Usage:
+    sink = create_sink(kind, output_path, width, height, fps, total_frames, ...)
+    for frame in frames:
+        sink.write(frame)          # (height, width, 3) uint8 in the sink's pixel order
+    ok = sink.close()              # False if the encoder failed
+    metadata['sink'] = sink.info()
+"""
+
+import os
+import time
+import fractions
+import queue
+import logging
+import threading
+import subprocess
+
+from sketch_progress import ProgressReporter
+
+logger = logging.getLogger(__name__)
+
+SINK_KINDS = ('ffmpeg', 'pyav', 'null', 'raw', 'memory')
+PIPE_FORMATS = ('rgb24', 'y4m')
+CONTAINERS = ('mp4', 'fmp4', 'hls')
+
+# Output-side FFmpeg arguments used when an animator does not pass its own
+DEFAULT_ENCODER_ARGS = ['-c:v', 'libx264', '-preset', 'medium', '-crf', '23',
+                        '-pix_fmt', 'yuv420p', '-movflags', '+faststart']
+
+# Fragmented MP4: an empty moov up front, then one moof+mdat fragment per keyframe
+# written as soon as it is encoded, so the file can be served while it grows
+FRAGMENTED_MOVFLAGS = '+frag_keyframe+empty_moov+default_base_moof'
+
+# HLS: CMAF (fragmented MP4) segments of this many seconds next to an EVENT
+# playlist that is rewritten after every segment, so playback can start as soon
+# as the first segment is complete
+HLS_SEGMENT_SECONDS = 2
+
+# Output-side options that belong to the muxer rather than the video encoder
+MUXER_OPTIONS = ('movflags', 'flush_packets')
+MUXER_OPTION_PREFIXES = ('hls_',)
+
+
+def y4m_header(width: int, height: int, fps: int) -> bytes:
+    """
+    YUV4MPEG2 stream header for progressive 4:2:0 frames. OpenCV's I420 is
+    BT.601 limited range with centred chroma, the same as swscale's default.
+    """
+    return f'YUV4MPEG2 W{width} H{height} F{fps}:1 Ip A1:1 C420jpeg XCOLORRANGE=LIMITED\n'.encode('ascii')
+
+
+class I420Converter:
+    """
+    RGB/BGR -> planar I420 into one reusable buffer.
+
+    OpenCV computes each chroma sample from its own 2x2 block, so converting an
+    even-aligned sub-rectangle gives exactly the bytes a full conversion would;
+    convert() uses that to patch only the dirty region of the previous frame.
+    """
+
+    def __init__(self, width: int, height: int, pixel_order: str = 'rgb'):
+        import cv2
+        import numpy as np
+
+        if width % 2 or height % 2:
+            raise ValueError(f"I420 needs even dimensions, got {width}x{height}")
+        self.width = width
+        self.height = height
+        self.code = cv2.COLOR_BGR2YUV_I420 if pixel_order == 'bgr' else cv2.COLOR_RGB2YUV_I420
+        self.buffer = np.empty((height * 3 // 2, width), dtype=np.uint8)
+        self.y, self.u, self.v = self._planes(self.buffer, width, height)
+        self.key = None
+        self.valid = False
+        self.stats = {'full': 0, 'partial': 0, 'reused': 0}
+
+    @staticmethod
+    def _planes(buffer, width: int, height: int):
+        flat = buffer.reshape(-1)
+        luma = width * height
+        return (flat[:luma].reshape(height, width),
+                flat[luma:luma + luma // 4].reshape(height // 2, width // 2),
+                flat[luma + luma // 4:].reshape(height // 2, width // 2))
+
+    def convert(self, frame, key=None, dirty=None):
+        """
+        Convert `frame` and return the I420 buffer (overwritten by the next call).
+
+        key:   hashable frame identity; equal to the previous key -> previous output reused.
+        dirty: (x0, y0, x1, y1) exclusive rectangle that contains every pixel changed since
+               the previous frame; None converts the whole frame.
+        """
+        import cv2
+
+        if self.valid and key is not None and key == self.key:
+            self.stats['reused'] += 1
+            return self.buffer
+        self.key = key
+        if not self.valid or dirty is None:
+            cv2.cvtColor(frame, self.code, dst=self.buffer)
+            self.valid = True
+            self.stats['full'] += 1
+            return self.buffer
+
+        x0, y0, x1, y1 = dirty
+        x0, y0 = max(0, int(x0)) & ~1, max(0, int(y0)) & ~1
+        x1, y1 = min(self.width, (int(x1) + 1) & ~1), min(self.height, (int(y1) + 1) & ~1)
+        if x1 <= x0 or y1 <= y0:
+            self.stats['reused'] += 1
+            return self.buffer
+        w, h = x1 - x0, y1 - y0
+        region = cv2.cvtColor(frame[y0:y1, x0:x1].copy(), self.code)
+        y, u, v = self._planes(region, w, h)
+        self.y[y0:y1, x0:x1] = y
+        self.u[y0 // 2:y1 // 2, x0 // 2:x1 // 2] = u
+        self.v[y0 // 2:y1 // 2, x0 // 2:x1 // 2] = v
+        self.stats['partial'] += 1
+        return self.buffer
+
+
+class FrameSink:
+    """Base class: validates frame shape and counts what was written."""
+
+    kind = 'base'
+
+    def __init__(self, width: int, height: int, fps: int, pixel_order: str = 'rgb'):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.pixel_order = pixel_order
+        self.shape = (height, width, 3)
+        self.frame_count = 0
+        self.bytes_written = 0
+        self.start = time.perf_counter()
+
+    def _check(self, frame):
+        if frame.shape != self.shape:
+            raise ValueError(f"Frame shape {frame.shape} does not match sink shape {self.shape}")
+
+    def write(self, frame, key=None, dirty=None):
+        """
+        Consume one (height, width, 3) uint8 frame in the sink's pixel order.
+        key/dirty are optional caching hints (see I420Converter.convert); sinks
+        that do not convert ignore them.
+        """
+        raise NotImplementedError
+
+    def close(self) -> bool:
+        """Finish the output; returns False if it could not be completed."""
+        return True
+
+    def info(self) -> dict:
+        """Summary for _metadata.json."""
+        return {
+            'kind': self.kind,
+            'frames': self.frame_count,
+            'bytes': self.bytes_written,
+            'seconds': round(time.perf_counter() - self.start, 4),
+        }
+
+
+class NullSink(FrameSink):
+    """Discards frames: isolates render cost from pipe and encoder cost."""
+
+    kind = 'null'
+
+    def write(self, frame, key=None, dirty=None):
+        self._check(frame)
+        self.frame_count += 1
+        self.bytes_written += frame.nbytes
+
+
+class MemorySink(FrameSink):
+    """Keeps a copy of every frame in self.frames."""
+
+    kind = 'memory'
+
+    def __init__(self, width: int, height: int, fps: int, pixel_order: str = 'rgb'):
+        super().__init__(width, height, fps, pixel_order)
+        self.frames = []
+
+    def write(self, frame, key=None, dirty=None):
+        self._check(frame)
+        self.frames.append(frame.copy())
+        self.frame_count += 1
+        self.bytes_written += frame.nbytes
+
+
+class RawFileSink(FrameSink):
+    """
+    Writes frames into a preallocated, memory-mapped file. Each frame is copied
+    (or colour-converted) straight into its slot, so there is no per-frame
+    syscall. The file is truncated to the frames actually written on close.
+    """
+
+    kind = 'raw'
+
+    def __init__(self, path: str, width: int, height: int, fps: int, total_frames: int,
+                 pixel_order: str = 'rgb'):
+        import numpy as np
+
+        super().__init__(width, height, fps, pixel_order)
+        self.path = str(path)
+        self.y4m = self.path.lower().endswith('.y4m')
+        self.converter = I420Converter(width, height, pixel_order) if self.y4m else None
+        self.header = y4m_header(width, height, fps) if self.y4m else b''
+        self.frame_header = b'FRAME\n' if self.y4m else b''
+        self.frame_bytes = width * height * 3 // 2 if self.y4m else width * height * 3
+        self.capacity = max(1, int(total_frames))
+        stride = len(self.frame_header) + self.frame_bytes
+
+        with open(self.path, 'wb') as f:
+            f.write(self.header)
+            f.truncate(len(self.header) + stride * self.capacity)
+        self.mapped = np.memmap(self.path, dtype=np.uint8, mode='r+')
+        self.slots = self.mapped[len(self.header):].reshape(self.capacity, stride)
+        if self.y4m:
+            self.slots[:, :len(self.frame_header)] = np.frombuffer(self.frame_header, dtype=np.uint8)
+        self.bytes_written = len(self.header)
+
+    def write(self, frame, key=None, dirty=None):
+        self._check(frame)
+        if self.frame_count >= self.capacity:
+            raise ValueError(f"Raw sink is full ({self.capacity} frames preallocated)")
+        slot = self.slots[self.frame_count, len(self.frame_header):]
+        if self.y4m:
+            slot[:] = self.converter.convert(frame, key, dirty).reshape(-1)
+        elif self.pixel_order == 'bgr':
+            import cv2
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=slot.reshape(self.shape))
+        else:
+            slot.reshape(self.shape)[:] = frame
+        self.frame_count += 1
+        self.bytes_written += len(self.frame_header) + self.frame_bytes
+
+    def close(self) -> bool:
+        self.mapped.flush()
+        del self.slots
+        del self.mapped
+        if self.frame_count < self.capacity:
+            with open(self.path, 'r+b') as f:
+                f.truncate(self.bytes_written)
+        logger.info(f"Wrote {self.frame_count} {'Y4M' if self.y4m else 'rgb24'} frames to {self.path}")
+        return True
+
+    def info(self) -> dict:
+        info = super().info()
+        info.update({'path': self.path, 'format': 'y4m' if self.y4m else 'rgb24'})
+        if self.converter:
+            info['conversion'] = dict(self.converter.stats)
+        return info
+
+
+# Rough libx264 throughput per preset (megapixels/second on one modern core
+# cluster); only used to set expectations, never to kill an encoder
+X264_PRESET_MPIXELS_PER_SECOND = {
+    'ultrafast': 250, 'superfast': 150, 'veryfast': 100, 'faster': 60, 'fast': 45,
+    'medium': 30, 'slow': 15, 'slower': 8, 'veryslow': 3, 'placebo': 1,
+}
+
+
+def estimate_encode_seconds(frames: int, width: int, height: int, preset: str = 'medium') -> float:
+    """Expected libx264 encode time for `frames` frames at the given size and preset."""
+    rate = X264_PRESET_MPIXELS_PER_SECOND.get(preset, X264_PRESET_MPIXELS_PER_SECOND['medium'])
+    return frames * width * height / (rate * 1e6)
+
+
+class EncoderWatchdog:
+    """
+    Watches an FFmpeg subprocess through its `-progress` output instead of
+    wall time. The encoder only counts as stalled when it has made no progress
+    (frame counter / output size) for `stall_timeout` seconds while it has work:
+    a frame write blocked on the pipe, or input closed and frames still pending.
+    Idle time while the renderer is slow is never a stall. A stalled encoder
+    is killed; a `stall_timeout` <= 0 disables stall detection; an optional hard `timeout` (seconds after input closes) also
+    kills. The expected drain time (from frame count, resolution and preset)
+    is only used to warn about, and report, encoder lag.
+    """
+
+    def __init__(self, process, width: int, height: int, preset: str = 'medium',
+                 stall_timeout: float = 30, timeout: float = None, poll_interval: float = 0.5):
+        self.process = process
+        self.width = width
+        self.height = height
+        self.preset = preset
+        self.stall_timeout = stall_timeout
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.encoder_frame = 0
+        self.output_bytes = 0
+        self.last_progress = time.perf_counter()
+        self.write_started = None
+        self.closed_at = None
+        self.frames_sent = 0
+        self.max_lag_frames = 0
+        self.lag_at_close = None
+        self.expected_drain_seconds = None
+        self.stalled = False
+        self.timed_out = False
+        self._finished = threading.Event()
+        threading.Thread(target=self._read_progress, daemon=True).start()
+        threading.Thread(target=self._monitor, daemon=True).start()
+
+    def _read_progress(self):
+        """Parse `-progress pipe:1` key=value blocks from FFmpeg's stdout."""
+        try:
+            for line in self.process.stdout:
+                key, _, value = line.decode('ascii', errors='ignore').strip().partition('=')
+                if key == 'frame' and value.isdigit() and int(value) > self.encoder_frame:
+                    self.encoder_frame = int(value)
+                    self.last_progress = time.perf_counter()
+                elif key == 'total_size' and value.isdigit() and int(value) > self.output_bytes:
+                    self.output_bytes = int(value)
+                    self.last_progress = time.perf_counter()
+        except Exception:
+            pass
+
+    def frame_sent(self):
+        self.frames_sent += 1
+        self.max_lag_frames = max(self.max_lag_frames, self.frames_sent - self.encoder_frame)
+
+    def _kill(self, reason: str):
+        logger.error(f"FFmpeg watchdog: {reason}; killing encoder "
+                     f"(frame {self.encoder_frame}/{self.frames_sent})")
+        self.process.kill()
+
+    def _monitor(self):
+        warned = False
+        while not self._finished.wait(self.poll_interval):
+            if self.process.poll() is not None:
+                return
+            now = time.perf_counter()
+            if self.closed_at is not None:
+                if self.timeout and now - self.closed_at > self.timeout:
+                    self.timed_out = True
+                    self._kill(f"still encoding {self.timeout:.0f}s after the last frame")
+                    return
+                if not warned and now - self.closed_at > 2 * self.expected_drain_seconds + max(self.stall_timeout, 0):
+                    warned = True
+                    logger.warning(f"FFmpeg is behind schedule: expected ~{self.expected_drain_seconds:.1f}s "
+                                   f"to drain, {now - self.closed_at:.1f}s so far (still progressing)")
+                busy_since = self.closed_at
+            else:
+                busy_since = self.write_started
+            if (self.stall_timeout > 0 and busy_since is not None
+                    and now - max(busy_since, self.last_progress) > self.stall_timeout):
+                self.stalled = True
+                self._kill(f"no progress for {self.stall_timeout:.0f}s")
+                return
+
+    def input_closing(self):
+        """Called before stdin is closed; flushing the pipe buffer already counts as draining."""
+        self.lag_at_close = max(0, self.frames_sent - self.encoder_frame)
+        self.expected_drain_seconds = estimate_encode_seconds(self.lag_at_close, self.width, self.height, self.preset)
+        self.last_progress = max(self.last_progress, time.perf_counter())
+        self.closed_at = time.perf_counter()
+
+    def wait(self) -> int:
+        """Wait for FFmpeg to exit (or be killed) and return its exit code."""
+        try:
+            return self.process.wait()
+        finally:
+            self._finished.set()
+
+    def info(self) -> dict:
+        drain = time.perf_counter() - self.closed_at if self.closed_at else None
+        return {
+            'encoder_frames': self.encoder_frame,
+            'max_lag_frames': self.max_lag_frames,
+            'lag_frames_at_close': self.lag_at_close,
+            'expected_drain_seconds': round(self.expected_drain_seconds, 3) if self.expected_drain_seconds is not None else None,
+            'drain_seconds': round(drain, 3) if drain is not None else None,
+            'stall_timeout': self.stall_timeout,
+            'stalled': self.stalled,
+            'timed_out': self.timed_out,
+        }
+
+
+class FFmpegSink(FrameSink):
+    """
+    Streams frames into an FFmpeg subprocess, either as packed rawvideo
+    (rgb24/bgr24, matching pixel_order) or as a YUV4MPEG2 I420 stream.
+    stderr is drained by a daemon thread, which also feeds the encoder frame
+    counter to `progress`; `-progress pipe:1` on stdout feeds the EncoderWatchdog,
+    which replaces a fixed wait timeout.
+    """
+
+    kind = 'ffmpeg'
+
+    def __init__(self, output_path: str, width: int, height: int, fps: int, ffmpeg_cmd: str = 'ffmpeg',
+                 encoder_args: list = None, progress: ProgressReporter = None, pixel_order: str = 'rgb',
+                 pipe_format: str = 'rgb24', stall_timeout: float = 30, timeout: float = None):
+        super().__init__(width, height, fps, pixel_order)
+        self.output_path = str(output_path)
+        self.returncode = None
+        if pipe_format == 'y4m' and (width % 2 or height % 2):
+            logger.warning(f"Y4M pipe needs even dimensions ({width}x{height}), falling back to rawvideo")
+            pipe_format = 'rgb24'
+        self.pipe_format = pipe_format
+        if pipe_format == 'y4m':
+            self.converter = I420Converter(width, height, pixel_order)
+            input_args = ['-f', 'yuv4mpegpipe', '-i', '-']
+        else:
+            self.converter = None
+            input_args = ['-f', 'rawvideo', '-vcodec', 'rawvideo',
+                          '-s', f'{width}x{height}', '-pix_fmt', 'bgr24' if pixel_order == 'bgr' else 'rgb24',
+                          '-r', str(fps), '-i', '-']
+        encoder_args = encoder_args or DEFAULT_ENCODER_ARGS
+        args = [ffmpeg_cmd, '-y', '-progress', 'pipe:1', *input_args, *encoder_args, self.output_path]
+        self.process = subprocess.Popen(
+            args,
+            stdin=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            bufsize=10**8  # Large buffer to reduce blocking
+        )
+        preset = split_encoder_args(encoder_args).get('preset', 'medium')
+        self.watchdog = EncoderWatchdog(self.process, width, height, preset, stall_timeout, timeout)
+        self.stderr_lines = queue.Queue()
+        reader = progress or ProgressReporter(1)
+        threading.Thread(target=reader.read_encoder_stderr,
+                         args=(self.process.stderr, self.stderr_lines), daemon=True).start()
+        if self.converter:
+            self._send(y4m_header(width, height, fps))
+
+    def _stderr_text(self) -> str:
+        lines = []
+        while True:
+            try:
+                lines.append(self.stderr_lines.get_nowait().decode('utf-8', errors='ignore'))
+            except queue.Empty:
+                break
+        return ''.join(lines)
+
+    def _send(self, data):
+        self.watchdog.write_started = time.perf_counter()
+        try:
+            self.process.stdin.write(data)
+        except (BrokenPipeError, ValueError):
+            self.process.wait()
+            reason = 'stalled and was killed' if self.watchdog.stalled else 'exited early'
+            raise RuntimeError(f"FFmpeg {reason} (code {self.process.returncode}): {self._stderr_text()}")
+        finally:
+            self.watchdog.write_started = None
+        self.bytes_written += len(data) if isinstance(data, bytes) else data.nbytes
+
+    def write(self, frame, key=None, dirty=None):
+        self._check(frame)
+        if self.converter:
+            self._send(b'FRAME\n')
+            self._send(self.converter.convert(frame, key, dirty))
+        else:
+            # Contiguous arrays are written through the buffer protocol (no tobytes() copy)
+            self._send(frame if frame.flags.c_contiguous else frame.tobytes())
+        self.frame_count += 1
+        self.watchdog.frame_sent()
+
+    def close(self) -> bool:
+        self.watchdog.input_closing()
+        try:
+            self.process.stdin.close()
+        except (BrokenPipeError, ValueError):
+            pass
+        self.returncode = self.watchdog.wait()
+        if self.returncode != 0:
+            logger.error(f"FFmpeg failed with code {self.returncode}: {self._stderr_text()}")
+            return False
+        return True
+
+    def info(self) -> dict:
+        info = super().info()
+        info.update({'path': self.output_path, 'returncode': self.returncode, 'pipe_format': self.pipe_format})
+        info['watchdog'] = self.watchdog.info()
+        if self.converter:
+            info['conversion'] = dict(self.converter.stats)
+        return info
+
+
+def pyav_available() -> bool:
+    """True if PyAV (the optional in-process encoder) can be imported."""
+    try:
+        import av  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def split_encoder_args(encoder_args: list) -> dict:
+    """['-c:v', 'libx264', '-crf', '23', ...] -> {'c:v': 'libx264', 'crf': '23', ...}"""
+    return {flag.lstrip('-'): str(value) for flag, value in zip(encoder_args[::2], encoder_args[1::2])}
+
+
+def is_muxer_option(name: str) -> bool:
+    return name in MUXER_OPTIONS or name.startswith(MUXER_OPTION_PREFIXES)
+
+
+def container_args(encoder_args: list, container: str, fps: int, output_path: str = None) -> list:
+    """
+    Output-side arguments for `container` (one of CONTAINERS). 'mp4' keeps
+    +faststart, which rewrites the whole file after encoding to move the moov
+    atom forward. 'fmp4' writes a fragmented MP4 instead: no second pass, a
+    keyframe (and so a fragment) every second, and packets flushed to the file
+    as they are muxed, so the first bytes exist a moment after encoding starts.
+    'hls' makes output_path (.m3u8) an HLS playlist over <stem>_init.mp4 and
+    <stem>_NNNNN.m4s segments written beside it.
+    """
+    options = split_encoder_args(encoder_args or DEFAULT_ENCODER_ARGS)
+    if container in ('fmp4', 'hls'):
+        options.setdefault('g', str(max(1, int(fps))))
+    if container == 'fmp4':
+        options['movflags'] = FRAGMENTED_MOVFLAGS
+        options['flush_packets'] = '1'
+    elif container == 'hls':
+        if not str(output_path).endswith('.m3u8'):
+            raise ValueError(f"HLS output must be an .m3u8 playlist, got {output_path!r}")
+        stem = os.path.splitext(os.path.basename(output_path))[0]
+        options.pop('movflags', None)
+        options.update({
+            'f': 'hls',
+            'hls_time': str(HLS_SEGMENT_SECONDS),
+            'hls_playlist_type': 'event',
+            'hls_segment_type': 'fmp4',
+            'hls_fmp4_init_filename': f'{stem}_init.mp4',
+            'hls_segment_filename': os.path.join(os.path.dirname(os.path.abspath(output_path)), f'{stem}_%05d.m4s'),
+            # Segments appear under their final name only when complete
+            'hls_flags': 'independent_segments+temp_file',
+        })
+    elif container not in (None, 'mp4'):
+        raise ValueError(f"Unknown container: {container!r} (expected one of {', '.join(CONTAINERS)})")
+    return [arg for flag, value in options.items() for arg in ('-' + flag, value)]
+
+
+class PyAVSink(FrameSink):
+    """
+    Encodes in-process with PyAV: frames go straight from NumPy into libav,
+    with no pipe copy and no stderr thread. yuv420p output is fed from the
+    cached I420Converter (so key/dirty hints apply); other pixel formats are
+    converted by libav. Takes the same output-side arguments as FFmpegSink.
+    """
+
+    kind = 'pyav'
+
+    def __init__(self, output_path: str, width: int, height: int, fps: int, encoder_args: list = None,
+                 progress: ProgressReporter = None, pixel_order: str = 'rgb', threads: int = 0):
+        import av
+
+        super().__init__(width, height, fps, pixel_order)
+        self.av = av
+        self.output_path = str(output_path)
+        self.progress = progress
+        options = split_encoder_args(encoder_args or DEFAULT_ENCODER_ARGS)
+        self.codec = options.pop('c:v', 'libx264')
+        pix_fmt = options.pop('pix_fmt', 'yuv420p')
+        muxer_format = options.pop('f', None)
+        muxer_options = {name: options.pop(name) for name in list(options) if is_muxer_option(name)}
+
+        self.container = av.open(self.output_path, 'w', format=muxer_format, options=muxer_options)
+        self.stream = self.container.add_stream(self.codec, rate=fps)
+        self.stream.width = width
+        self.stream.height = height
+        self.stream.pix_fmt = pix_fmt
+        self.stream.options = options
+        self.stream.codec_context.thread_type = 'AUTO'  # Frame + slice threads inside libav
+        self.stream.codec_context.thread_count = threads  # 0 = one per core
+        self.time_base = fractions.Fraction(1, fps)
+        use_i420 = pix_fmt == 'yuv420p' and not (width % 2 or height % 2)
+        self.converter = I420Converter(width, height, pixel_order) if use_i420 else None
+        self.input_format = 'bgr24' if pixel_order == 'bgr' else 'rgb24'
+        self.packets = 0
+        self.encode_seconds = 0.0
+
+    def _mux(self, frame):
+        start = time.perf_counter()
+        packets = self.stream.encode(frame)
+        self.container.mux(packets)
+        self.encode_seconds += time.perf_counter() - start
+        for packet in packets:
+            self.packets += 1
+            self.bytes_written += packet.size
+        if packets and self.progress:
+            self.progress.encoder_update(self.packets)
+
+    def write(self, frame, key=None, dirty=None):
+        self._check(frame)
+        if self.converter:
+            video_frame = self.av.VideoFrame.from_ndarray(self.converter.convert(frame, key, dirty), format='yuv420p')
+        else:
+            video_frame = self.av.VideoFrame.from_ndarray(frame, format=self.input_format)
+        video_frame.pts = self.frame_count
+        video_frame.time_base = self.time_base
+        self._mux(video_frame)
+        self.frame_count += 1
+
+    def close(self) -> bool:
+        try:
+            self._mux(None)  # Flush delayed frames
+            self.container.close()
+        except Exception as e:
+            logger.error(f"PyAV encoding failed: {e}")
+            return False
+        return True
+
+    def info(self) -> dict:
+        info = super().info()
+        info.update({
+            'path': self.output_path,
+            'codec': self.codec,
+            'packets': self.packets,
+            'encode_seconds': round(self.encode_seconds, 4),
+            'threads': self.stream.codec_context.thread_count,
+        })
+        if self.converter:
+            info['conversion'] = dict(self.converter.stats)
+        return info
+
+
+def create_sink(kind: str, output_path: str, width: int, height: int, fps: int, total_frames: int,
+                ffmpeg_cmd: str = 'ffmpeg', encoder_args: list = None, progress: ProgressReporter = None,
+                pixel_order: str = 'rgb', pipe_format: str = 'rgb24', stall_timeout: float = None,
+                timeout: float = None, container: str = 'mp4') -> FrameSink:
+    """
+    Build the sink for `kind` (one of SINK_KINDS); 'raw' writes to output_path itself.
+    pixel_order ('rgb' or 'bgr') is the channel order of the frames the caller writes;
+    pipe_format (one of PIPE_FORMATS) only applies to the FFmpeg sink. 'pyav' falls
+    back to the FFmpeg sink when PyAV is not installed. stall_timeout (default 30s, <= 0
+    disables stall detection) and timeout (hard cap after the last frame, default none) configure the EncoderWatchdog.
+    container (one of CONTAINERS) adapts encoder_args for the encoding sinks: 'fmp4'
+    writes a fragmented MP4 that can be read while it grows, 'hls' a segmented
+    stream with output_path as its playlist.
+    """
+    kind = kind or 'ffmpeg'
+    if kind in ('pyav', 'ffmpeg'):
+        encoder_args = container_args(encoder_args, container, fps, output_path)
+    if kind == 'pyav':
+        if pyav_available():
+            return PyAVSink(output_path, width, height, fps, encoder_args, progress, pixel_order=pixel_order)
+        logger.warning("PyAV is not installed, falling back to the FFmpeg subprocess")
+        kind = 'ffmpeg'
+    if kind == 'ffmpeg':
+        return FFmpegSink(output_path, width, height, fps, ffmpeg_cmd, encoder_args, progress,
+                          pixel_order=pixel_order, pipe_format=pipe_format or 'rgb24',
+                          stall_timeout=30 if stall_timeout is None else stall_timeout, timeout=timeout)
+    if kind == 'null':
+        return NullSink(width, height, fps, pixel_order)
+    if kind == 'raw':
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        return RawFileSink(output_path, width, height, fps, total_frames, pixel_order)
+    if kind == 'memory':
+        return MemorySink(width, height, fps, pixel_order)
+    raise ValueError(f"Unknown frame sink: {kind!r} (expected one of {', '.join(SINK_KINDS)})")
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Sketch Tile Store - Persistent tiled canvas for incremental frame rendering
+The animators keep two full-size buffers for the whole job: the content layer
+(strokes and fills drawn so far) and the output frame (layer plus this frame's
+transient effects such as glow and the cursor). Each frame only the tiles that
+new content or last frame's effects touched are copied from layer to frame, so
+per-frame memory traffic scales with the changed area instead of the resolution.
+"""
+
+import logging
+
+from sketch_lazy import lazy_import
+
+np = lazy_import('numpy')
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TILE_SIZE = 128
+
+
+class TileCanvas:
+    """
+    Layer + output frame split into `tile`-pixel square tiles.
+
+    Per frame:
+        draw new strokes into .layer and mark() the rectangles they touch
+        compose()             -> refresh changed tiles of .frame from .layer
+        overlay_window(...)   -> tile-aligned window of .frame to draw effects into
+        dirty_rect()          -> bounding box of everything that changed (sink hint)
+    """
+
+    def __init__(self, base, tile: int = DEFAULT_TILE_SIZE):
+        self.height, self.width = base.shape[:2]
+        self.tile = max(16, int(tile or DEFAULT_TILE_SIZE))
+        self.rows = -(-self.height // self.tile)
+        self.cols = -(-self.width // self.tile)
+        self.layer = base.copy()
+        self.frame = base.copy()
+        self._changed = np.zeros((self.rows, self.cols), dtype=bool)
+        self._overlay = np.zeros((self.rows, self.cols), dtype=bool)
+        self._touched = None
+        self.stats = {'frames': 0, 'tiles_copied': 0, 'tiles_total': 0}
+
+    def _tile_span(self, x0: int, y0: int, x1: int, y1: int):
+        """Tile index range (r0, r1, c0, c1), exclusive, covering pixel rect [x0, x1) x [y0, y1)."""
+        x0, y0 = max(0, int(x0)), max(0, int(y0))
+        x1, y1 = min(self.width, int(x1)), min(self.height, int(y1))
+        if x1 <= x0 or y1 <= y0:
+            return None
+        t = self.tile
+        return y0 // t, (y1 - 1) // t + 1, x0 // t, (x1 - 1) // t + 1
+
+    def mark(self, x0: int, y0: int, x1: int, y1: int):
+        """Record that the layer changed inside the exclusive pixel rect."""
+        span = self._tile_span(x0, y0, x1, y1)
+        if span:
+            r0, r1, c0, c1 = span
+            self._changed[r0:r1, c0:c1] = True
+
+    def tiles_near(self, ys, xs, pad: int = 0):
+        """Boolean tile mask of every tile within `pad` pixels of the given points."""
+        mask = np.zeros((self.rows, self.cols), dtype=bool)
+        if len(ys) == 0:
+            return mask
+        ys = np.asarray(ys, dtype=np.int64)
+        xs = np.asarray(xs, dtype=np.int64)
+        t = self.tile
+        r0 = np.clip((ys - pad) // t, 0, self.rows - 1)
+        r1 = np.clip((ys + pad) // t, 0, self.rows - 1)
+        c0 = np.clip((xs - pad) // t, 0, self.cols - 1)
+        c1 = np.clip((xs + pad) // t, 0, self.cols - 1)
+        if pad < t:
+            # A padded point spans at most 2x2 tiles
+            for rows, cols in ((r0, c0), (r0, c1), (r1, c0), (r1, c1)):
+                mask[rows, cols] = True
+        else:
+            for a, b, c, d in zip(r0.tolist(), r1.tolist(), c0.tolist(), c1.tolist()):
+                mask[a:b + 1, c:d + 1] = True
+        return mask
+
+    def mark_points(self, ys, xs, pad: int = 0):
+        """Record layer changes at individual pixels (plus `pad`)."""
+        self._changed |= self.tiles_near(ys, xs, pad)
+
+    def mark_all(self):
+        self._changed[:] = True
+
+    def runs(self, mask):
+        """Yield exclusive pixel rects (x0, y0, x1, y1) for each horizontal run of set tiles."""
+        t = self.tile
+        for r in np.flatnonzero(mask.any(axis=1)).tolist():
+            row = mask[r]
+            edges = np.flatnonzero(np.diff(np.concatenate(([0], row.view(np.int8), [0]))))
+            for c0, c1 in zip(edges[::2].tolist(), edges[1::2].tolist()):
+                yield c0 * t, r * t, min(c1 * t, self.width), min((r + 1) * t, self.height)
+
+    def compose(self):
+        """
+        Start a new output frame: copy changed tiles and tiles that carried last
+        frame's overlays from the layer. Returns .frame.
+        """
+        refresh = self._changed | self._overlay
+        for x0, y0, x1, y1 in self.runs(refresh):
+            self.frame[y0:y1, x0:x1] = self.layer[y0:y1, x0:x1]
+        self.stats['frames'] += 1
+        self.stats['tiles_copied'] += int(refresh.sum())
+        self.stats['tiles_total'] += self.rows * self.cols
+        self._touched = refresh
+        self._changed = np.zeros_like(self._changed)
+        self._overlay = np.zeros_like(self._overlay)
+        return self.frame
+
+    def add_overlay(self, mask):
+        """Mark tiles of .frame that this frame's transient effects drew into."""
+        self._overlay |= mask
+        self._touched = self._touched | mask
+
+    def overlay_window(self, x0: int, y0: int, x1: int, y1: int):
+        """
+        Clip a pixel rect to the frame, mark its tiles as overlay, and return
+        (x0, y0, x1, y1) or None when it is off-canvas.
+        """
+        x0, y0 = max(0, int(x0)), max(0, int(y0))
+        x1, y1 = min(self.width, int(x1)), min(self.height, int(y1))
+        span = self._tile_span(x0, y0, x1, y1)
+        if not span:
+            return None
+        r0, r1, c0, c1 = span
+        mask = np.zeros_like(self._overlay)
+        mask[r0:r1, c0:c1] = True
+        self.add_overlay(mask)
+        return x0, y0, x1, y1
+
+    def dirty_rect(self):
+        """Exclusive bounding rect of every tile that may differ from the previous frame."""
+        if self._touched is None or not self._touched.any():
+            return (0, 0, 0, 0)
+        rows = np.flatnonzero(self._touched.any(axis=1))
+        cols = np.flatnonzero(self._touched.any(axis=0))
+        t = self.tile
+        return (int(cols[0]) * t, int(rows[0]) * t,
+                min(int(cols[-1] + 1) * t, self.width), min(int(rows[-1] + 1) * t, self.height))
+
+    def reset(self, layer):
+        """Replace the layer (e.g. at a pass boundary); every tile is refreshed on the next compose()."""
+        self.layer = layer
+        self.mark_all()
+
+    def info(self) -> dict:
+        """Summary for _metadata.json."""
+        total = max(1, self.stats['tiles_total'])
+        return {
+            'tile_size': self.tile,
+            'grid': [self.rows, self.cols],
+            'tiles_copied': self.stats['tiles_copied'],
+            'copied_fraction': round(self.stats['tiles_copied'] / total, 4),
+        }
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Sketch Timeline - Compiled per-frame draw ranges for the animators
+Extraction produces geometry (reveal-ordered pixels, outline segments, fill
+contours); compiling it with the frame timing gives one small array per
+quantity, indexed by frame:
+
+    <range>   int64 (F,)     items drawn by the end of frame f (cumulative):
+                             frame f draws items [range[f - 1], range[f])
+    phase     uint8 (F,)     animator-specific pass (whiteboard: outline, fill, hold)
+    cursor    int32 (F, 2)   x, y of the cursor drawn on frame f, or -1, -1 for none
+    ...                      other per-frame values (e.g. the highlight glow start)
+
+Render loops walk these ranges instead of recomputing progress per frame, a
+single frame is a lookup (poster frames, scrubbing), and a frame range can be
+handed to another worker together with the counts drawn before its first
+frame. Timelines are stored as scene files (sketch_scene.py) and can be
+checked without rendering any pixels.
+"""
+
+from __future__ import annotations
+
+import logging
+
+from sketch_lazy import lazy_import
+from sketch_scene import save_scene, load_scene
+
+np = lazy_import('numpy')
+
+logger = logging.getLogger(__name__)
+
+TIMELINE_FORMAT = 1
+
+
+def linear_ends(count: int, frames: int, length: int = None) -> np.ndarray:
+    """
+    Cumulative item counts for a linear reveal of `count` items over `frames`
+    frames: int(count * ((f + 1) / frames)), in the same float arithmetic the
+    per-frame loops used, so compiled and live progress agree exactly. With
+    `length` > frames the reveal stays complete for the extra frames.
+    """
+    length = frames if length is None else length
+    if frames <= 0:
+        return np.full(max(0, length), count, dtype=np.int64)
+    ends = (count * ((np.arange(length, dtype=np.float64) + 1) / frames)).astype(np.int64)
+    return np.minimum(ends, count)
+
+
+class Timeline:
+    """
+    Per-frame draw ranges of one animation.
+
+        timeline = Timeline('color', total_frames, fps)
+        timeline.add_range('pixels', linear_ends(len(order), total_frames))
+        for frame_idx in range(total_frames):
+            start, end = timeline.span('pixels', frame_idx)   # new this frame
+    """
+
+    def __init__(self, kind: str, total_frames: int, fps: float):
+        self.kind = kind
+        self.total_frames = int(total_frames)
+        self.fps = fps
+        self.arrays = {
+            'phase': np.zeros(self.total_frames, dtype=np.uint8),
+            'cursor': np.full((self.total_frames, 2), -1, dtype=np.int32),
+        }
+        self.ranges = []
+
+    def add_range(self, name: str, ends, start_frame: int = 0):
+        """
+        Register a cumulative range. `ends` covers frames from start_frame on;
+        earlier frames draw nothing and later frames keep the final count.
+        """
+        ends = np.asarray(ends, dtype=np.int64)
+        full = np.zeros(self.total_frames, dtype=np.int64)
+        stop = min(self.total_frames, start_frame + len(ends))
+        full[start_frame:stop] = ends[:stop - start_frame]
+        if len(ends):
+            full[stop:] = ends[-1]
+        if (np.diff(full) < 0).any():
+            raise ValueError(f"Timeline range {name!r} must not decrease")
+        self.arrays[name] = full
+        if name not in self.ranges:
+            self.ranges.append(name)
+
+    def set_values(self, name: str, values):
+        """Store a per-frame value array (not a cumulative range)."""
+        values = np.asarray(values)
+        if len(values) != self.total_frames:
+            raise ValueError(f"Timeline values {name!r} need {self.total_frames} entries, got {len(values)}")
+        self.arrays[name] = values
+
+    @property
+    def phase(self) -> np.ndarray:
+        return self.arrays['phase']
+
+    @property
+    def cursor(self) -> np.ndarray:
+        return self.arrays['cursor']
+
+    def end(self, name: str, frame_idx: int) -> int:
+        """Items of `name` drawn by the end of frame_idx (0 before the first frame)."""
+        return int(self.arrays[name][frame_idx]) if frame_idx >= 0 else 0
+
+    def span(self, name: str, frame_idx: int):
+        """(start, end) of the items of `name` that frame_idx adds."""
+        return self.end(name, frame_idx - 1), self.end(name, frame_idx)
+
+    def value(self, name: str, frame_idx: int) -> int:
+        return int(self.arrays[name][frame_idx])
+
+    def cursor_at(self, frame_idx: int):
+        """(x, y) of the cursor on frame_idx, or None."""
+        x, y = self.arrays['cursor'][frame_idx].tolist()
+        return None if x < 0 else (x, y)
+
+    def state_at(self, frame_idx: int) -> dict:
+        """Counts already drawn when frame_idx starts: what a worker starting there must draw first."""
+        return {name: self.end(name, frame_idx - 1) for name in self.ranges}
+
+    def split(self, parts: int, weights: dict = None):
+        """
+        Split the frames into up to `parts` contiguous [first, last) ranges of
+        roughly equal work: one unit per frame plus the items drawn, each range
+        weighted by weights[name] (default 1; e.g. a fill costs more than a segment).
+        """
+        if not self.total_frames:
+            return []
+        parts = max(1, min(int(parts), self.total_frames))
+        work = np.ones(self.total_frames, dtype=np.float64)
+        for name in self.ranges:
+            work += np.diff(self.arrays[name], prepend=0) * (weights or {}).get(name, 1.0)
+        cumulative = np.cumsum(work)
+        targets = cumulative[-1] * np.arange(1, parts) / parts
+        cuts = np.unique(np.searchsorted(cumulative, targets, side='right'))
+        bounds = [0] + [int(c) for c in cuts if 0 < c < self.total_frames] + [self.total_frames]
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def save(self, path: str) -> dict:
+        """Write the timeline as a scene file."""
+        meta = {
+            'producer': 'timeline',
+            'format': TIMELINE_FORMAT,
+            'kind': self.kind,
+            'total_frames': self.total_frames,
+            'fps': self.fps,
+            'ranges': self.ranges,
+        }
+        return save_scene(path, self.arrays, meta)
+
+    @classmethod
+    def load(cls, path: str):
+        arrays, meta = load_scene(path)
+        if meta.get('producer') != 'timeline':
+            raise ValueError(f"Not a timeline file: {path}")
+        timeline = cls(meta['kind'], meta['total_frames'], meta['fps'])
+        timeline.arrays.update({name: np.array(array) for name, array in arrays.items()})
+        timeline.ranges = list(meta.get('ranges', []))
+        return timeline
+
+    def info(self) -> dict:
+        """Summary for _metadata.json."""
+        return {
+            'frames': self.total_frames,
+            'ranges': {name: self.end(name, self.total_frames - 1) if self.total_frames else 0
+                       for name in self.ranges},
+            'bytes': int(sum(array.nbytes for array in self.arrays.values())),
+        }
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Sketch Toolchain - Cached FFmpeg/Potrace lookup and capability probe
+Finding the binaries (node_modules/ffmpeg-static, then PATH) and asking them
+what they support costs a filesystem walk and several process spawns, which
+add up across thousands of short jobs. Toolchain does both once and keeps the
+answers in a small JSON file:
+
+    {"format": 1,
+     "lookups":  {"ffmpeg@<PATH/cwd hash>": {"path": "/usr/bin/ffmpeg", "mtime_ns": ..., "size": ...}},
+     "binaries": {"/usr/bin/ffmpeg": {"kind": "ffmpeg", "version": "6.1.1", "mtime_ns": ..., "size": ...,
+                                      "encoders": ["libx264", ...], "filters": ["scale", ...]}}}
+
+An entry is reused while the binary's mtime and size are unchanged, so a
+later job costs one stat() per binary and no process at all; replacing or
+upgrading FFmpeg re-probes it. The file lives in $SKETCH_TOOLCHAIN_CACHE
+(default ~/.cache/sketch-animate/toolchain.json; 'off' keeps it in memory).
+encoder_args() swaps libx264 for the best H.264 (or MPEG-4) encoder the
+binary has when it was built without x264.
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import subprocess
+from pathlib import Path
+
+from sketch_sinks import split_encoder_args
+
+logger = logging.getLogger(__name__)
+
+TOOLCHAIN_FORMAT = 1
+
+PROBE_TIMEOUT = 10
+
+# Replacements for a missing encoder, best first, with their rate control
+FALLBACK_ENCODERS = (
+    ('libx264', {}),
+    ('libopenh264', {'b:v': '4M'}),
+    ('h264_videotoolbox', {'b:v': '4M'}),
+    ('mpeg4', {'q:v': '3'}),
+)
+
+# libx264 private options the fallback encoders do not take
+X264_OPTIONS = ('preset', 'crf', 'tune', 'x264-params', 'profile:v')
+
+
+def default_cache_path():
+    """$SKETCH_TOOLCHAIN_CACHE, else toolchain.json under the user cache directory; None for 'off'."""
+    path = os.environ.get('SKETCH_TOOLCHAIN_CACHE')
+    if path:
+        return None if path == 'off' else path
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'sketch-animate', 'toolchain.json')
+
+
+def _stat(path: str):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return {'mtime_ns': st.st_mtime_ns, 'size': st.st_size}
+
+
+def _locate(name: str):
+    """Same order as the animators always used: node_modules/ffmpeg-static, then PATH."""
+    if name == 'ffmpeg':
+        node_ffmpeg = Path(os.getcwd()) / 'node_modules' / 'ffmpeg-static' / 'ffmpeg.exe'
+        if node_ffmpeg.exists():
+            return str(node_ffmpeg)
+    return shutil.which(name)
+
+
+def _encoder_names(text: str):
+    """Video encoder names from `ffmpeg -encoders`: the rows after the '------' line with a V flag."""
+    names, in_table = [], False
+    for line in text.splitlines():
+        fields = line.split()
+        if not in_table:
+            in_table = bool(fields) and set(fields[0]) == {'-'}
+        elif len(fields) >= 2 and fields[0].startswith('V'):
+            names.append(fields[1])
+    return names
+
+
+def _filter_names(text: str):
+    """Filter names from `ffmpeg -filters`: rows with an input->output column."""
+    return [fields[1] for fields in map(str.split, text.splitlines())
+            if len(fields) >= 3 and '->' in fields[2]]
+
+
+def probe_ffmpeg(path: str) -> dict:
+    """Version, video encoders and filters of one FFmpeg binary (the three queries run concurrently)."""
+    queries = {'version': '-version', 'encoders': '-encoders', 'filters': '-filters'}
+    processes = {name: subprocess.Popen([path, '-hide_banner', flag], stdout=subprocess.PIPE,
+                                        stderr=subprocess.DEVNULL, stdin=subprocess.DEVNULL)
+                 for name, flag in queries.items()}
+    output = {}
+    for name, process in processes.items():
+        try:
+            stdout, _ = process.communicate(timeout=PROBE_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            stdout = b''
+        output[name] = stdout.decode('utf-8', errors='ignore') if process.returncode == 0 else ''
+    first = output['version'].splitlines()[:1]
+    fields = first[0].split() if first else []
+    return {
+        'kind': 'ffmpeg',
+        'ok': bool(output['version']),
+        'version': fields[2] if len(fields) > 2 and fields[1] == 'version' else None,
+        'encoders': _encoder_names(output['encoders']),
+        'filters': _filter_names(output['filters']),
+    }
+
+
+def probe_potrace(path: str) -> dict:
+    try:
+        result = subprocess.run([path, '--version'], capture_output=True, timeout=PROBE_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired):
+        return {'kind': 'potrace', 'ok': False, 'version': None}
+    first = result.stdout.decode('utf-8', errors='ignore').splitlines()[:1]
+    return {'kind': 'potrace', 'ok': result.returncode == 0, 'version': first[0].strip() if first else None}
+
+
+PROBES = {'ffmpeg': probe_ffmpeg, 'potrace': probe_potrace}
+
+
+def select_encoder(encoder_args: list, capabilities: dict) -> list:
+    """
+    encoder_args with -c:v replaced by the best encoder in FALLBACK_ENCODERS that
+    the probed FFmpeg has, when it lacks the requested one. Unchanged when the
+    probe listed no encoders (unknown binary, failed probe).
+    """
+    options = split_encoder_args(encoder_args)
+    codec = options.get('c:v', 'libx264')
+    encoders = (capabilities or {}).get('encoders')
+    if not encoders or codec in encoders:
+        return list(encoder_args)
+    for name, rate_control in FALLBACK_ENCODERS:
+        if name in encoders:
+            logger.warning(f"FFmpeg has no {codec} encoder, using {name}")
+            for option in X264_OPTIONS:
+                options.pop(option, None)
+            options['c:v'] = name
+            options.update(rate_control)
+            return [arg for flag, value in options.items() for arg in ('-' + flag, value)]
+    logger.warning(f"FFmpeg has no {codec} encoder and none of the fallbacks")
+    return list(encoder_args)
+
+
+class Toolchain:
+    """
+    Binary lookup and capabilities, cached across processes.
+
+        toolchain = Toolchain.for_config(config)
+        ffmpeg_cmd = toolchain.find('ffmpeg')                 # path, or 'ffmpeg' if not found
+        caps = toolchain.capabilities(ffmpeg_cmd, 'ffmpeg')    # None if it cannot run
+        encoder_args = toolchain.encoder_args(ENCODER_ARGS, ffmpeg_cmd, sink)
+        metadata['toolchain'] = toolchain.info()
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.data = {'format': TOOLCHAIN_FORMAT, 'lookups': {}, 'binaries': {}}
+        self.hits, self.probes = 0, []
+        self.versions, self.encoder = {}, None
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+                if data.get('format') == TOOLCHAIN_FORMAT:
+                    self.data.update(data)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable toolchain cache {path}: {e}")
+
+    @classmethod
+    def for_config(cls, config: dict):
+        """Cache file from config 'toolchain_cache' or default_cache_path()."""
+        path = config.get('toolchain_cache')
+        return cls(default_cache_path() if path is None else (None if path == 'off' else path))
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp = f'{self.path}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(tmp, 'w') as f:
+                json.dump(self.data, f, indent=2)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.debug(f"Could not write toolchain cache {self.path}: {e}")
+
+    def find(self, name: str, explicit: str = None) -> str:
+        """Path of `name` (an explicit path wins), from the cache while the binary is unchanged."""
+        if explicit:
+            return explicit
+        search = hashlib.sha1(f"{os.getcwd()}{os.pathsep}{os.environ.get('PATH', '')}".encode()).hexdigest()[:12]
+        key = f'{name}@{search}'
+        entry = self.data['lookups'].get(key)
+        if entry and _stat(entry['path']) == {'mtime_ns': entry['mtime_ns'], 'size': entry['size']}:
+            self.hits += 1
+            return entry['path']
+        path = _locate(name)
+        if not path:
+            return name
+        self.data['lookups'][key] = {'path': path, **_stat(path)}
+        self._save()
+        return path
+
+    def capabilities(self, command: str, kind: str):
+        """Probe result for the binary `command` runs (probed once per binary version), or None."""
+        path = command if os.path.sep in command else shutil.which(command)
+        st = _stat(path) if path else None
+        if st is None:
+            return None
+        path = os.path.realpath(path)
+        entry = self.data['binaries'].get(path)
+        if entry and entry.get('kind') == kind and entry['mtime_ns'] == st['mtime_ns'] and entry['size'] == st['size']:
+            self.hits += 1
+            self.versions[kind] = entry.get('version')
+            return entry if entry.get('ok') else None
+        start = time.perf_counter()
+        try:
+            entry = PROBES[kind](path)
+        except OSError as e:
+            logger.warning(f"Could not run {path}: {e}")
+            return None
+        entry.update(st, probe_seconds=round(time.perf_counter() - start, 4))
+        self.probes.append(kind)
+        logger.info(f"Probed {kind} {entry.get('version')} at {path} ({entry['probe_seconds']:.2f}s)")
+        self.data['binaries'][path] = entry
+        self.versions[kind] = entry.get('version')
+        self._save()
+        return entry if entry.get('ok') else None
+
+    def encoder_args(self, encoder_args: list, ffmpeg_cmd: str, sink: str = None) -> list:
+        """Encoder arguments the FFmpeg subprocess sink can run (other sinks: unchanged)."""
+        if (sink or 'ffmpeg') != 'ffmpeg':
+            return encoder_args
+        caps = self.capabilities(ffmpeg_cmd, 'ffmpeg')
+        encoder_args = select_encoder(encoder_args, caps)
+        self.encoder = split_encoder_args(encoder_args).get('c:v')
+        return encoder_args
+
+    def info(self) -> dict:
+        """Summary for _metadata.json."""
+        return {
+            'cache': self.path,
+            'cache_hits': self.hits,
+            'probed': self.probes,
+            'versions': self.versions,
+            'encoder': self.encoder,
+        }
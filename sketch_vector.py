@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Sketch Vector Export - Timed stroke reveal as animated SVG or Lottie JSON
+The geometric animators already hold the drawing as polylines and contours, so
+instead of rasterizing and encoding every frame they can describe the same
+reveal directly:
+
+    stroke   open polyline drawn progressively between two times (trim path /
+             stroke-dashoffset over pathLength=1)
+    shape    closed contour filled with a flat colour, shown at a time
+    region   closed contour through which the reference image is shown at a
+             time (clip path / alpha matte over one image asset)
+    hold     the reference image shown whole from a time on
+
+Times are in frames of the raster timeline, so a vector export and an MP4 of
+the same job reveal the same element on the same frame. The reference image
+is linked, not embedded: it is the animator's _original.png side file.
+
+    animation = VectorAnimation(width, height, fps, total_frames, image_href='x_original.png')
+    animation.add_stroke(points, start_frame, end_frame, width=3)
+    animation.write('x.svg')       # or 'x.json' for Lottie
+"""
+
+import os
+import json
+import math
+import logging
+
+from sketch_lazy import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+logger = logging.getLogger(__name__)
+
+# --output extension -> vector format
+VECTOR_FORMATS = {'.svg': 'svg', '.json': 'lottie'}
+
+LOTTIE_VERSION = '5.7.4'
+
+# Douglas-Peucker tolerance in pixels: extracted paths have a vertex on nearly
+# every pixel, and dropping those within a pixel of the line is invisible at
+# the 2-3 px stroke widths the animators draw
+DEFAULT_TOLERANCE = 1.0
+
+DEFAULT_STROKE_WIDTH = 3
+
+
+def vector_format(output_path: str):
+    """'svg' / 'lottie' when output_path asks for a vector export, else None."""
+    return VECTOR_FORMATS.get(os.path.splitext(str(output_path))[1].lower())
+
+
+def reveal_frames(count: int, start_frame: int, frames: int) -> list:
+    """
+    First frame on which each of `count` items is visible when the raster loop
+    shows int(count * (f + 1) / frames) of them on frame start_frame + f.
+    """
+    frames = max(1, frames)
+    return [start_frame + max(0, math.ceil((i + 1) * frames / count) - 1) for i in range(count)]
+
+
+def _points(points, tolerance: float, closed: bool) -> list:
+    """(N, 2) / (N, 1, 2) array or list of (x, y) -> simplified [[x, y], ...] of ints."""
+    points = np.asarray(points, dtype=np.int32).reshape(-1, 1, 2)
+    if tolerance > 0 and len(points) > 2:
+        points = cv2.approxPolyDP(points, tolerance, closed)
+    return points.reshape(-1, 2).tolist()
+
+
+def _hex(color) -> str:
+    """BGR tuple -> '#rrggbb'."""
+    b, g, r = (int(c) for c in color[:3])
+    return f'#{r:02x}{g:02x}{b:02x}'
+
+
+class VectorAnimation:
+    """Timed reveal elements, written as CSS-animated SVG or Lottie JSON."""
+
+    def __init__(self, width: int, height: int, fps: int, total_frames: int, image_href: str = None,
+                 tolerance: float = DEFAULT_TOLERANCE):
+        self.width = int(width)
+        self.height = int(height)
+        self.fps = fps
+        self.total_frames = max(1, int(total_frames))
+        self.image_href = image_href
+        self.tolerance = tolerance
+        self.strokes = []   # (points, start, end, width, color)
+        self.shapes = []    # (points, frame, color, stroke_width)
+        self.regions = []   # (points, frame)
+        self.hold_frame = None
+
+    def add_stroke(self, points, start_frame: float, end_frame: float, width: float = DEFAULT_STROKE_WIDTH,
+                   color=(0, 0, 0)):
+        points = _points(points, self.tolerance, closed=False)
+        if len(points) >= 2:
+            self.strokes.append((points, float(start_frame), float(max(start_frame, end_frame)), width, color))
+
+    def add_shape(self, points, frame: float, color=(0, 0, 0), stroke_width: float = 0):
+        points = _points(points, self.tolerance, closed=True)
+        if len(points) >= 3:
+            self.shapes.append((points, float(frame), color, stroke_width))
+
+    def add_region(self, points, frame: float):
+        points = _points(points, self.tolerance, closed=True)
+        if len(points) >= 3:
+            self.regions.append((points, float(frame)))
+
+    def set_hold(self, frame: float):
+        self.hold_frame = float(frame)
+
+    def _regions_by_frame(self) -> list:
+        """[(frame, [points, ...]), ...]: regions revealed together share one clip / matte group."""
+        groups = {}
+        for points, frame in self.regions:
+            groups.setdefault(frame, []).append(points)
+        return sorted(groups.items())
+
+    def write(self, path: str) -> dict:
+        """Write the format implied by the extension; returns a summary for _metadata.json."""
+        fmt = vector_format(path)
+        if fmt == 'svg':
+            text = self.to_svg()
+        elif fmt == 'lottie':
+            text = json.dumps(self.to_lottie(), separators=(',', ':'))
+        else:
+            raise ValueError(f"Unknown vector format for {path!r} (expected {', '.join(VECTOR_FORMATS)})")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        logger.info(f"Vector animation ({fmt}): {path} ({len(text) / 1024:.1f} KiB)")
+        return {
+            'format': fmt,
+            'bytes': len(text.encode('utf-8')),
+            'tolerance': self.tolerance,
+            'strokes': len(self.strokes),
+            'shapes': len(self.shapes),
+            'regions': len(self.regions),
+            'image': self.image_href,
+        }
+
+    # ----- SVG -----
+
+    def _seconds(self, frame: float) -> str:
+        return f'{frame / self.fps:.3f}s'
+
+    @staticmethod
+    def _path_data(points, closed: bool) -> str:
+        # Coordinate pairs after the first are implicit line-tos
+        d = 'M' + ' '.join(f'{x} {y}' for x, y in points)
+        return d + 'Z' if closed else d
+
+    def to_svg(self) -> str:
+        w, h = self.width, self.height
+        out = [
+            f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+            f'width="{w}" height="{h}" viewBox="0 0 {w} {h}">',
+            '<style>',
+            f'.s{{fill:none;stroke:#000000;stroke-width:{DEFAULT_STROKE_WIDTH};stroke-linecap:round;'
+            'stroke-linejoin:round;stroke-dasharray:1;stroke-dashoffset:1;animation:draw var(--d) linear var(--t) forwards}',
+            '.v{opacity:0;animation:show 0s var(--t) forwards}',
+            '@keyframes draw{to{stroke-dashoffset:0}}',
+            '@keyframes show{to{opacity:1}}',
+            '</style>',
+            f'<rect width="{w}" height="{h}" fill="#ffffff"/>',
+        ]
+        for points, start, end, width, color in self.strokes:
+            style = '' if _hex(color) == '#000000' else f' stroke="{_hex(color)}"'
+            style += '' if width == DEFAULT_STROKE_WIDTH else f' stroke-width="{width}"'
+            out.append(f'<path class="s" pathLength="1"{style} '
+                       f'style="--t:{self._seconds(start)};--d:{self._seconds(end - start)}" '
+                       f'd="{self._path_data(points, False)}"/>')
+        for points, frame, color, stroke_width in self.shapes:
+            stroke = f' stroke="{_hex(color)}" stroke-width="{stroke_width}"' if stroke_width else ''
+            out.append(f'<path class="v" fill="{_hex(color)}"{stroke} style="--t:{self._seconds(frame)}" '
+                       f'd="{self._path_data(points, True)}"/>')
+        if self.image_href and self.regions:
+            regions = self._regions_by_frame()
+            out.append('<defs>')
+            for i, (_, group) in enumerate(regions):
+                paths = ''.join(f'<path d="{self._path_data(points, True)}"/>' for points in group)
+                out.append(f'<clipPath id="r{i}">{paths}</clipPath>')
+            out.append('</defs>')
+            for i, (frame, _) in enumerate(regions):
+                out.append(f'<image class="v" href="{self.image_href}" xlink:href="{self.image_href}" '
+                           f'width="{w}" height="{h}" clip-path="url(#r{i})" style="--t:{self._seconds(frame)}"/>')
+        if self.image_href and self.hold_frame is not None:
+            out.append(f'<image class="v" href="{self.image_href}" xlink:href="{self.image_href}" '
+                       f'width="{w}" height="{h}" style="--t:{self._seconds(self.hold_frame)}"/>')
+        out.append('</svg>')
+        return '\n'.join(out) + '\n'
+
+    # ----- Lottie -----
+
+    @staticmethod
+    def _static(value) -> dict:
+        return {'a': 0, 'k': value}
+
+    @classmethod
+    def _transform(cls, opacity=None, shape: bool = False) -> dict:
+        tr = {
+            'o': opacity or cls._static(100),
+            'r': cls._static(0),
+            'p': cls._static([0, 0] if shape else [0, 0, 0]),
+            'a': cls._static([0, 0] if shape else [0, 0, 0]),
+            's': cls._static([100, 100] if shape else [100, 100, 100]),
+        }
+        if shape:
+            tr.update({'ty': 'tr', 'sk': cls._static(0), 'sa': cls._static(0)})
+        return tr
+
+    @staticmethod
+    def _appear(frame: float) -> dict:
+        """Opacity 0 -> 100 as a hold keyframe at `frame`."""
+        return {'a': 1, 'k': [{'t': 0, 's': [0], 'h': 1}, {'t': frame, 's': [100], 'h': 1}]}
+
+    @staticmethod
+    def _rgba(color) -> list:
+        b, g, r = (int(c) for c in color[:3])
+        return [round(r / 255, 4), round(g / 255, 4), round(b / 255, 4), 1]
+
+    @staticmethod
+    def _shape_path(points, closed: bool) -> dict:
+        zeros = [[0, 0]] * len(points)
+        return {'ty': 'sh', 'ks': {'a': 0, 'k': {'i': zeros, 'o': zeros, 'v': points, 'c': closed}}}
+
+    def _layer(self, index: int, name: str, layer_type: int, **fields) -> dict:
+        layer = {'ddd': 0, 'ind': index, 'ty': layer_type, 'nm': name, 'sr': 1,
+                 'ks': self._transform(), 'ao': 0, 'ip': 0, 'op': self.total_frames, 'st': 0, 'bm': 0}
+        layer.update(fields)
+        return layer
+
+    def to_lottie(self) -> dict:
+        """Lottie (bodymovin) document; the first layer is the topmost."""
+        layers = []
+        assets = []
+        if self.image_href:
+            assets.append({'id': 'image', 'w': self.width, 'h': self.height, 'u': '', 'p': self.image_href, 'e': 0})
+
+        if self.image_href and self.hold_frame is not None:
+            layers.append(self._layer(len(layers) + 1, 'hold', 2, refId='image', ip=self.hold_frame))
+
+        if self.image_href and self.regions:
+            matte = [{'ty': 'gr', 'nm': f'regions @{frame:g}', 'it': [
+                *(self._shape_path(points, True) for points in group),
+                {'ty': 'fl', 'c': self._static([0, 0, 0, 1]), 'o': self._static(100), 'r': 1},
+                self._transform(self._appear(frame), shape=True),
+            ]} for frame, group in self._regions_by_frame()]
+            layers.append(self._layer(len(layers) + 1, 'region matte', 4, td=1, shapes=matte))
+            layers.append(self._layer(len(layers) + 1, 'regions', 2, refId='image', tt=1))
+
+        if self.shapes:
+            groups = []
+            for i, (points, frame, color, stroke_width) in enumerate(self.shapes):
+                items = [self._shape_path(points, True),
+                         {'ty': 'fl', 'c': self._static(self._rgba(color)), 'o': self._static(100), 'r': 1}]
+                if stroke_width:
+                    items.append({'ty': 'st', 'c': self._static(self._rgba(color)), 'o': self._static(100),
+                                  'w': self._static(stroke_width), 'lc': 2, 'lj': 2})
+                items.append(self._transform(self._appear(frame), shape=True))
+                groups.append({'ty': 'gr', 'nm': f'shape {i}', 'it': items})
+            layers.append(self._layer(len(layers) + 1, 'shapes', 4, shapes=groups))
+
+        if self.strokes:
+            linear_out, linear_in = {'x': [0], 'y': [0]}, {'x': [1], 'y': [1]}
+            groups = []
+            for i, (points, start, end, width, color) in enumerate(self.strokes):
+                end = max(end, start + 0.01)  # Keyframes need increasing times
+                trim = {'a': 1, 'k': [{'t': start, 's': [0], 'o': linear_out, 'i': linear_in},
+                                      {'t': end, 's': [100]}]}
+                groups.append({'ty': 'gr', 'nm': f'stroke {i}', 'it': [
+                    self._shape_path(points, False),
+                    {'ty': 'st', 'c': self._static(self._rgba(color)), 'o': self._static(100),
+                     'w': self._static(width), 'lc': 2, 'lj': 2},
+                    {'ty': 'tm', 's': self._static(0), 'e': trim, 'o': self._static(0), 'm': 1},
+                    self._transform(shape=True),
+                ]})
+            layers.append(self._layer(len(layers) + 1, 'strokes', 4, shapes=groups))
+
+        layers.append(self._layer(len(layers) + 1, 'paper', 1, sc='#ffffff', sw=self.width, sh=self.height))
+        return {
+            'v': LOTTIE_VERSION, 'fr': self.fps, 'ip': 0, 'op': self.total_frames,
+            'w': self.width, 'h': self.height, 'nm': 'sketch', 'ddd': 0,
+            'assets': assets, 'layers': layers,
+        }
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The sketch_* helpers are top-level modules next to the animator scripts
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
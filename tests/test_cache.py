@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+
+from sketch_cache import OutputCache
+from sketch_poster import write_image
+
+SUFFIXES = ('_original.png', '_metadata.json')
+
+
+def _render(output, payload: bytes):
+    """Stand-in for a sink and the side-file writers: truncate and write in place."""
+    root = os.path.splitext(output)[0]
+    for path, data in ((output, payload), (root + '_original.png', payload[:4])):
+        with open(path, 'wb') as f:
+            f.write(data)
+    with open(root + '_metadata.json', 'w') as f:
+        f.write('{}')
+
+
+def _cache(tmp_path, config, output):
+    config = dict({'cache_dir': str(tmp_path / 'cache'), 'width': 320, 'duration': 2.0}, **config)
+    return OutputCache.for_render(config, 'color', 'test', [str(tmp_path / 'input.png')], output, SUFFIXES)
+
+
+def _publish_and_hit(tmp_path):
+    (tmp_path / 'input.png').write_bytes(b'input')
+    a, b = str(tmp_path / 'a.mp4'), str(tmp_path / 'b.mp4')
+    cache = _cache(tmp_path, {}, a)
+    assert not cache.fetch()
+    _render(a, b'full render')
+    assert cache.publish()
+    assert _cache(tmp_path, {}, b).fetch()
+    assert os.stat(b).st_nlink == 2
+    return b
+
+
+def test_uncached_render_does_not_overwrite_entry(tmp_path):
+    # A hit links b.mp4 to the entry; a later --no-cache render of b.mp4 must not write through
+    b = _publish_and_hit(tmp_path)
+    assert _cache(tmp_path, {'no_cache': True, 'duration': 0.4}, b) is None
+    _render(b, b'short')
+
+    c = str(tmp_path / 'c.mp4')
+    assert _cache(tmp_path, {}, c).fetch()
+    assert open(c, 'rb').read() == b'full render'
+    assert open(str(tmp_path / 'c_original.png'), 'rb').read() == b'full'
+
+
+def test_render_without_cache_dir_detaches(tmp_path):
+    b = _publish_and_hit(tmp_path)
+    assert OutputCache.for_render({'duration': 0.4}, 'color', 'test', [str(tmp_path / 'input.png')],
+                                  b, SUFFIXES) is None
+    assert not os.path.exists(b)
+
+
+def test_poster_does_not_overwrite_entry(tmp_path):
+    b = _publish_and_hit(tmp_path)
+    original = str(tmp_path / 'b_original.png')
+    assert write_image(original, np.zeros((4, 4, 3), dtype=np.uint8))
+
+    c = str(tmp_path / 'c.mp4')
+    assert _cache(tmp_path, {}, c).fetch()
+    assert open(str(tmp_path / 'c_original.png'), 'rb').read() == b'full'
@@ -0,0 +1,43 @@
+import cv2
+import numpy as np
+
+from sketch_benchmark import make_input
+from sketch_preprocess import adaptive_denoise, choose_denoise_path, estimate_noise
+
+
+def _gray(path):
+    return cv2.cvtColor(cv2.imread(str(path)), cv2.COLOR_BGR2GRAY)
+
+
+def test_clean_line_art_skips_denoise(tmp_path):
+    for width, height in ((1280, 720), (1920, 1080)):
+        gray = _gray(make_input('lineart', width, height, str(tmp_path / f'lineart_{height}.png')))
+        assert estimate_noise(gray) < 0.5
+        _, info = adaptive_denoise(gray)
+        assert info['path'] == 'skip'
+
+
+def test_downscaled_line_art_skips_denoise(tmp_path):
+    # The whiteboard resizes to the output size first, so strokes cross most 2x2 blocks
+    img = cv2.imread(make_input('lineart', 1920, 1080, str(tmp_path / 'lineart.png')))
+    small = cv2.resize(img, (640, 360), interpolation=cv2.INTER_AREA)
+    assert choose_denoise_path(estimate_noise(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY))) == 'skip'
+
+
+def test_flat_color_skips_denoise(tmp_path):
+    gray = _gray(make_input('color', 1280, 720, str(tmp_path / 'color.png')))
+    assert choose_denoise_path(estimate_noise(gray)) == 'skip'
+
+
+def test_noisy_photo_is_denoised(tmp_path):
+    gray = _gray(make_input('noisy', 1280, 720, str(tmp_path / 'noisy.png')))
+    assert choose_denoise_path(estimate_noise(gray)) == 'downscale'
+
+
+def test_estimate_tracks_added_noise():
+    rng = np.random.default_rng(0)
+    base = np.full((360, 640), 128.0)
+    for sigma in (2.0, 5.0, 10.0):
+        noisy = np.clip(base + rng.normal(0, sigma, base.shape), 0, 255).round().astype(np.uint8)
+        assert abs(estimate_noise(noisy) - sigma) < 0.15 * sigma + 0.6
+    assert choose_denoise_path(estimate_noise(noisy)) == 'full'
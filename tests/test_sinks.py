@@ -0,0 +1,27 @@
+import subprocess
+import sys
+import time
+
+import pytest
+
+from sketch_sinks import EncoderWatchdog
+
+
+def _silent_encoder():
+    """A stand-in for FFmpeg that never reports progress."""
+    return subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'], stdout=subprocess.PIPE)
+
+
+@pytest.mark.parametrize('stall_timeout, killed', [(0.2, True), (0, False), (-1, False)])
+def test_stall_timeout_zero_disables_the_watchdog(stall_timeout, killed):
+    process = _silent_encoder()
+    try:
+        watchdog = EncoderWatchdog(process, 64, 64, stall_timeout=stall_timeout, poll_interval=0.05)
+        watchdog.write_started = time.perf_counter()  # A frame write is blocked on the pipe
+        watchdog.frame_sent()
+        time.sleep(1.0)
+        assert watchdog.stalled is killed
+        assert (process.poll() is not None) is killed
+    finally:
+        process.kill()
+        watchdog.wait()
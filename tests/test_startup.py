@@ -0,0 +1,29 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from sketch_benchmark import ANIMATORS, HEAVY_MODULES, STARTUP_BUDGET_MS, import_times, imported_modules
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+
+def _importtime(module: str) -> str:
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)  # Time imports from bytecode, as in production
+    child = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                           cwd=REPO_DIR, env=env, capture_output=True, text=True, timeout=60)
+    assert child.returncode == 0, child.stderr[-2000:]
+    return child.stderr
+
+
+@pytest.mark.parametrize('module', sorted(entry[0] for entry in ANIMATORS.values()))
+def test_animator_import_is_light(module):
+    _importtime(module)  # Warm-up: writes bytecode and fills the page cache
+    runs = [_importtime(module) for _ in range(3)]
+    heavy = sorted(name for name in imported_modules(runs[0]) if name.split('.')[0] in HEAVY_MODULES)
+    assert not heavy, f'{module} imports {heavy} at load time'
+    import_ms = min(sum(import_times(stderr).values()) for stderr in runs) / 1000.0
+    assert import_ms < STARTUP_BUDGET_MS, f'{module} imports take {import_ms:.0f} ms'